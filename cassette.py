@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+錄製 / 重播：把一次執行中的網頁抓取（Selenium）、gspread HTTP 請求與 Sheets v4（googleapiclient）
+請求與回應錄進 cassette 檔；重播時直接從 cassette 回應，可選擇注入延遲，
+讓 find_Mglinks.py、scrape_t66y.py 與狀態腳本能離線、可重現地做效能量測。
+
+環境變數：
+    CHASING_CASSETTE          cassette 路徑（.jsonl 或 .jsonl.gz）
+    CHASING_CASSETTE_MODE     record / replay（未設定時不啟用）
+    CHASING_CASSETTE_LATENCY  重播延遲：recorded（照錄製時的耗時）、數字（固定秒數）或 0（預設）
+    CHASING_HTTP_DRIVER       設為 1 時不啟動瀏覽器，以 HTTP 直接抓頁面（loadtest_harness 的本機假站台用）
+"""
+import os
+import gzip
+import json
+import time
+import base64
+import threading
+
+MODE         = os.environ.get("CHASING_CASSETTE_MODE", "").strip().lower()
+PATH         = os.environ.get("CHASING_CASSETTE", "")
+LATENCY      = os.environ.get("CHASING_CASSETTE_LATENCY", "0").strip().lower()
+HTTP_DRIVER  = os.environ.get("CHASING_HTTP_DRIVER", "").strip() not in ("", "0")
+
+class CassetteMiss(KeyError):
+    """重播時找不到對應的錄製紀錄。"""
+
+def recording():
+    return MODE == "record" and bool(PATH)
+
+def replaying():
+    return MODE == "replay" and bool(PATH)
+
+def active():
+    return recording() or replaying()
+
+def browserless():
+    """不需要 Edge driver（重播或 HTTP driver）。"""
+    return replaying() or HTTP_DRIVER
+
+# -----------------------------
+# 檔案讀寫
+# -----------------------------
+_lock = threading.Lock()
+
+def _open(mode):
+    if PATH.endswith(".gz"):
+        return gzip.open(PATH, mode + "t", encoding="utf-8")
+    return open(PATH, mode, encoding="utf-8")
+
+def _append(entry):
+    with _lock:
+        with _open("a") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+class _Tape:
+    """重播用：依 exact key 取第一筆未用過的紀錄，找不到時退回只比對方法 + 網址。"""
+    def __init__(self):
+        self.entries = []
+        self.exact = {}
+        self.loose = {}
+        if os.path.exists(PATH):
+            with _open("r") as f:
+                for line in f:
+                    if line.strip():
+                        self.entries.append(json.loads(line))
+        for i, e in enumerate(self.entries):
+            self.exact.setdefault((e["kind"], e["key"]), []).append(i)
+            self.loose.setdefault((e["kind"], e["loose"]), []).append(i)
+        self.used = [False] * len(self.entries)
+        print(f"📼 cassette 重播：{PATH}（{len(self.entries)} 筆）")
+
+    def take(self, kind, key, loose):
+        with _lock:
+            for index in (self.exact.get((kind, key), []), self.loose.get((kind, loose), [])):
+                for i in index:
+                    if not self.used[i]:
+                        self.used[i] = True
+                        return self.entries[i]
+        raise CassetteMiss(f"{kind}: {loose}")
+
+_tape = None
+
+def _get_tape():
+    global _tape
+    if _tape is None:
+        _tape = _Tape()
+    return _tape
+
+def _replay(kind, key, loose):
+    entry = _get_tape().take(kind, key, loose)
+    if LATENCY == "recorded":
+        time.sleep(entry.get("elapsed", 0))
+    else:
+        try:
+            time.sleep(float(LATENCY))
+        except ValueError:
+            pass
+    return entry
+
+def _record(kind, key, loose, response, elapsed):
+    _append({"kind": kind, "key": key, "loose": loose, "elapsed": round(elapsed, 4), "response": response})
+
+def _canon(obj):
+    if obj is None:
+        return ""
+    if isinstance(obj, bytes):
+        return obj.decode("utf-8", errors="replace")
+    if isinstance(obj, dict):
+        return json.dumps(obj, sort_keys=True, ensure_ascii=False, default=str)
+    if isinstance(obj, (list, tuple)):
+        return json.dumps([list(x) if isinstance(x, tuple) else x for x in obj], ensure_ascii=False, default=str)
+    return str(obj)
+
+# -----------------------------
+# gspread HTTP 層
+# -----------------------------
+def _build_response(data):
+    import requests
+    from requests.structures import CaseInsensitiveDict
+
+    resp = requests.models.Response()
+    resp.status_code = data["status"]
+    resp.headers = CaseInsensitiveDict(data.get("headers", {}))
+    resp._content = base64.b64decode(data["body"])
+    resp.encoding = "utf-8"
+    resp.url = data.get("url", "")
+    return resp
+
+def _dump_response(resp):
+    return {
+        "status": resp.status_code,
+        "headers": dict(resp.headers),
+        "body": base64.b64encode(resp.content).decode("ascii"),
+        "url": str(resp.url),
+    }
+
+def wrap_http_request(orig_request):
+    """包裝 gspread 的 request(method, endpoint, params=…, data=…, json=…, …)。"""
+    def request(method, endpoint, params=None, data=None, json=None, files=None, headers=None, **kw):
+        loose = f"{str(method).upper()} {endpoint}"
+        key = f"{loose} {_canon(params)} {_canon(json if json is not None else data)}"
+        if replaying():
+            resp = _build_response(_replay("http", key, loose)["response"])
+            if not resp.ok:
+                from gspread.exceptions import APIError
+                raise APIError(resp)
+            return resp
+
+        t0 = time.perf_counter()
+        try:
+            resp = orig_request(method, endpoint, params=params, data=data, json=json,
+                                files=files, headers=headers, **kw)
+        except Exception as e:
+            err_resp = getattr(e, "response", None)
+            if err_resp is not None and hasattr(err_resp, "status_code"):
+                _record("http", key, loose, _dump_response(err_resp), time.perf_counter() - t0)
+            raise
+        _record("http", key, loose, _dump_response(resp), time.perf_counter() - t0)
+        return resp
+    return request
+
+# -----------------------------
+# googleapiclient（httplib2 介面）
+# -----------------------------
+class CassetteHttp:
+    def __init__(self, inner=None):
+        self.inner = inner
+
+    def request(self, uri, method="GET", body=None, headers=None, **kwargs):
+        import httplib2
+
+        loose = f"{method.upper()} {str(uri).split('?')[0]}"
+        key = f"{method.upper()} {uri} {_canon(body)}"
+        if replaying():
+            data = _replay("googleapi", key, loose)["response"]
+            return httplib2.Response(data["headers"]), base64.b64decode(data["body"])
+        t0 = time.perf_counter()
+        resp, content = self.inner.request(uri, method=method, body=body, headers=headers, **kwargs)
+        headers_out = {k: v for k, v in dict(resp).items()}
+        headers_out["status"] = str(resp.status)
+        _record("googleapi", key, loose,
+                {"headers": headers_out, "body": base64.b64encode(content or b"").decode("ascii")},
+                time.perf_counter() - t0)
+        return resp, content
+
+    def close(self):
+        if self.inner is not None and hasattr(self.inner, "close"):
+            self.inner.close()
+
+# -----------------------------
+# Selenium：錄製 page_source / 重播時以 BeautifulSoup 模擬 find_element
+# -----------------------------
+class RecordingDriver:
+    def __init__(self, driver):
+        self._driver = driver
+
+    def get(self, url):
+        t0 = time.perf_counter()
+        result = self._driver.get(url)
+        _record("page", url, url, {"html": self._driver.page_source}, time.perf_counter() - t0)
+        return result
+
+    @property
+    def page_source(self):
+        return self._driver.page_source
+
+    def __getattr__(self, name):
+        return getattr(self._driver, name)
+
+class ReplayDriver:
+    def __init__(self):
+        self._html = ""
+        self._soup = None
+
+    def get(self, url):
+        self._html = _replay("page", url, url)["response"]["html"]
+        self._soup = None
+
+    @property
+    def page_source(self):
+        return self._html
+
+    def find_element(self, by="id", value=None):
+        from bs4 import BeautifulSoup
+        from selenium.common.exceptions import NoSuchElementException
+
+        if self._soup is None:
+            self._soup = BeautifulSoup(self._html, "html.parser")
+        selector = f"#{value}" if by == "id" else value
+        el = self._soup.select_one(selector)
+        if el is None:
+            raise NoSuchElementException(f"{by}={value}")
+        return el
+
+    def find_elements(self, by="id", value=None):
+        try:
+            return [self.find_element(by, value)]
+        except Exception:
+            return []
+
+    def quit(self):
+        pass
+
+class HttpDriver(ReplayDriver):
+    """以 requests 直接抓頁面（不執行 JavaScript），介面與 ReplayDriver 相同。"""
+    def __init__(self):
+        import requests
+
+        super().__init__()
+        self._session = requests.Session()
+
+    def get(self, url):
+        resp = self._session.get(url, timeout=60)
+        resp.encoding = resp.encoding or "utf-8"
+        self._html = resp.text
+        self._soup = None
+
+    def quit(self):
+        self._session.close()
+
+def driver(factory):
+    """factory：建立真正 WebDriver 的函式；重播或使用 HTTP driver 時不會被呼叫。"""
+    if replaying():
+        return ReplayDriver()
+    if HTTP_DRIVER:
+        factory = HttpDriver
+    if recording():
+        print(f"📼 cassette 錄製：{PATH}")
+        return RecordingDriver(factory())
+    return factory()
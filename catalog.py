@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本機目錄查詢：把 Status、Rating、mglinks_checkList 載入本機 SQLite（catalog.db），
+演員、製作商、類別、狀態、GB/hr 都有索引，篩選與統計不必打開試算表等 COUNTIFS / VLOOKUP 重算。
+
+    - refresh：先查一次 Drive modifiedTime，沒變就不動；有變時以 sheet_snapshot 讀取，
+      依每列的摘要只寫入新增 / 變動的列、刪除已不存在的列
+    - 演員、類別（「 ; 」分隔的多值欄位）拆成連結表，依單一演員 / 類別查詢時走索引
+
+用法：
+    python catalog.py refresh
+    python catalog.py titles --actor 河北彩花 --status "尚無 4K 資源"
+    python catalog.py count --by actor --rating Failed --status 等待下載
+    python catalog.py magnets --studio MOODYZ --min-gbph 8
+    python catalog.py sql "SELECT status, COUNT(*) FROM titles GROUP BY status"
+查詢前加 --refresh 會先同步一次。
+"""
+import os
+import time
+import argparse
+import sqlite3
+import hashlib
+from datetime import datetime
+
+# -----------------------------
+# 設定
+# -----------------------------
+CATALOG_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "catalog.db")
+STATUS_TAB      = "Status"
+RATING_TAB      = "Rating"
+MGLINKS_TAB     = "mglinks_checkList"
+MULTI_SEP       = " ; "
+DEFAULT_LIMIT   = 50
+
+# 工作表標頭 → catalog 欄位
+COLUMN_MAP = {
+    "識別碼": "ident", "發行日期": "release_date", "長度": "length", "製作商": "studio", "發行商": "label",
+    "類別": "genres", "演員": "actors", "磁力名稱": "magnet_name", "檔案大小": "size_gb",
+    "分享日期": "share_date", "Magnet 連結": "magnet", "每小時檔案大小 (GB/hr)": "gb_per_hr",
+    "是否為 4K 資源": "is_4k", "tag": "tag", "狀態": "status", "評級": "rating", "備註": "note",
+}
+TITLE_FIELDS  = ["release_date", "length", "studio", "label", "genres", "actors", "magnet_name", "size_gb",
+                 "share_date", "magnet", "gb_per_hr", "is_4k", "tag", "status", "rating"]
+MAGNET_FIELDS = ["ident", "release_date", "length", "studio", "label", "genres", "actors", "magnet_name",
+                 "size_gb", "share_date", "magnet", "gb_per_hr", "is_4k", "tag"]
+ACTOR_FIELDS  = ["rating", "note"]
+REAL_FIELDS   = {"size_gb", "gb_per_hr"}
+
+# -----------------------------
+# open_catalog
+# -----------------------------
+def open_catalog(db_path=CATALOG_DB_PATH):
+    conn = sqlite3.connect(db_path)
+    conn.executescript(f"""
+        CREATE TABLE IF NOT EXISTS titles (
+            ident TEXT PRIMARY KEY, digest TEXT, {', '.join(f'{c} {_sql_type(c)}' for c in TITLE_FIELDS)}
+        );
+        CREATE TABLE IF NOT EXISTS magnets (
+            key TEXT PRIMARY KEY, digest TEXT, {', '.join(f'{c} {_sql_type(c)}' for c in MAGNET_FIELDS)}
+        );
+        CREATE TABLE IF NOT EXISTS actors (
+            actor TEXT PRIMARY KEY, digest TEXT, rating TEXT, note TEXT
+        );
+        CREATE TABLE IF NOT EXISTS actor_links (tab TEXT, key TEXT, ident TEXT, actor TEXT);
+        CREATE TABLE IF NOT EXISTS genre_links (tab TEXT, key TEXT, ident TEXT, genre TEXT);
+        CREATE TABLE IF NOT EXISTS sources (
+            tab TEXT PRIMARY KEY, modified_time TEXT, rows INTEGER, refreshed_at TEXT
+        );
+
+        CREATE INDEX IF NOT EXISTS idx_titles_status  ON titles (status);
+        CREATE INDEX IF NOT EXISTS idx_titles_studio  ON titles (studio);
+        CREATE INDEX IF NOT EXISTS idx_titles_gbph    ON titles (gb_per_hr);
+        CREATE INDEX IF NOT EXISTS idx_titles_release ON titles (release_date);
+        CREATE INDEX IF NOT EXISTS idx_magnets_ident  ON magnets (ident);
+        CREATE INDEX IF NOT EXISTS idx_magnets_studio ON magnets (studio);
+        CREATE INDEX IF NOT EXISTS idx_magnets_gbph   ON magnets (gb_per_hr);
+        CREATE INDEX IF NOT EXISTS idx_actors_rating  ON actors (rating COLLATE NOCASE);
+        CREATE INDEX IF NOT EXISTS idx_actor_links    ON actor_links (actor, ident);
+        CREATE INDEX IF NOT EXISTS idx_actor_links_key ON actor_links (tab, key);
+        CREATE INDEX IF NOT EXISTS idx_genre_links    ON genre_links (genre, ident);
+        CREATE INDEX IF NOT EXISTS idx_genre_links_key ON genre_links (tab, key);
+    """)
+    return conn
+
+def _sql_type(col):
+    if col in REAL_FIELDS:
+        return "REAL"
+    return "INTEGER" if col == "is_4k" else "TEXT"
+
+# -----------------------------
+# 列轉換：工作表文字 → catalog 值
+# -----------------------------
+def _digest(texts):
+    return hashlib.blake2b("\x1f".join(texts).encode("utf-8"), digest_size=8).hexdigest()
+
+def _value(col, text):
+    text = str(text).strip()
+    if col in REAL_FIELDS:
+        try:
+            return float(text)
+        except ValueError:
+            return None
+    if col == "is_4k":
+        return 1 if text.upper() == "TRUE" else 0
+    if col == "ident":
+        return text.upper()
+    return text
+
+def _records(values):
+    """get_all_values → [(摘要, {catalog 欄位: 值}), ...]；沒有識別碼 / 演員的空白列略過。"""
+    if not values:
+        return []
+    cols = [COLUMN_MAP.get(h.strip()) for h in values[0]]
+    out = []
+    for row in values[1:]:
+        texts = [str(v).strip() for v in row]
+        rec = {c: _value(c, v) for c, v in zip(cols, texts) if c}
+        out.append((_digest(texts), rec))
+    return out
+
+def _split(cell):
+    return [p.strip() for p in str(cell or "").split(MULTI_SEP.strip()) if p.strip()]
+
+# -----------------------------
+# _sync：依摘要比對，寫入新增 / 變動的列，刪除已不存在的列
+#    records：{主鍵: (摘要, 欄位)}
+# -----------------------------
+def _sync(conn, tab, table, key_col, fields, records):
+    current = dict(conn.execute(f"SELECT {key_col}, digest FROM {table}"))
+    changed = [(k, d, rec) for k, (d, rec) in records.items() if current.get(k) != d]
+    removed = [k for k in current if k not in records]
+
+    conn.executemany(f"DELETE FROM {table} WHERE {key_col} = ?", [(k,) for k in removed])
+    conn.executemany(
+        f"INSERT OR REPLACE INTO {table} ({key_col}, digest, {', '.join(fields)}) "
+        f"VALUES ({', '.join('?' * (len(fields) + 2))})",
+        [[k, d] + [rec.get(c) for c in fields] for k, d, rec in changed],
+    )
+    if table != "actors":
+        stale = [(tab, k) for k in removed] + [(tab, k) for k, _, _ in changed]
+        for link in ("actor_links", "genre_links"):
+            conn.executemany(f"DELETE FROM {link} WHERE tab = ? AND key = ?", stale)
+        conn.executemany("INSERT INTO actor_links VALUES (?, ?, ?, ?)",
+                         [(tab, k, rec["ident"] if "ident" in rec else k, a)
+                          for k, _, rec in changed for a in _split(rec.get("actors"))])
+        conn.executemany("INSERT INTO genre_links VALUES (?, ?, ?, ?)",
+                         [(tab, k, rec["ident"] if "ident" in rec else k, g)
+                          for k, _, rec in changed for g in _split(rec.get("genres"))])
+    return len(changed), len(removed)
+
+def sync_values(conn, tab, values, modified_time=None):
+    """把一個分頁的 get_all_values 結果同步進 catalog，回傳 (寫入列數, 刪除列數)。"""
+    recs = _records(values)
+    with conn:
+        if tab == STATUS_TAB:
+            records = {rec["ident"]: (d, rec) for d, rec in recs if rec.get("ident")}
+            result = _sync(conn, tab, "titles", "ident", TITLE_FIELDS, records)
+        elif tab == RATING_TAB:
+            # Rating 的「演員」欄對應到 actors 欄位名稱
+            records = {rec["actors"]: (d, rec) for d, rec in recs if rec.get("actors")}
+            result = _sync(conn, tab, "actors", "actor", ACTOR_FIELDS, records)
+        else:
+            records = {d: (d, rec) for d, rec in recs if rec.get("ident")}
+            result = _sync(conn, tab, "magnets", "key", MAGNET_FIELDS, records)
+        conn.execute("INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?)",
+                     (tab, modified_time, len(records), datetime.now().isoformat(timespec="seconds")))
+    return result
+
+# -----------------------------
+# refresh：試算表有變動時才讀取各分頁（sheet_snapshot 也會沿用未變動的本機快照）
+# -----------------------------
+def refresh(conn, force=False, tabs=(STATUS_TAB, RATING_TAB, MGLINKS_TAB)):
+    import find_Mglinks
+    import sheet_snapshot
+
+    ss = find_Mglinks.get_client().open_by_key(find_Mglinks.SPREADSHEET_ID)
+    mtime = sheet_snapshot.modified_time(ss)
+    known = dict(conn.execute("SELECT tab, modified_time FROM sources"))
+    if not force and all(known.get(tab) == mtime for tab in tabs):
+        print(f"⚡ catalog 已是最新（{mtime}）")
+        return
+    for tab in tabs:
+        if not force and known.get(tab) == mtime:
+            continue
+        values = sheet_snapshot.get_all_values(ss.worksheet(tab), use_cache=not force, mtime=mtime)
+        written, removed = sync_values(conn, tab, values, mtime)
+        print(f"🔄 {tab}：{len(values) - 1 if values else 0} 列，寫入 {written}、刪除 {removed}")
+
+# -----------------------------
+# 篩選條件：titles（alias t）與 magnets（alias m）共用
+# -----------------------------
+def _where(args, alias, table):
+    clauses, params = [], []
+    if args.actor:
+        clauses.append(f"{alias}.ident IN (SELECT ident FROM actor_links WHERE actor = ?)")
+        params.append(args.actor)
+    if args.genre:
+        clauses.append(f"{alias}.ident IN (SELECT ident FROM genre_links WHERE genre = ?)")
+        params.append(args.genre)
+    if args.rating:
+        clauses.append(f"{alias}.ident IN (SELECT l.ident FROM actor_links l JOIN actors a ON a.actor = l.actor "
+                       f"WHERE a.rating = ? COLLATE NOCASE)")
+        params.append(args.rating)
+    if args.status:
+        marks = ", ".join("?" * len(args.status))
+        if table == "titles":
+            clauses.append(f"{alias}.status IN ({marks})")
+        else:
+            clauses.append(f"{alias}.ident IN (SELECT ident FROM titles WHERE status IN ({marks}))")
+        params.extend(args.status)
+    if args.studio:
+        clauses.append(f"{alias}.studio = ?")
+        params.append(args.studio)
+    if args.label:
+        clauses.append(f"{alias}.label = ?")
+        params.append(args.label)
+    if args.min_gbph is not None:
+        clauses.append(f"{alias}.gb_per_hr > ?")
+        params.append(args.min_gbph)
+    if args.max_gbph is not None:
+        clauses.append(f"{alias}.gb_per_hr <= ?")
+        params.append(args.max_gbph)
+    if args.since:
+        clauses.append(f"{alias}.release_date >= ?")
+        params.append(args.since)
+    if args.ident:
+        clauses.append(f"{alias}.ident = ?")
+        params.append(args.ident.strip().upper())
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+# -----------------------------
+# 查詢
+# -----------------------------
+TITLE_COLUMNS  = ["ident", "release_date", "studio", "actors", "size_gb", "gb_per_hr", "status", "rating"]
+MAGNET_COLUMNS = ["ident", "release_date", "studio", "actors", "magnet_name", "size_gb", "gb_per_hr", "tag"]
+GROUP_BY = {
+    "status": ("t.status", ""),
+    "studio": ("t.studio", ""),
+    "label":  ("t.label", ""),
+    "actor":  ("l.actor", " JOIN actor_links l ON l.tab = 'Status' AND l.key = t.ident"),
+    "genre":  ("g.genre", " JOIN genre_links g ON g.tab = 'Status' AND g.key = t.ident"),
+    "rating": ("a.rating", " JOIN actor_links l ON l.tab = 'Status' AND l.key = t.ident"
+                           " JOIN actors a ON a.actor = l.actor"),
+}
+
+def query_titles(conn, args):
+    where, params = _where(args, "t", "titles")
+    sql = (f"SELECT {', '.join('t.' + c for c in TITLE_COLUMNS)} FROM titles t{where} "
+           f"ORDER BY t.release_date DESC LIMIT ?")
+    return TITLE_COLUMNS, conn.execute(sql, params + [args.limit]).fetchall()
+
+def query_magnets(conn, args):
+    where, params = _where(args, "m", "magnets")
+    sql = (f"SELECT {', '.join('m.' + c for c in MAGNET_COLUMNS)} FROM magnets m{where} "
+           f"ORDER BY m.gb_per_hr DESC, m.release_date DESC LIMIT ?")
+    return MAGNET_COLUMNS, conn.execute(sql, params + [args.limit]).fetchall()
+
+def query_count(conn, args):
+    """
+    依演員 / 類別 / 評級分組時，一部片會對應多列（每個演員一列）：
+        - 演員 / 類別 / 評級的篩選套用在分組的那一列，而不是整部片（"A ; B" 只有 A 是 Failed 時不會把 B 算進去）
+        - 先以子查詢去重成每個 (分組, 識別碼) 一列，再加總，同一部片的多個演員落在同一組時只算一次
+    """
+    expr, join = GROUP_BY[args.by]
+    per_row = {
+        "actor":  {"actor": "l.actor = ?", "rating": "a.rating = ? COLLATE NOCASE"},
+        "rating": {"actor": "l.actor = ?", "rating": "a.rating = ? COLLATE NOCASE"},
+        "genre":  {"genre": "g.genre = ?"},
+    }.get(args.by, {})
+    if args.by == "actor" and args.rating:
+        join += " JOIN actors a ON a.actor = l.actor"
+    where, params = _where(argparse.Namespace(**{**vars(args), **{k: None for k in per_row}}), "t", "titles")
+    extra = [(clause, getattr(args, k)) for k, clause in per_row.items() if getattr(args, k)]
+    if extra:
+        where += (" AND " if where else " WHERE ") + " AND ".join(clause for clause, _ in extra)
+        params += [value for _, value in extra]
+    sql = (f"SELECT grp, COUNT(*) AS titles, ROUND(SUM(size_gb), 1) AS size_gb, "
+           f"ROUND(AVG(gb_per_hr), 2) AS avg_gbph FROM ("
+           f"SELECT DISTINCT {expr} AS grp, t.ident, t.size_gb, t.gb_per_hr FROM titles t{join}{where}) "
+           f"GROUP BY grp ORDER BY titles DESC LIMIT ?")
+    return [args.by, "titles", "size_gb", "avg_gbph"], conn.execute(sql, params + [args.limit]).fetchall()
+
+def query_sql(conn, args):
+    # 以唯讀方式開啟，避免誤改 catalog
+    ro = sqlite3.connect(f"file:{args.db}?mode=ro", uri=True)
+    cur = ro.execute(args.query)
+    return [d[0] for d in cur.description or []], cur.fetchall()
+
+def print_table(columns, rows, width=40):
+    cells = [[("" if v is None else str(v))[:width] for v in r] for r in rows]
+    widths = [max([len(c)] + [len(r[i]) for r in cells]) for i, c in enumerate(columns)]
+    print("  ".join(c.ljust(w) for c, w in zip(columns, widths)))
+    for r in cells:
+        print("  ".join(v.ljust(w) for v, w in zip(r, widths)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Status / Rating / mglinks 的本機索引查詢")
+    parser.add_argument("--db", default=CATALOG_DB_PATH)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("refresh", help="從試算表同步（只寫入變動的列）")
+    p.add_argument("--force", action="store_true", help="忽略 modifiedTime 與本機快照，重新讀取所有分頁")
+
+    for name, text in [("titles", "篩選 Status 的片"), ("magnets", "篩選 mglinks 的磁力列"),
+                       ("count", "依欄位分組統計 Status 的片")]:
+        p = sub.add_parser(name, help=text)
+        p.add_argument("--actor")
+        p.add_argument("--genre")
+        p.add_argument("--studio")
+        p.add_argument("--label")
+        p.add_argument("--status", action="append", help="可重複指定")
+        p.add_argument("--rating", help="演員評級（Rating 表），例如 Failed")
+        p.add_argument("--min-gbph", type=float, help="每小時檔案大小大於此值")
+        p.add_argument("--max-gbph", type=float)
+        p.add_argument("--since", help="發行日期不早於（YYYY-MM-DD）")
+        p.add_argument("--ident")
+        p.add_argument("--limit", type=int, default=DEFAULT_LIMIT)
+        p.add_argument("--refresh", action="store_true", help="查詢前先同步")
+        if name == "count":
+            p.add_argument("--by", choices=sorted(GROUP_BY), default="status")
+
+    p = sub.add_parser("sql", help="直接執行唯讀 SQL")
+    p.add_argument("query")
+    args = parser.parse_args()
+
+    conn = open_catalog(args.db)
+    if args.command == "refresh" or getattr(args, "refresh", False):
+        refresh(conn, force=getattr(args, "force", False))
+    if args.command != "refresh":
+        t0 = time.perf_counter()
+        columns, rows = {"titles": query_titles, "magnets": query_magnets,
+                         "count": query_count, "sql": query_sql}[args.command](conn, args)
+        elapsed = (time.perf_counter() - t0) * 1000
+        print_table(columns, rows)
+        print(f"（{len(rows)} 列，{elapsed:.1f} ms）")
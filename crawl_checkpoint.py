@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+find_Mglinks 的爬取 checkpoint：記錄這次要抓的識別碼清單，以及每個已抓完的識別碼與解析出的列。
+每完成一個識別碼就在一個 SQLite 交易內寫入，行程在任何時間點中斷都不會留下半筆紀錄。
+
+下次執行時若有未完成的 checkpoint，find_Mglinks 不重建 mglinks_checkList，
+而是沿用原本的識別碼清單從第一個未完成的繼續抓，並以 missing_rows 比對工作表，
+把已抓完但還沒寫進工作表的列補上。整輪完成後 finish 清掉 checkpoint。
+"""
+import os
+import json
+import sqlite3
+from collections import Counter
+from datetime import datetime
+
+# -----------------------------
+# 設定
+# -----------------------------
+CHECKPOINT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "crawl_checkpoint.db")
+
+# -----------------------------
+# open_checkpoint
+# -----------------------------
+def open_checkpoint(db_path=CHECKPOINT_DB_PATH):
+    conn = sqlite3.connect(db_path)
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS runs (
+            tab      TEXT PRIMARY KEY,
+            codes    TEXT,
+            started  TEXT
+        );
+        CREATE TABLE IF NOT EXISTS done (
+            tab      TEXT,
+            seq      INTEGER,
+            ident    TEXT,
+            rows     TEXT,
+            finished TEXT,
+            PRIMARY KEY (tab, seq)
+        );
+    """)
+    return conn
+
+# -----------------------------
+# start / pending_codes / finish
+# -----------------------------
+def start(conn, tab, codes):
+    """開始新的一輪：清掉同一個工作表的舊 checkpoint，記下這次的識別碼清單。"""
+    with conn:
+        conn.execute("DELETE FROM done WHERE tab = ?", (tab,))
+        conn.execute("INSERT OR REPLACE INTO runs (tab, codes, started) VALUES (?, ?, ?)",
+                     (tab, json.dumps(list(codes), ensure_ascii=False),
+                      datetime.now().isoformat(timespec="seconds")))
+
+def pending_codes(conn, tab):
+    """未完成的一輪的識別碼清單；沒有未完成的 checkpoint 時回傳 None。"""
+    row = conn.execute("SELECT codes FROM runs WHERE tab = ?", (tab,)).fetchone()
+    return json.loads(row[0]) if row else None
+
+def finish(conn, tab):
+    with conn:
+        conn.execute("DELETE FROM done WHERE tab = ?", (tab,))
+        conn.execute("DELETE FROM runs WHERE tab = ?", (tab,))
+
+# -----------------------------
+# mark_done / remaining / done_rows
+# -----------------------------
+def mark_done(conn, tab, seq, ident, rows):
+    with conn:
+        conn.execute("INSERT OR REPLACE INTO done (tab, seq, ident, rows, finished) VALUES (?, ?, ?, ?, ?)",
+                     (tab, seq, str(ident).strip(), json.dumps(rows, ensure_ascii=False, default=str),
+                      datetime.now().isoformat(timespec="seconds")))
+
+def remaining(conn, tab):
+    """[(seq, 識別碼), ...]：清單中還沒抓完的，依原本順序。"""
+    codes = pending_codes(conn, tab) or []
+    finished = {r[0] for r in conn.execute("SELECT seq FROM done WHERE tab = ?", (tab,))}
+    return [(seq, code) for seq, code in enumerate(codes) if seq not in finished]
+
+def done_rows(conn, tab):
+    """[(識別碼, 列), ...]：已抓完的，依原本順序。"""
+    return [(ident, json.loads(rows))
+            for ident, rows in conn.execute("SELECT ident, rows FROM done WHERE tab = ? ORDER BY seq", (tab,))]
+
+# -----------------------------
+# missing_rows：checkpoint 中有、工作表上還沒有的列
+#    sheet_values：工作表的資料列（不含標題列），第一欄為識別碼
+#    append 依序寫入，同一識別碼寫到一半時工作表上會是前幾列，只補後面缺的部分
+# -----------------------------
+def missing_rows(sheet_values, done):
+    on_sheet = Counter(str(row[0]).strip() for row in sheet_values if row)
+    missing = []
+    for ident, rows in done:
+        already = min(on_sheet[ident], len(rows))
+        on_sheet[ident] -= already
+        missing.extend(rows[already:])
+    return missing
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+重新爬取排程：記錄每個識別碼的爬取歷史（上次爬取時間、磁力清單摘要、連續沒有變化的次數），
+決定這次 find_Mglinks 要抓哪些詳細頁、以什麼順序抓。
+
+    - 新識別碼（Status 與歷史都沒有）最優先
+    - 下載完成 / 已閱 / 跳過 / 下載中（find_Mglinks 不會再更新磁力欄位的狀態）與已封存的識別碼永不重抓
+    - 其餘（尚無 4K 資源、等待下載）磁力清單沒變化時以指數退避延後，發行越久退避越長；
+      到期的依「發行日期較新、最近有變化」排序，超過 CRAWL_BUDGET 的留待下次
+"""
+import os
+import json
+import hashlib
+import sqlite3
+from datetime import datetime, timedelta
+
+# -----------------------------
+# 設定
+# -----------------------------
+HISTORY_DB_PATH  = os.path.join(os.path.dirname(os.path.abspath(__file__)), "crawl_history.db")
+NEVER_RECRAWL    = {"下載完成", "已閱", "跳過", "下載中"}
+BASE_INTERVAL    = timedelta(days=1)
+MAX_INTERVAL     = timedelta(days=60)
+OLD_RELEASE_DAYS = 180     # 發行超過這個天數，退避間隔加倍
+CRAWL_BUDGET     = None    # 每次最多抓幾個到期的舊識別碼（None = 不限；新識別碼不受限制）
+
+# -----------------------------
+# open_history
+# -----------------------------
+def open_history(db_path=HISTORY_DB_PATH):
+    conn = sqlite3.connect(db_path)
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS crawl (
+            ident          TEXT PRIMARY KEY,
+            first_seen     TEXT,
+            last_crawled   TEXT,
+            last_changed   TEXT,
+            next_due       TEXT,
+            unchanged      INTEGER DEFAULT 0,
+            magnet_digest  TEXT,
+            release_date   TEXT,
+            crawls         INTEGER DEFAULT 0
+        );
+    """)
+    return conn
+
+def _load(conn):
+    cols = ["ident", "last_changed", "next_due", "unchanged", "release_date"]
+    return {r[0]: dict(zip(cols, r)) for r in conn.execute(f"SELECT {', '.join(cols)} FROM crawl")}
+
+def _age_days(release_date, now):
+    try:
+        return (now - datetime.strptime(str(release_date), "%Y-%m-%d")).days
+    except ValueError:
+        return None
+
+# -----------------------------
+# plan：回傳這次要抓的識別碼（已排序）
+#    status：{識別碼: 狀態}（status_model.status_map）
+#    archived：已封存的識別碼集合（status_archive.archived_idents）
+# -----------------------------
+def plan(conn, codes, status, archived=(), now=None, budget=CRAWL_BUDGET):
+    now = now or datetime.now()
+    history = _load(conn)
+    new, due = [], []
+    skipped = {"terminal": 0, "backoff": 0, "budget": 0}
+    seen = set()
+    for code in codes:
+        ident = str(code).strip().upper()
+        if not ident or ident in seen:
+            continue
+        seen.add(ident)
+        st = status.get(ident)
+        if st in NEVER_RECRAWL or ident in archived:
+            skipped["terminal"] += 1
+            continue
+        h = history.get(ident)
+        if st is None and h is None:
+            new.append(code.strip())
+            continue
+        if h and h["next_due"] and h["next_due"] > now.isoformat(timespec="seconds"):
+            skipped["backoff"] += 1
+            continue
+        age = _age_days(h["release_date"], now) if h else None
+        # 發行日期較新、最近才有磁力變化的排前面
+        due.append(((age if age is not None else 0), (h["unchanged"] if h else 0), code.strip()))
+
+    due.sort()
+    if budget is not None and len(due) > budget:
+        skipped["budget"] = len(due) - budget
+        due = due[:budget]
+    selected = new + [code for _, _, code in due]
+    print(f"🗓️ 爬取排程：新識別碼 {len(new)}、到期 {len(due)}；略過 終態 {skipped['terminal']}、"
+          f"退避中 {skipped['backoff']}、超出預算 {skipped['budget']}")
+    return selected
+
+# -----------------------------
+# record：記錄一次爬取結果（rows：fetch_and_parse 回傳的列）
+# -----------------------------
+def _magnet_digest(rows):
+    magnets = sorted(json.dumps([r[10], r[8], r[13]], ensure_ascii=False, default=str) for r in rows if r[10])
+    return hashlib.blake2b("\n".join(magnets).encode("utf-8"), digest_size=8).hexdigest()
+
+def record(conn, identifier, rows, now=None):
+    now = now or datetime.now()
+    ident = str(identifier).strip().upper()
+    digest = _magnet_digest(rows)
+    release = rows[0][1] if rows else ""
+    ts = now.isoformat(timespec="seconds")
+
+    prev = conn.execute("SELECT magnet_digest, unchanged, first_seen, last_changed FROM crawl WHERE ident = ?",
+                        (ident,)).fetchone()
+    if prev is None or prev[0] != digest:
+        unchanged, last_changed = 0, ts
+    else:
+        unchanged, last_changed = prev[1] + 1, prev[3]
+
+    interval = BASE_INTERVAL * (2 ** min(unchanged, 10))
+    age = _age_days(release, now)
+    if age is not None and age > OLD_RELEASE_DAYS:
+        interval *= 2
+    next_due = (now + min(interval, MAX_INTERVAL)).isoformat(timespec="seconds")
+
+    conn.execute("""
+        INSERT INTO crawl (ident, first_seen, last_crawled, last_changed, next_due, unchanged, magnet_digest,
+                           release_date, crawls)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, 1)
+        ON CONFLICT(ident) DO UPDATE SET
+            last_crawled = excluded.last_crawled, last_changed = excluded.last_changed,
+            next_due = excluded.next_due, unchanged = excluded.unchanged,
+            magnet_digest = excluded.magnet_digest, release_date = excluded.release_date,
+            crawls = crawls + 1
+    """, (ident, prev[2] if prev else ts, ts, last_changed, next_due, unchanged, digest, release))
+    conn.commit()
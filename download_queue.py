@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+下載排程：從 Status 挑出「等待下載」的片，在磁碟與頻寬預算內依價值排序，
+透過 qBittorrent Web API 一次加入，成功加入的經由 Status journal 改成「下載中」。
+
+    - 排序：演員評級（RATING_ORDER，Failed 不下載）→ GB/hr 等級（>8、>4、其他）→ 發行日期（新的優先）
+    - 磁碟預算：qbCooking 所在磁碟的剩餘空間 − DISK_RESERVE_GB − qBittorrent 中尚未下載完的量
+    - 頻寬預算：BUDGET_HOURS 小時內能下載的量（qBittorrent 有設下載速度上限時以它為準）− 尚未下載完的量
+    - 依序放入預算；放不下的略過，讓後面較小的片補滿剩餘空間
+    - 已在 qBittorrent 中的 info-hash 不重複加入，Status 仍是「等待下載」的直接改成「下載中」
+
+用法：
+    python download_queue.py              （加入並更新 Status）
+    python download_queue.py --dry-run    （只列出會加入的片）
+環境變數 CHASING_QBT_URL / CHASING_QBT_USER / CHASING_QBT_PASSWORD 指定 Web UI 位址與帳號
+（loadtest_harness 指向本機的假 qBittorrent）。
+"""
+import os
+import time
+
+import google_client
+import magnet_index
+import run_metrics
+import status_journal
+import status_model
+
+# -----------------------------
+# 設定
+# -----------------------------
+sheet_url        = "https://docs.google.com/spreadsheets/d/1cizSVrySFHKYfngBhkCCNVRXRJiMYH_2ltts9YAdbEo/edit?usp=sharing"
+CREDENTIAL_PATH  = os.path.join(os.path.dirname(__file__), 'credentials.json')
+QBT_URL          = os.environ.get("CHASING_QBT_URL", "http://127.0.0.1:8080").rstrip("/")
+QBT_USER         = os.environ.get("CHASING_QBT_USER", "admin")
+QBT_PASSWORD     = os.environ.get("CHASING_QBT_PASSWORD", "")
+QB_SAVE_PATH     = os.environ.get("CHASING_QB_DIR", r"C:\Users\chen8\OneDrive\文件\ControllerDriver\qbCooking")
+QBT_CATEGORY     = "chasingForPeace"
+
+DISK_RESERVE_GB  = 50.0    # qbCooking 磁碟至少保留的空間
+BANDWIDTH_MBPS   = 100.0   # 下行頻寬（Mbit/s）；qBittorrent 有設全域下載上限時以上限為準
+BUDGET_HOURS     = 24.0    # 一次排入的量以這段時間內下載得完為上限
+MAX_BATCH        = 20      # 一次最多加入幾個
+ADD_POLL_TRIES   = 5       # 磁力連結是非同步加入：add 之後最多查幾次 maindata
+ADD_POLL_SECONDS = 2.0     # 每次查詢的間隔
+DEFAULT_SIZE_GB  = 20.0    # Status 沒有檔案大小時的估計值
+
+# 演員評級的優先順序（Rating 表「評級」欄的值，依自己的用語調整）；不在清單中的排在後面，Failed 不下載
+RATING_ORDER     = ["Excellent", "Good", "Normal"]
+RATING_EXCLUDED  = {"failed"}
+
+GB = 1000 ** 3
+
+# -----------------------------
+# QBittorrent：Web API v2（登入後以 SID cookie 呼叫）
+# -----------------------------
+class QBittorrent:
+    def __init__(self, url=QBT_URL, username=QBT_USER, password=QBT_PASSWORD):
+        import requests
+
+        self.url = url
+        self.session = requests.Session()
+        # qBittorrent 的 CSRF 檢查要求 Referer 與 Web UI 同源
+        self.session.headers["Referer"] = url
+        resp = self.session.post(f"{url}/api/v2/auth/login", data={"username": username, "password": password},
+                                 timeout=30)
+        resp.raise_for_status()
+        if resp.text.strip() != "Ok.":
+            raise RuntimeError(f"❌ qBittorrent 登入失敗：{resp.text.strip()}")
+
+    def maindata(self):
+        """{"torrents": {hash: {...}}, "server_state": {...}}"""
+        resp = self.session.get(f"{self.url}/api/v2/sync/maindata", params={"rid": 0}, timeout=30)
+        resp.raise_for_status()
+        run_metrics.inc("qbittorrent_api_calls_total", endpoint="maindata")
+        return resp.json()
+
+    def add(self, magnets, save_path=QB_SAVE_PATH, category=QBT_CATEGORY):
+        """一次加入多個磁力連結（urls 以換行分隔，multipart/form-data）。"""
+        fields = {"urls": "\n".join(magnets), "savepath": save_path, "category": category}
+        resp = self.session.post(f"{self.url}/api/v2/torrents/add",
+                                 files={k: (None, v) for k, v in fields.items()}, timeout=60)
+        resp.raise_for_status()
+        run_metrics.inc("qbittorrent_api_calls_total", endpoint="add")
+        if resp.text.strip() != "Ok.":
+            raise RuntimeError(f"❌ qBittorrent 加入失敗：{resp.text.strip()}")
+
+# -----------------------------
+# budget_gb：磁碟與頻寬預算（GB），扣掉 qBittorrent 中尚未下載完的量
+# -----------------------------
+def _free_disk_bytes(server_state):
+    free = server_state.get("free_space_on_disk")
+    if free is not None:
+        return free
+    import shutil
+    return shutil.disk_usage(QB_SAVE_PATH).free
+
+def budget_gb(maindata, reserve_gb=DISK_RESERVE_GB, bandwidth_mbps=BANDWIDTH_MBPS, hours=BUDGET_HOURS):
+    state = maindata.get("server_state", {})
+    left = sum(t.get("amount_left", 0) for t in maindata.get("torrents", {}).values()) / GB
+    disk = _free_disk_bytes(state) / GB - reserve_gb - left
+    rate = state.get("dl_rate_limit") or bandwidth_mbps * 1_000_000 / 8
+    bandwidth = rate * hours * 3600 / GB - left
+    print(f"💽 磁碟可用 {disk:.1f} GB、頻寬 {hours:g}h 可下載 {bandwidth:.1f} GB（進行中尚餘 {left:.1f} GB）")
+    return max(0.0, min(disk, bandwidth))
+
+# -----------------------------
+# rank：等待下載的片依價值排序 → [{ident, magnet, btih, size_gb, ...}, ...]
+# -----------------------------
+def _tier(gb_per_hr):
+    if gb_per_hr > 8:
+        return 0
+    if gb_per_hr > 4:
+        return 1
+    return 2
+
+def _rating_rank(rating):
+    order = [r.lower() for r in RATING_ORDER]
+    rating = str(rating).strip().lower()
+    return order.index(rating) if rating in order else len(order)
+
+def rank(status_df):
+    import pandas as pd
+
+    waiting = status_model.select(status_df, status_in={"等待下載"})
+    candidates = []
+    for ident, row in waiting.iterrows():
+        btih = magnet_index.normalize_btih(row["Magnet 連結"])
+        if not btih or str(row["評級"]).strip().lower() in RATING_EXCLUDED:
+            continue
+        size = row["檔案大小"]
+        per = row["每小時檔案大小 (GB/hr)"]
+        released = row["發行日期"]
+        candidates.append({
+            "ident": ident,
+            "magnet": str(row["Magnet 連結"]).strip(),
+            "btih": btih,
+            "size_gb": DEFAULT_SIZE_GB if pd.isna(size) or size <= 0 else float(size),
+            "rating": str(row["評級"]).strip(),
+            "tier": _tier(0.0 if pd.isna(per) else float(per)),
+            "released": "" if pd.isna(released) else released.strftime(status_model.DATE_FORMAT),
+        })
+    # 發行日期新的優先：先依日期遞減排序，再以穩定排序依評級、等級遞增
+    candidates.sort(key=lambda c: c["released"], reverse=True)
+    candidates.sort(key=lambda c: (_rating_rank(c["rating"]), c["tier"]))
+    return candidates
+
+# -----------------------------
+# pick：依序放進預算，放不下的略過
+# -----------------------------
+def pick(candidates, budget, existing_hashes=(), max_batch=MAX_BATCH):
+    chosen, used = [], 0.0
+    existing = set(existing_hashes)
+    for c in candidates:
+        if len(chosen) >= max_batch:
+            break
+        if c["btih"] in existing:
+            continue
+        if used + c["size_gb"] > budget:
+            continue
+        chosen.append(c)
+        existing.add(c["btih"])
+        used += c["size_gb"]
+    return chosen, used
+
+# -----------------------------
+# already_queued：Status 仍是「等待下載」、但 info-hash 已在 qBittorrent 中的識別碼
+#    （手動加入的，或上次 add 後還沒出現在 maindata 的）
+# -----------------------------
+def already_queued(status_df, hashes):
+    waiting = status_model.select(status_df, status_in={"等待下載"})
+    return [ident for ident, magnet in waiting["Magnet 連結"].items()
+            if magnet_index.normalize_btih(magnet) in hashes]
+
+# -----------------------------
+# wait_for_hashes：磁力連結加入後要等 qBittorrent 取得 metadata 才會出現在 maindata，多查幾次
+# -----------------------------
+def wait_for_hashes(qbt, hashes, tries=ADD_POLL_TRIES, interval=ADD_POLL_SECONDS):
+    present = set()
+    for attempt in range(tries):
+        if attempt:
+            time.sleep(interval)
+        present = set(qbt.maindata().get("torrents", {}))
+        if hashes <= present:
+            break
+    return present
+
+# -----------------------------
+# schedule：挑選、加入 qBittorrent，確認出現在清單中的才改成「下載中」
+# -----------------------------
+def schedule(ws, qbt, dry_run=False, max_batch=MAX_BATCH):
+    status_df = status_model.load_status_frame(ws, use_cache=False)
+    maindata = qbt.maindata()
+    existing = set(maindata.get("torrents", {}))
+    queued = already_queued(status_df, existing)
+    if queued:
+        print(f"🔁 已在 qBittorrent 中、Status 仍是等待下載：{', '.join(queued)}")
+    candidates = rank(status_df)
+    chosen, used = pick(candidates, budget_gb(maindata), existing, max_batch)
+    print(f"📋 等待下載 {len(candidates)} 個，這次加入 {len(chosen)} 個（{used:.1f} GB）")
+    for c in chosen:
+        print(f"  ⬇️ {c['ident']}：{c['size_gb']:.1f} GB，評級 {c['rating'] or '—'}，"
+              f"等級 {c['tier'] + 1}，發行 {c['released'] or '—'}")
+    if dry_run or not (chosen or queued):
+        return chosen
+
+    transitions = [(ident, "等待下載", "下載中") for ident in queued]
+    if chosen:
+        with run_metrics.stage("qbittorrent_add"):
+            qbt.add([c["magnet"] for c in chosen])
+        added = wait_for_hashes(qbt, {c["btih"] for c in chosen})
+        transitions += [(c["ident"], "等待下載", "下載中") for c in chosen if c["btih"] in added]
+        missing = [c["ident"] for c in chosen if c["btih"] not in added]
+        if missing:
+            print(f"⚠️ qBittorrent 清單中找不到：{', '.join(missing)}（狀態不變，下次執行時再確認）")
+        run_metrics.inc("downloads_queued_total", len(chosen) - len(missing))
+    status_journal.record(transitions, source="download_queue")
+    status_journal.commit(ws)
+    return chosen
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="依預算與優先順序把等待下載的片加入 qBittorrent")
+    parser.add_argument("--dry-run", action="store_true", help="只列出會加入的片，不呼叫 qBittorrent 加入")
+    parser.add_argument("--max", type=int, default=MAX_BATCH, help="一次最多加入幾個")
+    args = parser.parse_args()
+
+    run_metrics.start_run("download_queue")
+    scope = [
+        "https://spreadsheets.google.com/feeds",
+        "https://www.googleapis.com/auth/drive"
+    ]
+    client = google_client.authorize(CREDENTIAL_PATH, scope)
+    sheet_status = client.open_by_url(sheet_url).worksheet("Status")
+    schedule(sheet_status, QBittorrent(), dry_run=args.dry_run, max_batch=args.max)
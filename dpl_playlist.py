@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PotPlayer .dpl 播放清單：讀取既有清單、依資料夾內容增刪項目，
+保留每個項目的 played / start 等欄位與表頭設定，只有內容真的改變時才以原子方式寫回。
+"""
+import os
+import re
+import json
+import hashlib
+
+_ENTRY_RE = re.compile(r"^(\d+)\*([^*]+)\*(.*)$")
+
+# -----------------------------
+# parse_dpl：解析 .dpl → (表頭 [(key, value)], 項目 [{key: value}])
+# -----------------------------
+def parse_dpl(text):
+    header = []
+    entries = {}
+    order = []
+    for line in text.splitlines():
+        line = line.rstrip("\r")
+        if not line or line == "DAUMPLAYLIST":
+            continue
+        m = _ENTRY_RE.match(line)
+        if m:
+            idx, key, value = int(m.group(1)), m.group(2), m.group(3)
+            if idx not in entries:
+                entries[idx] = {}
+                order.append(idx)
+            entries[idx][key] = value
+        elif "=" in line:
+            key, value = line.split("=", 1)
+            header.append((key, value))
+    return header, [entries[i] for i in sorted(order)]
+
+# -----------------------------
+# render_dpl：組回 .dpl 內容（file / title 固定排在每個項目最前面）
+#    newline / trailing：換行字元與檔尾是否換行，沿用既有檔案的寫法（PotPlayer 存檔為 CRLF）
+# -----------------------------
+def render_dpl(header, entries, newline="\n", trailing=False):
+    lines = ["DAUMPLAYLIST"]
+    lines += [f"{k}={v}" for k, v in header]
+    for index, entry in enumerate(entries, start=1):
+        lines.append(f"{index}*file*{entry['file']}")
+        if "title" in entry:
+            lines.append(f"{index}*title*{entry['title']}")
+        for k, v in entry.items():
+            if k not in ("file", "title"):
+                lines.append(f"{index}*{k}*{v}")
+    return newline.join(lines) + (newline if trailing else "")
+
+def line_ending(text):
+    """既有內容的換行字元；新檔案沿用原本以文字模式寫檔的行為（os.linesep）。"""
+    if "\r\n" in text:
+        return "\r\n"
+    return "\n" if "\n" in text else os.linesep
+
+# -----------------------------
+# library_fingerprint：資料夾內容（檔名 + 建立時間）的指紋
+# -----------------------------
+def library_fingerprint(videos):
+    h = hashlib.sha1()
+    for filename, created_time in sorted(videos):
+        h.update(f"{filename}\0{created_time}\n".encode("utf-8"))
+    return h.hexdigest()
+
+# -----------------------------
+# merge_playlist：依 videos（已排序）重建項目，沿用舊項目的狀態欄位
+# -----------------------------
+def merge_playlist(header, old_entries, video_folder, videos, playname):
+    by_path = {os.path.normcase(e.get("file", "")): e for e in old_entries}
+    merged = []
+    added = 0
+    for filename, _ in videos:
+        full_path = os.path.join(video_folder, filename)
+        old = by_path.pop(os.path.normcase(full_path), None)
+        if old is None:
+            added += 1
+            entry = {"file": full_path, "title": filename, "played": "0"}
+        else:
+            entry = dict(old)
+            entry["file"] = full_path
+            entry.setdefault("title", filename)
+        merged.append(entry)
+    removed = len(by_path)
+
+    keys = [k for k, _ in header]
+    if not header:
+        header = [("playname", playname), ("topindex", "0"), ("saveplaypos", "0")]
+    elif "playname" not in keys:
+        header = [("playname", playname)] + header
+    else:
+        header = [(k, playname if k == "playname" else v) for k, v in header]
+    return header, merged, added, removed
+
+# -----------------------------
+# _atomic_write：先寫暫存檔再 os.replace，避免 PotPlayer / OneDrive 讀到一半的檔案
+# -----------------------------
+def _atomic_write(path, text, bom):
+    out_dir = os.path.dirname(path)
+    if out_dir and not os.path.isdir(out_dir):
+        os.makedirs(out_dir, exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8-sig" if bom else "utf-8", newline="") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+# -----------------------------
+# update_playlist：增量更新 .dpl
+#    - state_get / state_set：存放上次的指紋（例如媒體庫索引的 meta 表）
+#    - 回傳 True 表示有寫檔
+# -----------------------------
+def update_playlist(video_folder, output_path, videos, state_get=None, state_set=None):
+    fp = library_fingerprint(videos)
+    state_key = f"dpl:{os.path.normcase(os.path.abspath(output_path))}"
+    out_mtime = os.path.getmtime(output_path) if os.path.isfile(output_path) else None
+
+    if state_get:
+        last = json.loads(state_get(state_key) or "{}")
+        if out_mtime is not None and last.get("fp") == fp and last.get("mtime") == out_mtime:
+            print(f"⏭️ 資料夾與播放清單都沒有變動，略過：{output_path}")
+            return False
+
+    old_text, bom = "", False
+    if out_mtime is not None:
+        with open(output_path, "rb") as f:
+            raw = f.read()
+        bom = raw.startswith(b"\xef\xbb\xbf")
+        old_text = raw.decode("utf-8-sig", errors="replace")
+
+    header, old_entries = parse_dpl(old_text)
+    header, entries, added, removed = merge_playlist(
+        header, old_entries, video_folder, videos, os.path.basename(output_path))
+    new_text = render_dpl(header, entries, newline=line_ending(old_text),
+                          trailing=old_text.endswith("\n"))
+
+    # 以解析後的內容比較：PotPlayer 存檔的換行、項目內欄位順序不同都不算變動
+    wrote = parse_dpl(old_text) != (header, entries)
+    if wrote:
+        _atomic_write(output_path, new_text, bom)
+        print(f"🎉 播放清單已更新：{output_path}（新增 {added}，移除 {removed}）")
+    else:
+        print(f"✅ 播放清單內容沒有變化，不重寫：{output_path}")
+
+    if state_set:
+        state_set(state_key, json.dumps({"fp": fp, "mtime": os.path.getmtime(output_path)}))
+    return wrote
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+EBML（Matroska / MKV）基本讀寫：element ID、長度（variable-size integer）與各型別的值。
+buf 可以是 bytes 或 mmap；只會讀到實際走訪到的 element header，不會把整個檔案讀進記憶體。
+video_probe（讀取 Info / Tracks）與 mkv_tags（就地改寫 Tags）共用。
+"""
+import zlib
+import struct
+
+# -----------------------------
+# 常用 element ID
+# -----------------------------
+EBML            = 0x1A45DFA3
+SEGMENT         = 0x18538067
+SEEK_HEAD       = 0x114D9B74
+SEEK            = 0x4DBB
+SEEK_ID         = 0x53AB
+SEEK_POSITION   = 0x53AC
+INFO            = 0x1549A966
+TIMECODE_SCALE  = 0x2AD7B1
+DURATION        = 0x4489
+TRACKS          = 0x1654AE6B
+TRACK_ENTRY     = 0xAE
+TRACK_TYPE      = 0x83
+CODEC_ID        = 0x86
+DEFAULT_DURATION = 0x23E383
+VIDEO           = 0xE0
+PIXEL_WIDTH     = 0xB0
+PIXEL_HEIGHT    = 0xBA
+CLUSTER         = 0x1F43B675
+CUES            = 0x1C53BB6B
+TAGS            = 0x1254C367
+TAG             = 0x7373
+TARGETS         = 0x63C0
+TARGET_TYPE_VALUE = 0x68CA
+SIMPLE_TAG      = 0x67C8
+TAG_NAME        = 0x45A3
+TAG_STRING      = 0x4487
+VOID            = 0xEC
+CRC32           = 0xBF
+
+UNKNOWN_SIZE = -1
+
+class EBMLError(ValueError):
+    """不是合法的 EBML 結構。"""
+
+# -----------------------------
+# read_id / read_size
+# -----------------------------
+def _vint_length(first):
+    for n in range(8):
+        if first & (0x80 >> n):
+            return n + 1
+    raise EBMLError("無效的 variable-size integer")
+
+def read_id(buf, pos):
+    """回傳 (element ID（保留長度標記位元）, 佔用位元組數)。"""
+    n = _vint_length(buf[pos])
+    if n > 4:
+        raise EBMLError(f"element ID 長度 {n} 超過 4")
+    return int.from_bytes(buf[pos:pos + n], "big"), n
+
+def read_size(buf, pos):
+    """回傳 (資料長度, 佔用位元組數)；全部為 1 的長度代表未知長度（UNKNOWN_SIZE）。"""
+    first = buf[pos]
+    n = _vint_length(first)
+    value = first & (0xFF >> n)
+    for b in buf[pos + 1:pos + n]:
+        value = (value << 8) | b
+    if value == (1 << (7 * n)) - 1:
+        return UNKNOWN_SIZE, n
+    return value, n
+
+def read_header(buf, pos):
+    """回傳 (eid, size, data_start)。"""
+    eid, n1 = read_id(buf, pos)
+    size, n2 = read_size(buf, pos + n1)
+    return eid, size, pos + n1 + n2
+
+# -----------------------------
+# iter_children：走訪 [start, end) 內的子 element
+#    yield (eid, elem_start, data_start, size)；遇到未知長度的 element 後停止
+# -----------------------------
+def iter_children(buf, start, end):
+    pos = start
+    while pos < end:
+        try:
+            eid, size, data = read_header(buf, pos)
+        except (EBMLError, IndexError):
+            return
+        yield eid, pos, data, size
+        if size == UNKNOWN_SIZE:
+            return
+        pos = data + size
+
+def find_child(buf, start, end, eid):
+    for cid, elem, data, size in iter_children(buf, start, end):
+        if cid == eid:
+            return elem, data, size
+    return None
+
+# -----------------------------
+# 值的解碼
+# -----------------------------
+def read_uint(buf, data, size):
+    return int.from_bytes(buf[data:data + size], "big") if size else 0
+
+def read_float(buf, data, size):
+    if size == 4:
+        return struct.unpack(">f", buf[data:data + 4])[0]
+    if size == 8:
+        return struct.unpack(">d", buf[data:data + 8])[0]
+    return 0.0
+
+def read_string(buf, data, size):
+    return bytes(buf[data:data + size]).split(b"\x00", 1)[0].decode("utf-8", errors="replace")
+
+# -----------------------------
+# CRC-32：master element 的第一個子 element，涵蓋其後所有子 element（little-endian）
+# -----------------------------
+def crc32(payload):
+    return zlib.crc32(payload).to_bytes(4, "little")
+
+def split_crc(buf, data, size):
+    """回傳 (CRC-32 值的位置 or None, CRC-32 之後內容的起點)。"""
+    first = next(iter_children(buf, data, data + size), None)
+    if first and first[0] == CRC32 and first[3] == 4:
+        return first[2], first[2] + 4
+    return None, data
+
+# -----------------------------
+# Segment：open_segment / seek_positions
+# -----------------------------
+def open_segment(buf, size):
+    """回傳 (segment 資料起點, 結束位置, 長度欄位位置, 長度欄位位元組數)；不是 Matroska 時回傳 None。"""
+    eid, hsize, hdata = read_header(buf, 0)
+    if eid != EBML:
+        return None
+    pos = hdata + hsize
+    eid, n = read_id(buf, pos)
+    if eid != SEGMENT:
+        return None
+    seg_size, size_len = read_size(buf, pos + n)
+    seg_data = pos + n + size_len
+    seg_end = size if seg_size == UNKNOWN_SIZE else min(size, seg_data + seg_size)
+    return seg_data, seg_end, pos + n, size_len
+
+def seek_positions(buf, seg_data, seg_end):
+    """{element ID: 絕對位置}：先讀 SeekHead，再線性掃到第一個 Cluster 為止補上其餘的。"""
+    positions = {}
+    head = find_child(buf, seg_data, seg_end, SEEK_HEAD)
+    if head:
+        _, data, size = head
+        for eid, _, sdata, ssize in iter_children(buf, data, data + size):
+            if eid != SEEK:
+                continue
+            sid = pos = None
+            for cid, _, cdata, csize in iter_children(buf, sdata, sdata + ssize):
+                if cid == SEEK_ID:
+                    sid = read_uint(buf, cdata, csize)
+                elif cid == SEEK_POSITION:
+                    pos = read_uint(buf, cdata, csize)
+            if sid is not None and pos is not None:
+                positions.setdefault(sid, seg_data + pos)
+    for eid, elem, _, _ in iter_children(buf, seg_data, seg_end):
+        if eid == CLUSTER:
+            break
+        positions.setdefault(eid, elem)
+    return positions
+
+# -----------------------------
+# 編碼：encode_id / encode_size / element / void / fit
+# -----------------------------
+def encode_id(eid):
+    return eid.to_bytes((eid.bit_length() + 7) // 8, "big")
+
+def encode_size(n, length=None):
+    """以 length 位元組編碼長度；length 為 None 時取最短；放不下時丟出 EBMLError。"""
+    lengths = [length] if length else range(1, 9)
+    for L in lengths:
+        if n < (1 << (7 * L)) - 1:
+            return ((1 << (7 * L)) | n).to_bytes(L, "big")
+    raise EBMLError(f"長度 {n} 無法以 {length} 位元組編碼")
+
+def encode_uint(value):
+    return value.to_bytes(max(1, (value.bit_length() + 7) // 8), "big")
+
+def element(eid, payload, size_len=None):
+    if isinstance(payload, str):
+        payload = payload.encode("utf-8")
+    elif isinstance(payload, int):
+        payload = encode_uint(payload)
+    return encode_id(eid) + encode_size(len(payload), size_len) + payload
+
+def void(n):
+    """剛好 n 位元組的 Void element（n >= 2）。"""
+    for L in range(1, 9):
+        data = n - 1 - L
+        if 0 <= data < (1 << (7 * L)) - 1:
+            return bytes([VOID]) + encode_size(data, L) + b"\x00" * data
+    raise EBMLError(f"無法建立 {n} 位元組的 Void")
+
+def fit(eid, payload, avail):
+    """把 element 放進 avail 位元組的空間，剩餘以 Void 補滿；放不下回傳 None。
+    剩 1 位元組時（Void 至少 2 位元組），改用較長的長度欄位吸收。"""
+    min_len = len(encode_size(len(payload)))
+    for L in range(min_len, 9):
+        data = element(eid, payload, L)
+        rest = avail - len(data)
+        if rest == 0:
+            return data
+        if rest >= 2:
+            return data + void(rest)
+        if rest < 0:
+            return None
+    return None
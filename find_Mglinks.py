@@ -1,17 +1,30 @@
 import warnings
 warnings.filterwarnings("ignore", category=FutureWarning)
 
+import os
 import time
-import pandas as pd
-import requests
-from urllib3.exceptions import ProtocolError
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
-from googleapiclient.discovery import build
-from google.oauth2 import service_account
+
+# pandas / gspread / requests / googleapiclient 等較重的模組只在用到的函式裡才 import，
+# 讓 FETCH_NEW_MGLINKS = False 之類的短流程不必付出載入成本（CHASING_IMPORT_REPORT=1 可檢視）
+import cassette
+import crawl_checkpoint
+import crawl_scheduler
+import google_client
+import host_pacer
+import magnet_index
+import page_archive
+import run_metrics
+import sheet_snapshot
+import sheets_scheduler
+import status_archive
+import status_journal
 
 # 如果要用 Selenium 抓新的 mglinks，設為 True；如果直接用現有的 mglinks_checkList，設為 False
 FETCH_NEW_MGLINKS = True
+# 設為 True 時不開瀏覽器，直接以 page_archive 封存的詳細頁多核心重新解析，重建 mglinks_checkList
+REPARSE_FROM_ARCHIVE = False
+# 設為 True 時，上次抓到一半中斷（有未完成的 checkpoint）就不重建 mglinks_checkList，從中斷處繼續抓
+RESUME_CRAWL = True
 
 # -----------------------------
 # 常數設定
@@ -22,20 +35,52 @@ CHECKLIST_TAB    = "checkList"
 MGLINKS_TAB      = "mglinks_checkList"
 STATUS_TAB       = "Status"
 RATING_TAB       = "Rating"
+FOURK_GB_PER_HR  = 4.0    # 每小時檔案大小超過此值視為 4K 資源
+EDGE_DRIVER_PATH = r"C:\Users\chen8\OneDrive\文件\pythonHouse\edgedriver_win64\msedgedriver.exe"
+JAVBUS_BASE_URL  = os.environ.get("CHASING_JAVBUS_URL", "https://www.javbus.com").rstrip("/")
+
+# mglinks_checkList 欄位順序（fetch_and_parse 回傳的每一列）
+MGLINKS_COLUMNS = [
+    "識別碼","發行日期","長度","製作商","發行商","類別","演員",
+    "磁力名稱","檔案大小","分享日期","Magnet 連結",
+    "每小時檔案大小 (GB/hr)","是否為 4K 資源","tag",
+]
+
+# -----------------------------
+# get_client：整個行程共用一個已授權的 gspread client
+# -----------------------------
+_client = None
+
+def get_client():
+    global _client
+    if _client is None:
+        scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+        _client = google_client.authorize(CREDENTIAL_PATH, scope)
+    return _client
 
 # -----------------------------
 # safe_api_call：重試機制
+#    429 已由 sheets_scheduler 依配額與 Retry-After 處理；這裡只重試 5xx 與連線中斷
 # -----------------------------
 def safe_api_call(func, *args, **kwargs):
+    import gspread
+    import requests
+    from urllib3.exceptions import ProtocolError
+
     max_retries = 5
     delay = 1
     for attempt in range(1, max_retries+1):
         try:
             return func(*args, **kwargs)
         except gspread.exceptions.APIError as e:
+            code = getattr(getattr(e, "response", None), "status_code", None)
+            if code is not None and code < 500:
+                raise
             print(f"⚠️ Google APIError ({e}), 等待 {delay}s 重試 ({attempt}/{max_retries})")
+            run_metrics.inc("safe_api_call_retries_total", reason="api_error")
         except (requests.exceptions.ConnectionError, ProtocolError) as e:
             print(f"⚠️ 連線中斷 ({e.__class__.__name__}), 等待 {delay}s 重試 ({attempt}/{max_retries})")
+            run_metrics.inc("safe_api_call_retries_total", reason="connection")
         time.sleep(delay)
         delay *= 2
     raise Exception("❌ safe_api_call: 超過最大重試次數，仍然失敗。")
@@ -49,6 +94,7 @@ def to_native(x):
         if hasattr(x, "item"):
             return x.item()
         # pandas NA
+        import pandas as pd
         if pd.isna(x):
             return ""
         return x
@@ -62,10 +108,9 @@ def to_native_list(lst):
 # init_google_sheet：新增 mglinks worksheet
 # -----------------------------
 def init_google_sheet(sheet_id, tab_name, columns):
-    scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-    creds = ServiceAccountCredentials.from_json_keyfile_name(CREDENTIAL_PATH, scope)
-    client = gspread.authorize(creds)
-    ss = client.open_by_key(sheet_id)
+    import gspread
+
+    ss = get_client().open_by_key(sheet_id)
     try:
         ws = ss.worksheet(tab_name)
         safe_api_call(ss.del_worksheet, ws)
@@ -75,25 +120,11 @@ def init_google_sheet(sheet_id, tab_name, columns):
     safe_api_call(ws.append_row, columns)
     return ws
 
-# -----------------------------
-# 批次寫入 mglinks
-# -----------------------------
-def append_rows_to_sheet_batch(ws, buffer, batch_size=20):
-    while len(buffer) >= batch_size:
-        batch = buffer[:batch_size]
-        safe_api_call(ws.append_rows, batch)
-        print(f"✅ 寫入 {batch_size} 筆 mglinks")
-        del buffer[:batch_size]
-        time.sleep(1)
-
 # -----------------------------
 # apply_conditional_formatting：4K 條件式格式
 # -----------------------------
 def apply_conditional_formatting(spreadsheet_id, tab_name):
-    creds = service_account.Credentials.from_service_account_file(
-        CREDENTIAL_PATH, scopes=['https://www.googleapis.com/auth/spreadsheets']
-    )
-    svc = build('sheets', 'v4', credentials=creds)
+    svc = google_client.sheets_service(CREDENTIAL_PATH)
     meta = svc.spreadsheets().get(spreadsheetId=spreadsheet_id).execute()
     gid = next(
         (s['properties']['sheetId'] for s in meta['sheets'] if s['properties']['title'] == tab_name),
@@ -117,7 +148,8 @@ def apply_conditional_formatting(spreadsheet_id, tab_name):
         ]
     }
     req = svc.spreadsheets().batchUpdate(spreadsheetId=spreadsheet_id, body=body)
-    safe_api_call(req.execute)
+    with run_metrics.stage("sheet_write"):
+        safe_api_call(req.execute)
     print("🎨 已套用 4K 條件式格式")
 
 # -----------------------------
@@ -128,15 +160,30 @@ def fetch_and_parse(identifier, driver):
     from selenium.webdriver.common.by import By
     from selenium.webdriver.support.ui import WebDriverWait
     from selenium.webdriver.support import expected_conditions as EC
+
+    url = f"{JAVBUS_BASE_URL}/{identifier}"
+    with run_metrics.stage("fetch", site="javbus"), host_pacer.slot(url) as slot:
+        driver.get(url)
+        timed_out = False
+        try:
+            WebDriverWait(driver, slot.timeout).until(EC.presence_of_element_located((By.CSS_SELECTOR, "#magnet-table")))
+        except:
+            timed_out = True
+        html = driver.page_source
+        slot.observe(html, timed_out)
+    page_archive.store(identifier, html)
+    run_metrics.inc("pages_fetched_total", site="javbus", page="detail")
+
+    with run_metrics.stage("parse", site="javbus"):
+        return _parse_detail(identifier, html)
+
+# -----------------------------
+# _parse_detail：解析詳細頁 HTML → mglinks 列
+# -----------------------------
+def _parse_detail(identifier, html):
     from bs4 import BeautifulSoup
 
-    url = f"https://www.javbus.com/{identifier}"
-    driver.get(url)
-    try:
-        WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.CSS_SELECTOR, "#magnet-table")))
-    except:
-        pass
-    soup = BeautifulSoup(driver.page_source, "html.parser")
+    soup = BeautifulSoup(html, "html.parser")
 
     def safe_text(sel, method="text", default="無資訊"):
         el = soup.select_one(sel)
@@ -181,7 +228,6 @@ def fetch_and_parse(identifier, driver):
     except:
         mins = 0
     hrs = mins / 60 if mins > 0 else 1
-    thr = 4.0
 
     for r in rows:
         cols = r.find_all("a", href=True)
@@ -212,7 +258,7 @@ def fetch_and_parse(identifier, driver):
         tagstr = ", ".join(tags)
 
         per = round(size_val / hrs, 2) if hrs > 0 else 0
-        is4k = per > thr
+        is4k = per > FOURK_GB_PER_HR
 
         out.append([
             identifier, rd, ln, st, lb, cat, actor,
@@ -243,9 +289,20 @@ def fetch_and_parse(identifier, driver):
 
 # -----------------------------
 # update_status_sheet：共用更新 logic（新增 4k60fps 標籤，並將 Numpy -> Python native）
+#    records：已在記憶體中的 mglinks 列（dict）；None 時從 ws_out 讀取
+#    complete：records 是否為 mglinks 分頁的全部列（None 時：從 ws_out 讀取才算）；
+#              完整時，已從分頁刪除的 javbus hash 也從磁力索引移除
 # -----------------------------
-def update_status_sheet(sheet_id, mglinks_tab, columns, ws_out):
-    df = pd.DataFrame(ws_out.get_all_records())
+def update_status_sheet(sheet_id, mglinks_tab, columns, ws_out, records=None, complete=None):
+    import gspread
+    import pandas as pd
+    import status_model
+
+    if complete is None:
+        complete = records is None
+    if records is None:
+        records = sheet_snapshot.get_all_records(ws_out)
+    df = pd.DataFrame(records, columns=MGLINKS_COLUMNS)
     df["識別碼"] = df["識別碼"].str.upper()
     selected = []
     for ident, grp in df.groupby("識別碼"):
@@ -287,14 +344,11 @@ def update_status_sheet(sheet_id, mglinks_tab, columns, ws_out):
         selected.append(row)
 
     # 連線 Google Sheets
-    scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-    creds = ServiceAccountCredentials.from_json_keyfile_name(CREDENTIAL_PATH, scope)
-    client = gspread.authorize(creds)
-    ss = client.open_by_key(sheet_id)
+    ss = get_client().open_by_key(sheet_id)
 
     # Rating map
     try:
-        rd = pd.DataFrame(ss.worksheet(RATING_TAB).get_all_records())
+        rd = pd.DataFrame(sheet_snapshot.get_all_records(ss.worksheet(RATING_TAB)))
         rd["演員"] = rd["演員"].astype(str).str.strip()
         rd["評級"] = rd["評級"].astype(str).str.strip()
         rating_map = dict(zip(rd["演員"], rd["評級"]))
@@ -308,13 +362,21 @@ def update_status_sheet(sheet_id, mglinks_tab, columns, ws_out):
         ws_s = safe_api_call(ss.add_worksheet, title=STATUS_TAB, rows="2000", cols=str(len(columns)+2))
         headers = columns + ["狀態", "評級"]
         safe_api_call(ws_s.append_row, headers)
-    status_df = pd.DataFrame(ws_s.get_all_records())
-    if not status_df.empty:
-        status_df["識別碼"] = status_df["識別碼"].str.upper()
+    status_df = status_model.load_status_frame(ws_s)
+    # 已封存（移出 Status）的識別碼不可再當成新片加入
+    archived = status_archive.archived_idents()
+
+    # 磁力索引：登記本次 mglinks，並以 Status 重建 hash → 狀態 對照
+    index = magnet_index.open_index()
+    magnet_index.register(index, magnet_index.SOURCE_JAVBUS, zip(df["識別碼"], df["Magnet 連結"]),
+                          complete=complete)
+    magnet_index.sync_status(index, status_df)
+    lookup = magnet_index.load_lookup(index)
 
     skip_states = ["已閱", "跳過", "下載完成", "下載中"]
     inserts = []
     vrs = []
+    transitions = []
     sh = ws_s.title
 
     for row in selected:
@@ -324,36 +386,44 @@ def update_status_sheet(sheet_id, mglinks_tab, columns, ws_out):
             else "跳過" if rating_map.get(row[6].strip()) == "Failed"
             else ("等待下載" if str(row[12]).strip().upper() == "TRUE" else "尚無 4K 資源")
         )
+        # 同一個 info-hash 已由其他辨識碼排入或完成下載 → 不重複下載
+        if desired == "等待下載":
+            hit = lookup.get(magnet_index.normalize_btih(row[10]))
+            if hit and hit["ident"] not in (None, ident) and hit["status"] in magnet_index.QUEUED_STATES:
+                print(f"⏭️ {ident}: 與 {hit['ident']}（{hit['status']}）為相同 info-hash，設為 跳過")
+                desired = "跳過"
+            elif hit and magnet_index.SOURCE_T66Y in hit["sources"]:
+                print(f"ℹ️ {ident}: 相同 info-hash 也在 {magnet_index.SOURCE_T66Y}")
         base = [to_native(x) for x in row[0:14]] + [desired]
 
-        if ident not in status_df["識別碼"].values:
-            r = len(status_df) + len(inserts) + 2
+        if ident not in status_df.index:
+            if ident in archived:
+                print(f"🗄️ {ident}: 已封存，不重新加入 Status")
+                continue
+            r = status_df.attrs["n_rows"] + len(inserts) + 2
             formula = f'=IFERROR(VLOOKUP(G{r},Rating!A:H,8,0),"Multiple")'
             inserts.append(base + [formula])
+            magnet_index.remember(lookup, ident, row[10], desired)
             continue
 
-        idx = status_df[status_df["識別碼"] == ident].index[0]
-        r = idx + 2
-        cur = status_df.at[idx, "狀態"]
+        r = int(status_df.at[ident, "row"])
+        cur = str(status_df.at[ident, "狀態"])
 
-        # 更新 A~G
-        exA = status_df.loc[idx, ["識別碼","發行日期","長度","製作商","發行商","類別","演員"]].tolist()
-        exA = to_native_list(exA)
+        # 更新 A~G（以欄位文字摘要比對，不用逐格比較）
         nA = base[0:7]
-        if exA != nA:
+        if status_model.row_digest([status_model.sheet_text(x) for x in nA]) != status_df.at[ident, "digest_ag"]:
             vrs.append({"range": f"{sh}!A{r}:G{r}", "values":[nA]})
 
         # 更新 H~N（只有當前狀態不在 skip_states 時）
         if cur not in skip_states:
-            exH = status_df.loc[idx, ["磁力名稱","檔案大小","分享日期","Magnet 連結","每小時檔案大小 (GB/hr)","是否為 4K 資源","tag"]].tolist()
-            exH = to_native_list(exH)
             nH = base[7:14]
-            if exH != nH:
+            if status_model.row_digest([status_model.sheet_text(x) for x in nH]) != status_df.at[ident, "digest_hn"]:
                 vrs.append({"range": f"{sh}!H{r}:N{r}", "values":[nH]})
 
-        # 更新 狀態（只有當前狀態不在 skip_states 且與 desired 不同）
+        # 更新 狀態（只有當前狀態不在 skip_states 且與 desired 不同）→ 交給 Status journal
         if cur not in skip_states and cur != desired:
-            vrs.append({"range": f"{sh}!O{r}", "values":[[desired]]})
+            transitions.append((ident, cur, desired))
+            magnet_index.remember(lookup, ident, row[10], desired)
 
     # 批次更新
     if vrs:
@@ -362,12 +432,21 @@ def update_status_sheet(sheet_id, mglinks_tab, columns, ws_out):
     # 批次新增
     if inserts:
         safe_api_call(ws_s.append_rows, inserts, value_input_option="USER_ENTERED")
+    # 狀態變更：以讀取當下的狀態為預期舊值，與其他腳本的變更一起提交
+    status_journal.record(transitions, source="find_Mglinks")
+    safe_api_call(status_journal.commit, ws_s)
 
 # -----------------------------
 # update_rating_sheet：更新 Rating sheet 中的演員
+#    records：已在記憶體中的 mglinks 列（dict）；None 時從 ws_mglinks 讀取
 # -----------------------------
-def update_rating_sheet(sheet_id, ws_mglinks):
-    df = pd.DataFrame(ws_mglinks.get_all_records())
+def update_rating_sheet(sheet_id, ws_mglinks, records=None):
+    import gspread
+    import pandas as pd
+
+    if records is None:
+        records = sheet_snapshot.get_all_records(ws_mglinks)
+    df = pd.DataFrame(records, columns=MGLINKS_COLUMNS)
     actors_series = df["演員"].dropna().astype(str)
     unique_actors = set()
     for cell in actors_series:
@@ -376,17 +455,14 @@ def update_rating_sheet(sheet_id, ws_mglinks):
             if a:
                 unique_actors.add(a)
 
-    scope = ["https://spreadsheets.google.com/feeds","https://www.googleapis.com/auth/drive"]
-    creds = ServiceAccountCredentials.from_json_keyfile_name(CREDENTIAL_PATH, scope)
-    client = gspread.authorize(creds)
-    ss = client.open_by_key(sheet_id)
+    ss = get_client().open_by_key(sheet_id)
     try:
         ws_r = ss.worksheet(RATING_TAB)
     except gspread.exceptions.WorksheetNotFound:
         ws_r = safe_api_call(ss.add_worksheet, title=RATING_TAB, rows="2000", cols="9")
         safe_api_call(ws_r.append_row, ["演員","總番數","尚無 4K 資源","等待下載","下載中","下載完成","已閱","評級","備註"])
 
-    existing = pd.DataFrame(ws_r.get_all_records())
+    existing = pd.DataFrame(sheet_snapshot.get_all_records(ws_r))
     existing_names = set(existing["演員"].astype(str).str.strip().tolist())
     to_add = sorted(unique_actors - existing_names)
 
@@ -395,76 +471,151 @@ def update_rating_sheet(sheet_id, ws_mglinks):
         rows = []
         for i,name in enumerate(to_add):
             r = start_row + i
-            total_fn = f'=COUNTIFS(Status!$G:$G,$A{r},Status!$O:$O,"<>")'
+            total_fn = status_archive.rating_total_formula(r)
             no4k_fn  = f'=COUNTIFS(Status!$G:$G,$A{r},Status!$O:$O,C$1)'
             wait_fn  = f'=COUNTIFS(Status!$G:$G,$A{r},Status!$O:$O,D$1)'
             dlng_fn  = f'=COUNTIFS(Status!$G:$G,$A{r},Status!$O:$O,E$1)'
             dlok_fn  = f'=COUNTIFS(Status!$G:$G,$A{r},Status!$O:$O,F$1)'
-            read_fn  = f'=COUNTIFS(Status!$G:$G,$A{r},Status!$O:$O,G$1)'
+            read_fn  = status_archive.rating_read_formula(r)
             rows.append([name,total_fn,no4k_fn,wait_fn,dlng_fn,dlok_fn,read_fn,"",""])
         safe_api_call(ws_r.append_rows, rows, value_input_option="USER_ENTERED")
         print(f"✅ 新增 {len(rows)} 位演員到 Rating: {', '.join(to_add)}")
 
+# -----------------------------
+# plan_crawl：依 Status 與爬取歷史挑出這次要抓的識別碼
+# -----------------------------
+def plan_crawl(ss, codes, history):
+    import status_model
+
+    status_df = status_model.load_status_frame(ss.worksheet(STATUS_TAB))
+    return crawl_scheduler.plan(history, codes, status_model.status_map(status_df),
+                                status_archive.archived_idents())
+
+# -----------------------------
+# kept_rows：重建 mglinks 分頁前，取出這次不重抓的識別碼原有的列
+#    以未格式化的值讀取，RAW 寫回後與原本 fetch_and_parse 寫入的值相同
+# -----------------------------
+def kept_rows(ss, codes):
+    import gspread
+
+    try:
+        ws = ss.worksheet(MGLINKS_TAB)
+    except gspread.exceptions.WorksheetNotFound:
+        return []
+    values = safe_api_call(ws.get_all_values, value_render_option="UNFORMATTED_VALUE")[1:]
+    recrawl = {str(c).strip().upper() for c in codes}
+    return [row for row in values
+            if row and str(row[0]).strip() and str(row[0]).strip().upper() not in recrawl]
+
+# -----------------------------
+# crawl_mglinks：抓取 mglinks 並寫進 mglinks_checkList（find_Mglinks 與 pipeline 共用）
+#    - 有未完成的 checkpoint 時沿用原本的識別碼清單續跑，補寫已抓完但還沒進工作表的列
+#    - 否則依 codes（未指定時讀 checkList 分頁）與爬取歷史挑出這次要抓的識別碼，重建工作表；
+#      這次不重抓的識別碼（終態、退避中、已封存、超出預算）保留原有的列，只替換重抓的
+#    - 寫入交給背景執行緒，抓取 / 解析不等 Sheets；寫入失敗時 put / 離開 with 會拋出，checkpoint 保留供續跑
+#    回傳 (ws_out, rows)：rows 為這一輪所有的列（含續跑前已抓完的），給 Rating / Status 直接使用
+# -----------------------------
+def crawl_mglinks(ss, driver, codes=None, resume=RESUME_CRAWL):
+    import gspread
+
+    history = crawl_scheduler.open_history()
+    checkpoint = crawl_checkpoint.open_checkpoint()
+    pending = crawl_checkpoint.pending_codes(checkpoint, MGLINKS_TAB) if resume else None
+    if pending is not None:
+        codes = pending
+        try:
+            ws_out = ss.worksheet(MGLINKS_TAB)
+            sheet_values = safe_api_call(ws_out.get_all_values)[1:]
+        except gspread.exceptions.WorksheetNotFound:
+            ws_out = init_google_sheet(SPREADSHEET_ID, MGLINKS_TAB, MGLINKS_COLUMNS)
+            sheet_values = []
+        done = crawl_checkpoint.done_rows(checkpoint, MGLINKS_TAB)
+        missing = crawl_checkpoint.missing_rows(sheet_values, done)
+        print(f"♻️ 從 checkpoint 續跑：已完成 {len(done)}/{len(codes)} 個識別碼，補寫 {len(missing)} 列")
+    else:
+        missing = []
+        if codes is None:
+            codes = ss.worksheet(CHECKLIST_TAB).col_values(1)[1:]
+        codes = plan_crawl(ss, codes, history)
+        kept = kept_rows(ss, codes)
+        ws_out = init_google_sheet(SPREADSHEET_ID, MGLINKS_TAB, MGLINKS_COLUMNS)
+        if kept:
+            with run_metrics.stage("sheet_write"):
+                safe_api_call(ws_out.append_rows, kept)
+            print(f"📌 保留 {len(kept)} 列不重抓的磁力資料")
+        crawl_checkpoint.start(checkpoint, MGLINKS_TAB, codes)
+
+    with sheets_scheduler.WriteBehind(ws_out, call=safe_api_call) as writer:
+        writer.put(missing)
+        for seq, code in crawl_checkpoint.remaining(checkpoint, MGLINKS_TAB):
+            print(f"🔎 進度：{seq + 1}/{len(codes)} {code}")
+            rows = fetch_and_parse(code.strip(), driver)
+            crawl_checkpoint.mark_done(checkpoint, MGLINKS_TAB, seq, code, rows)
+            crawl_scheduler.record(history, code, rows)
+            writer.put(rows)
+    apply_conditional_formatting(SPREADSHEET_ID, MGLINKS_TAB)
+    rows = [row for _, done_rows in crawl_checkpoint.done_rows(checkpoint, MGLINKS_TAB) for row in done_rows]
+    crawl_checkpoint.finish(checkpoint, MGLINKS_TAB)
+    return ws_out, rows
+
+# -----------------------------
+# create_driver：Selenium headless Edge
+# -----------------------------
+def create_driver():
+    from selenium import webdriver
+    from selenium.webdriver.edge.service import Service as EdgeService
+    from selenium.webdriver.edge.options import Options
+
+    options = Options()
+    options.add_argument("--headless")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-extensions")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("--window-size=1920,1080")
+    options.add_experimental_option("excludeSwitches",["enable-logging"])
+    options.add_argument("--disable-logging")
+    options.add_experimental_option("prefs", {
+        "profile.managed_default_content_settings.images":2,
+        "profile.default_content_setting_values.notifications":2,
+        "profile.default_content_setting_values.geolocation":2
+    })
+    return cassette.driver(lambda: webdriver.Edge(
+        service=EdgeService(EDGE_DRIVER_PATH),
+        options=options
+    ))
+
 # -----------------------------
 # 主流程：切換模式 & 更新
 # -----------------------------
 if __name__ == "__main__":
-    scope = ["https://spreadsheets.google.com/feeds","https://www.googleapis.com/auth/drive"]
-    creds = ServiceAccountCredentials.from_json_keyfile_name(CREDENTIAL_PATH, scope)
-    client = gspread.authorize(creds)
-    ss = client.open_by_key(SPREADSHEET_ID)
-
-    if FETCH_NEW_MGLINKS:
-        ws_out = init_google_sheet(
-            SPREADSHEET_ID, MGLINKS_TAB,
-            ["識別碼","發行日期","長度","製作商","發行商","類別","演員",
-             "磁力名稱","檔案大小","分享日期","Magnet 連結",
-             "每小時檔案大小 (GB/hr)","是否為 4K 資源","tag"]
-        )
-        from selenium import webdriver
-        from selenium.webdriver.edge.service import Service as EdgeService
-        from selenium.webdriver.edge.options import Options
-
-        options = Options()
-        options.add_argument("--headless")
-        options.add_argument("--disable-gpu")
-        options.add_argument("--no-sandbox")
-        options.add_argument("--disable-extensions")
-        options.add_argument("--disable-dev-shm-usage")
-        options.add_argument("--window-size=1920,1080")
-        options.add_experimental_option("excludeSwitches",["enable-logging"])
-        options.add_argument("--disable-logging")
-        options.add_experimental_option("prefs", {
-            "profile.managed_default_content_settings.images":2,
-            "profile.default_content_setting_values.notifications":2,
-            "profile.default_content_setting_values.geolocation":2
-        })
-        driver = webdriver.Edge(
-            service=EdgeService(r"C:\Users\chen8\OneDrive\文件\pythonHouse\edgedriver_win64\msedgedriver.exe"),
-            options=options
-        )
-
-        ws_in = ss.worksheet(CHECKLIST_TAB)
-        codes = ws_in.col_values(1)[1:]
-        buffer = []
-        for code in codes:
-            buffer.extend(fetch_and_parse(code.strip(), driver))
-            append_rows_to_sheet_batch(ws_out, buffer, batch_size=20)
-        if buffer:
-            safe_api_call(ws_out.append_rows, buffer)
+    run_metrics.start_run("find_Mglinks")
+    ss = get_client().open_by_key(SPREADSHEET_ID)
+
+    records = None
+    if REPARSE_FROM_ARCHIVE:
+        with run_metrics.stage("reparse", site="javbus"):
+            rows = page_archive.reparse_all(_parse_detail)
+        ws_out = init_google_sheet(SPREADSHEET_ID, MGLINKS_TAB, MGLINKS_COLUMNS)
+        sheets_scheduler.queue_append(ws_out, rows)
+        safe_api_call(sheets_scheduler.flush, ws_out)
         apply_conditional_formatting(SPREADSHEET_ID, MGLINKS_TAB)
-        driver.quit()
+        records = [dict(zip(MGLINKS_COLUMNS, row)) for row in rows]
+    elif FETCH_NEW_MGLINKS:
+        driver = create_driver()
+        try:
+            ws_out, rows = crawl_mglinks(ss, driver)
+        finally:
+            driver.quit()
+        # Rating / Status 直接使用這一輪抓到的列，不再從 mglinks_checkList 讀回
+        records = [dict(zip(MGLINKS_COLUMNS, row)) for row in rows]
     else:
         ws_out = ss.worksheet(MGLINKS_TAB)
 
-    update_rating_sheet(SPREADSHEET_ID, ws_out)
-    update_status_sheet(
-        SPREADSHEET_ID, MGLINKS_TAB,
-        ["識別碼","發行日期","長度","製作商","發行商","類別","演員",
-         "磁力名稱","檔案大小","分享日期","Magnet 連結",
-         "每小時檔案大小 (GB/hr)","是否為 4K 資源","tag"
-        ],
-        ws_out
-    )
+    with run_metrics.stage("rating_update"):
+        update_rating_sheet(SPREADSHEET_ID, ws_out, records=records)
+    with run_metrics.stage("status_update"):
+        update_status_sheet(SPREADSHEET_ID, MGLINKS_TAB, MGLINKS_COLUMNS, ws_out, records=records,
+                            complete=REPARSE_FROM_ARCHIVE or None)
 
     print("✅ 全部更新完成")
@@ -5,7 +5,6 @@ from contextlib import contextmanager
 from datetime import datetime
 
 import gspread
-from oauth2client.service_account import ServiceAccountCredentials
 from selenium import webdriver
 from selenium.webdriver.edge.service import Service
 from selenium.webdriver.edge.options import Options
@@ -14,6 +13,11 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from bs4 import BeautifulSoup
 
+import cassette
+import google_client
+import host_pacer
+import run_metrics
+
 # -----------------------------
 # 統一設定 credentials.json 路徑
 # -----------------------------
@@ -22,14 +26,14 @@ CREDENTIAL_PATH = r"C:\Users\chen8\OneDrive\文件\pythonHouse\utCooking\credent
 # -----------------------------
 # 上傳到 Google Sheet 函式
 # -----------------------------
-def upload_to_google_sheet(data, sheet_id, tab_name):
+def upload_to_google_sheet(data, sheet_id, tab_name, client=None):
     print(f"\n🔄 上傳結果到 Google Sheet：{tab_name}")
-    scope = [
-        "https://spreadsheets.google.com/feeds",
-        "https://www.googleapis.com/auth/drive",
-    ]
-    creds = ServiceAccountCredentials.from_json_keyfile_name(CREDENTIAL_PATH, scope)
-    client = gspread.authorize(creds)
+    if client is None:
+        scope = [
+            "https://spreadsheets.google.com/feeds",
+            "https://www.googleapis.com/auth/drive",
+        ]
+        client = google_client.authorize(CREDENTIAL_PATH, scope)
     spreadsheet = client.open_by_key(sheet_id)
 
     # 刪除已存在的工作表
@@ -66,34 +70,14 @@ def suppress_chromium_logs():
         os.close(old_stderr)
 
 # -----------------------------
-# 主流程：擷取「辨識碼」+「標籤」+ 進度回報 + 上傳
+# 設定
 # -----------------------------
 # Edge driver 路徑
 edge_driver_path = r"C:\Users\chen8\OneDrive\文件\pythonHouse\edgedriver_win64\msedgedriver.exe"
-# 確認 driver 檔案存在
-assert os.path.isfile(edge_driver_path), f"找不到 driver：{edge_driver_path}"
-
-# Selenium headless 設定
-options = Options()
-options.add_argument("--headless")
-options.add_argument("--disable-gpu")
-options.add_argument("--no-sandbox")
-options.add_argument("--disable-extensions")
-options.add_argument("--disable-dev-shm-usage")
-options.add_argument("--window-size=1920,1080")
-options.add_experimental_option("prefs", {
-    "profile.managed_default_content_settings.images": 2,
-    "profile.default_content_setting_values.notifications": 2,
-    "profile.default_content_setting_values.geolocation": 2,
-})
-options.add_experimental_option("excludeSwitches", ["enable-logging"])
-
-# 抑制 Chromium 日誌、啟動瀏覽器
-with suppress_chromium_logs():
-    service = Service(executable_path=edge_driver_path, log_path=os.devnull)
-    driver = webdriver.Edge(service=service, options=options)
-
-wait = WebDriverWait(driver, 10)
+SPREADSHEET_ID   = "1cizSVrySFHKYfngBhkCCNVRXRJiMYH_2ltts9YAdbEo"
+CHECKLIST_TAB    = "checkList"
+# 站台網址（loadtest_harness 以環境變數指向本機的假站台）
+JAVBUS_BASE_URL  = os.environ.get("CHASING_JAVBUS_URL", "https://www.javbus.com").rstrip("/")
 
 # 目標標籤設定
 target_tags = {
@@ -101,50 +85,98 @@ target_tags = {
     "3天前新種", "4天前新種", "5天前新種",
     "6天前新種", "7天前新種"
 }
-results = []
-start_time = time.time()
-
-print("🔍 開始查找所有『新種』影片...")
-page = 1
-while True:
-    url = "https://www.javbus.com/" if page == 1 else f"https://www.javbus.com/page/{page}"
-    print(f"🌐 開啟第 {page} 頁：{url}")
-    driver.get(url)
-    try:
-        wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "div#waterfall")))
-    except:
-        break
-
-    soup = BeautifulSoup(driver.page_source, "html.parser")
-    items = soup.select("div#waterfall .item")
-    page_hits = []
-    for it in items:
-        link = it.select_one("a")
-        if not link or not link.get("href"):
-            continue
-        code = os.path.basename(link["href"])
-        tags = [b.text.strip() for b in it.select(".item-tag button")]
-        for t in tags:
-            if t in target_tags:
-                page_hits.append([code, t])
-    if not page_hits:
-        print(f"🛑 第 {page} 頁沒有找到新種影片，停止。")
-        break
-
-    print(f"📄 第 {page} 頁找到 {len(page_hits)} 筆")
-    results.extend(page_hits)
-    page += 1
-
-# 關閉瀏覽器
-driver.quit()
-print(f"\n🎯 共找到 {len(results)} 部影片")
-
-# 回報進度
-for idx, (code, tag) in enumerate(results, start=1):
-    print(f"🔎 進度：{idx}/{len(results)} {code} / {tag}")
-
-# 上傳到 Google Sheet（B1 現在會顯示執行程式當下的日期戳記）
-spreadsheet_id = "1cizSVrySFHKYfngBhkCCNVRXRJiMYH_2ltts9YAdbEo"
-upload_to_google_sheet(results, spreadsheet_id, "checkList")
-
-print(f"⏱️ 總耗時：{round(time.time() - start_time, 2)} 秒")
+
+# -----------------------------
+# create_driver：Selenium headless Edge（pipeline.py 也共用這個瀏覽器）
+# -----------------------------
+def create_driver():
+    # 確認 driver 檔案存在
+    assert cassette.browserless() or os.path.isfile(edge_driver_path), f"找不到 driver：{edge_driver_path}"
+
+    # Selenium headless 設定
+    options = Options()
+    options.add_argument("--headless")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-extensions")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("--window-size=1920,1080")
+    options.add_experimental_option("prefs", {
+        "profile.managed_default_content_settings.images": 2,
+        "profile.default_content_setting_values.notifications": 2,
+        "profile.default_content_setting_values.geolocation": 2,
+    })
+    options.add_experimental_option("excludeSwitches", ["enable-logging"])
+
+    # 抑制 Chromium 日誌、啟動瀏覽器
+    with suppress_chromium_logs():
+        service = Service(executable_path=edge_driver_path, log_path=os.devnull)
+        return cassette.driver(lambda: webdriver.Edge(service=service, options=options))
+
+# -----------------------------
+# crawl_new_codes：擷取「辨識碼」+「標籤」，回傳 [[code, tag], ...]
+# -----------------------------
+def crawl_new_codes(driver):
+    results = []
+
+    print("🔍 開始查找所有『新種』影片...")
+    page = 1
+    while True:
+        url = f"{JAVBUS_BASE_URL}/" if page == 1 else f"{JAVBUS_BASE_URL}/page/{page}"
+        print(f"🌐 開啟第 {page} 頁：{url}")
+        with run_metrics.stage("fetch", site="javbus"), host_pacer.slot(url) as slot:
+            driver.get(url)
+            try:
+                WebDriverWait(driver, slot.timeout).until(
+                    EC.presence_of_element_located((By.CSS_SELECTOR, "div#waterfall")))
+            except:
+                slot.observe(driver.page_source, timed_out=True)
+                break
+            slot.observe(driver.page_source)
+        run_metrics.inc("pages_fetched_total", site="javbus", page="listing")
+
+        with run_metrics.stage("parse", site="javbus"):
+            soup = BeautifulSoup(driver.page_source, "html.parser")
+            items = soup.select("div#waterfall .item")
+        page_hits = []
+        for it in items:
+            link = it.select_one("a")
+            if not link or not link.get("href"):
+                continue
+            code = os.path.basename(link["href"])
+            tags = [b.text.strip() for b in it.select(".item-tag button")]
+            for t in tags:
+                if t in target_tags:
+                    page_hits.append([code, t])
+        if not page_hits:
+            print(f"🛑 第 {page} 頁沒有找到新種影片，停止。")
+            break
+
+        print(f"📄 第 {page} 頁找到 {len(page_hits)} 筆")
+        results.extend(page_hits)
+        page += 1
+
+    print(f"\n🎯 共找到 {len(results)} 部影片")
+    return results
+
+# -----------------------------
+# 主流程：擷取「辨識碼」+「標籤」+ 進度回報 + 上傳
+# -----------------------------
+if __name__ == "__main__":
+    run_metrics.start_run("find_checkList")
+    start_time = time.time()
+
+    driver = create_driver()
+    results = crawl_new_codes(driver)
+
+    # 關閉瀏覽器
+    driver.quit()
+
+    # 回報進度
+    for idx, (code, tag) in enumerate(results, start=1):
+        print(f"🔎 進度：{idx}/{len(results)} {code} / {tag}")
+
+    # 上傳到 Google Sheet（B1 現在會顯示執行程式當下的日期戳記）
+    upload_to_google_sheet(results, SPREADSHEET_ID, CHECKLIST_TAB)
+
+    print(f"⏱️ 總耗時：{round(time.time() - start_time, 2)} 秒")
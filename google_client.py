@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Google Sheets 連線：各腳本共用的 authorize()，並在 gspread 的 HTTP 層掛上 hook，
+統一計算 Sheets / Drive API 呼叫次數與讀寫延遲。
+
+CHASING_FAKE_SHEETS=<網址> 時不需要憑證，所有 Sheets / Drive 請求改送到該網址
+（loadtest_harness 的本機假 Sheets v4），其餘流程（hook、配額排程、計數）不變。
+"""
+import os
+import json
+import time
+
+import cassette
+import run_metrics
+import sheet_snapshot
+import sheets_scheduler
+
+# -----------------------------
+# 設定
+# -----------------------------
+DISCOVERY_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sheets_v4_discovery.json")
+DISCOVERY_URL        = "https://sheets.googleapis.com/$discovery/rest?version=v4"
+FAKE_SHEETS_URL      = os.environ.get("CHASING_FAKE_SHEETS", "").strip().rstrip("/")
+GOOGLE_API_HOSTS     = ("https://sheets.googleapis.com", "https://www.googleapis.com")
+
+_services = {}
+
+# -----------------------------
+# _classify：依 HTTP 方法與網址分類（GET = 讀取，其餘 = 寫入）
+# -----------------------------
+def _classify(method, url):
+    api = "drive" if "googleapis.com/drive" in str(url) else "sheets"
+    kind = "read" if str(method).lower() == "get" else "write"
+    return api, kind
+
+# -----------------------------
+# _redirect：把 Google API 網址換成 CHASING_FAKE_SHEETS（計數與分類仍看原本的網址）
+# -----------------------------
+def _redirect(url):
+    for host in GOOGLE_API_HOSTS:
+        if str(url).startswith(host):
+            return FAKE_SHEETS_URL + str(url)[len(host):]
+    return url
+
+def _redirect_request(orig_request):
+    def request(method, endpoint, *args, **kwargs):
+        return orig_request(method, _redirect(endpoint), *args, **kwargs)
+    return request
+
+# -----------------------------
+# install_hooks：包裝 client 的 request（gspread 6 在 http_client 上，gspread 5 在 client 本身）
+# -----------------------------
+def install_hooks(client):
+    target = getattr(client, "http_client", client)
+    if getattr(target, "_chasing_hooked", False):
+        return client
+    orig_request = target.request
+    if FAKE_SHEETS_URL:
+        orig_request = _redirect_request(orig_request)
+    if cassette.active():
+        orig_request = cassette.wrap_http_request(orig_request)
+    # 配額排程在 cassette 之外：錄製時也照配額送出
+    orig_request = sheets_scheduler.wrap_request(orig_request, _classify)
+
+    def request(method, endpoint, *args, **kwargs):
+        api, kind = _classify(method, endpoint)
+        t0 = time.perf_counter()
+        try:
+            return orig_request(method, endpoint, *args, **kwargs)
+        finally:
+            if kind == "write":
+                sheet_snapshot.invalidate()
+            run_metrics.inc("sheets_api_calls_total", api=api, kind=kind)
+            run_metrics.observe("stage_seconds", time.perf_counter() - t0, stage=f"sheet_{kind}")
+
+    target.request = request
+    target._chasing_hooked = True
+    return client
+
+# -----------------------------
+# authorize：讀取 service account 憑證並建立 gspread client
+#    - cassette 重播時不需要憑證，所有請求都由 cassette 回應
+#    - CHASING_FAKE_SHEETS 時也不需要憑證
+# -----------------------------
+def authorize(credential_path, scope):
+    import gspread
+
+    if cassette.replaying() or FAKE_SHEETS_URL:
+        import requests
+        return install_hooks(gspread.Client(None, session=requests.Session()))
+
+    from oauth2client.service_account import ServiceAccountCredentials
+    creds = ServiceAccountCredentials.from_json_keyfile_name(credential_path, scope)
+    return install_hooks(gspread.authorize(creds))
+
+# -----------------------------
+# _load_discovery：本機快取的 Sheets v4 discovery document（第一次才從網路下載）
+# -----------------------------
+def _load_discovery():
+    if os.path.exists(DISCOVERY_CACHE_PATH):
+        with open(DISCOVERY_CACHE_PATH, encoding="utf-8") as f:
+            return f.read()
+    import requests
+    resp = requests.get(DISCOVERY_URL, timeout=30)
+    resp.raise_for_status()
+    json.loads(resp.text)  # 確認是完整的 JSON 才寫入快取
+    with open(DISCOVERY_CACHE_PATH + ".tmp", "w", encoding="utf-8") as f:
+        f.write(resp.text)
+    os.replace(DISCOVERY_CACHE_PATH + ".tmp", DISCOVERY_CACHE_PATH)
+    return resp.text
+
+# -----------------------------
+# _CountedHttp：Sheets v4 service 的 HTTP 層，與 gspread hook 用同一個 _classify 計算 sheets_api_calls_total
+#    （延遲由呼叫端的 run_metrics.stage 記錄）
+# -----------------------------
+class _CountedHttp:
+    def __init__(self, inner):
+        self.inner = inner
+
+    def request(self, uri, method="GET", *args, **kwargs):
+        try:
+            return self.inner.request(uri, method, *args, **kwargs)
+        finally:
+            api, kind = _classify(method, uri)
+            if kind == "write":
+                sheet_snapshot.invalidate()
+            run_metrics.inc("sheets_api_calls_total", api=api, kind=kind)
+
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
+
+# -----------------------------
+# _build_sheets：不在每次執行時從網路抓 discovery document
+#    - googleapiclient 2.x 內附 static discovery document
+#    - 舊版（沒有 static_discovery 參數）改用本機快取的 discovery document
+# -----------------------------
+def _build_sheets(**kwargs):
+    from googleapiclient import discovery
+    from googleapiclient.errors import UnknownApiNameOrVersion
+
+    try:
+        return discovery.build('sheets', 'v4', static_discovery=True, **kwargs)
+    except (TypeError, UnknownApiNameOrVersion):
+        return discovery.build_from_document(_load_discovery(), **kwargs)
+
+# -----------------------------
+# sheets_service：Sheets v4（googleapiclient），用於 gspread 沒包裝的 batchUpdate
+#    同一個行程內重複使用已建立的 service
+# -----------------------------
+def sheets_service(credential_path):
+    key = (credential_path, cassette.MODE)
+    if key in _services:
+        return _services[key]
+
+    if FAKE_SHEETS_URL and not cassette.replaying():
+        import httplib2
+        http = httplib2.Http()
+        if cassette.recording():
+            http = cassette.CassetteHttp(http)
+        _services[key] = _build_sheets(http=_CountedHttp(sheets_scheduler.ScheduledHttp(http)),
+                                       client_options={"api_endpoint": FAKE_SHEETS_URL + "/"})
+        return _services[key]
+
+    if not cassette.active():
+        from google.oauth2 import service_account
+        creds = service_account.Credentials.from_service_account_file(
+            credential_path, scopes=['https://www.googleapis.com/auth/spreadsheets']
+        )
+        import httplib2
+        import google_auth_httplib2
+        http = google_auth_httplib2.AuthorizedHttp(creds, http=httplib2.Http())
+        _services[key] = _build_sheets(http=_CountedHttp(sheets_scheduler.ScheduledHttp(http)))
+        return _services[key]
+
+    inner = None
+    if cassette.recording():
+        import httplib2
+        import google_auth_httplib2
+        from google.oauth2 import service_account
+        creds = service_account.Credentials.from_service_account_file(
+            credential_path, scopes=['https://www.googleapis.com/auth/spreadsheets']
+        )
+        inner = google_auth_httplib2.AuthorizedHttp(creds, http=httplib2.Http())
+    _services[key] = _build_sheets(http=_CountedHttp(sheets_scheduler.ScheduledHttp(cassette.CassetteHttp(inner))))
+    return _services[key]
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+每個主機（javbus / t66y / rmdown …）各自的 AIMD 請求間隔控制：
+延遲與錯誤率正常時逐步縮短請求間隔（−INTERVAL_STEP），
+遇到 429 / 503 / Cloudflare 頁面或逾時則立即加倍請求間隔。
+各爬蟲都是單一 Selenium driver 循序抓取，同一主機同時只有一個請求，所以只控制間隔、不設並行上限。
+狀態存在 host_pacer.json，下次執行從上次收斂的速度開始，而不是每次都從頭試探。
+
+Selenium 拿不到 HTTP 狀態碼，所以以頁面內容（classify_page）判斷是否被限流。
+
+用法：
+    with host_pacer.slot(url) as s:
+        driver.get(url)
+        WebDriverWait(driver, s.timeout) ...
+        s.observe(driver.page_source, timed_out=...)
+"""
+import os
+import re
+import json
+import time
+import atexit
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from urllib.parse import urlparse
+
+import run_metrics
+
+# -----------------------------
+# 設定
+# -----------------------------
+PACER_STATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "host_pacer.json")
+MIN_INTERVAL     = 0.2     # 兩次請求開始之間最短間隔（秒）
+MAX_INTERVAL     = 60.0
+INTERVAL_STEP    = 0.1     # 健康時每次縮短的間隔
+SLOW_FACTOR      = 2.0     # 延遲超過基準的幾倍視為變慢（不再放寬）
+EWMA_ALPHA       = 0.2
+WAIT_TIMEOUT     = 10      # WebDriverWait 的最短等待秒數
+
+DEFAULT_STATE = {"interval": 1.0, "ewma": None, "baseline": None}
+
+_THROTTLE_RE = re.compile(
+    r"429 Too Many Requests|Too Many Requests|503 Service|Service Temporarily Unavailable|"
+    r"Just a moment\.\.\.|cf-browser-verification|cf-challenge|Attention Required|Access denied|"
+    r"rate limit",
+    re.IGNORECASE,
+)
+
+# -----------------------------
+# classify_page：ok / throttled / timeout
+#    只看頁面開頭（<title> 與錯誤頁內容都在前面），避免正文誤判
+# -----------------------------
+def classify_page(html, timed_out=False):
+    head = (html or "")[:5000]
+    if _THROTTLE_RE.search(head):
+        return "throttled"
+    if timed_out and len(html or "") < 1000:
+        return "timeout"
+    return "ok"
+
+def host_of(url):
+    return urlparse(url).hostname or url
+
+# -----------------------------
+# Slot：一次請求；observe() 回報頁面結果，未回報時依例外判斷
+# -----------------------------
+class Slot:
+    def __init__(self, host, timeout):
+        self.host = host
+        self.timeout = timeout
+        self.outcome = None
+        self.started = time.monotonic()
+
+    def observe(self, html, timed_out=False):
+        self.outcome = classify_page(html, timed_out)
+        return self.outcome
+
+# -----------------------------
+# HostPacer
+# -----------------------------
+class HostPacer:
+    def __init__(self, state_path=PACER_STATE_PATH):
+        self.state_path = state_path
+        self._cond = threading.Condition()
+        self._hosts = {}
+        self._runtime = {}
+        if os.path.exists(state_path):
+            try:
+                with open(state_path, encoding="utf-8") as f:
+                    self._hosts = json.load(f)
+                # 舊版狀態檔的並行上限已不使用
+                for st in self._hosts.values():
+                    st.pop("limit", None)
+            except ValueError:
+                print(f"⚠️ 無法解析 {state_path}，使用預設速度")
+
+    def _state(self, host):
+        if host not in self._hosts:
+            self._hosts[host] = dict(DEFAULT_STATE)
+        if host not in self._runtime:
+            self._runtime[host] = {"next_at": 0.0}
+        return self._hosts[host], self._runtime[host]
+
+    def timeout(self, host):
+        with self._cond:
+            st, _ = self._state(host)
+            ewma = st["ewma"] or 0
+            return max(WAIT_TIMEOUT, min(60, round(4 * ewma)))
+
+    # -----------------------------
+    # acquire / release
+    # -----------------------------
+    def acquire(self, host):
+        t0 = time.monotonic()
+        with self._cond:
+            while True:
+                st, rt = self._state(host)
+                now = time.monotonic()
+                delay = rt["next_at"] - now
+                if delay <= 0:
+                    break
+                self._cond.wait(timeout=delay)
+            rt["next_at"] = now + st["interval"]
+        waited = time.monotonic() - t0
+        if waited > 0:
+            run_metrics.observe("pacer_wait_seconds", waited, host=host)
+
+    def release(self, host, outcome, latency):
+        with self._cond:
+            st, rt = self._state(host)
+            run_metrics.inc("pacer_requests_total", host=host, outcome=outcome)
+            if outcome == "ok":
+                st["ewma"] = latency if st["ewma"] is None else (1 - EWMA_ALPHA) * st["ewma"] + EWMA_ALPHA * latency
+                # 基準延遲：取歷史最低，並緩慢向目前值靠近，避免一次特別快的請求永遠壓住基準
+                base = st["baseline"]
+                st["baseline"] = st["ewma"] if base is None else min(st["ewma"], base + (st["ewma"] - base) * 0.01)
+                if st["ewma"] <= SLOW_FACTOR * st["baseline"]:
+                    st["interval"] = max(MIN_INTERVAL, st["interval"] - INTERVAL_STEP)
+            else:
+                st["interval"] = min(MAX_INTERVAL, st["interval"] * 2 + 1)
+                rt["next_at"] = time.monotonic() + st["interval"]
+                print(f"🐢 {host}: {outcome}，間隔 {st['interval']:.1f}s")
+            st["updated"] = datetime.now().isoformat(timespec="seconds")
+            self._cond.notify_all()
+        if outcome != "ok":
+            self.save()
+
+    @contextmanager
+    def slot(self, url):
+        host = host_of(url)
+        self.acquire(host)
+        s = Slot(host, self.timeout(host))
+        try:
+            yield s
+        except Exception as e:
+            if s.outcome is None:
+                s.outcome = "timeout" if "Timeout" in type(e).__name__ else "error"
+            raise
+        finally:
+            self.release(host, s.outcome or "ok", time.monotonic() - s.started)
+
+    def save(self):
+        with self._cond:
+            data = json.dumps(self._hosts, ensure_ascii=False, indent=2)
+        with open(self.state_path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(self.state_path + ".tmp", self.state_path)
+
+# -----------------------------
+# 共用實例：同一個行程內各腳本共用，結束時寫回狀態
+# -----------------------------
+_pacer = None
+_pacer_lock = threading.Lock()
+
+def get_pacer():
+    global _pacer
+    with _pacer_lock:
+        if _pacer is None:
+            _pacer = HostPacer()
+            atexit.register(_pacer.save)
+        return _pacer
+
+def slot(url):
+    return get_pacer().slot(url)
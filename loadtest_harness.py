@@ -0,0 +1,890 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+端對端負載測試：不連線正式服務，在本機以放大的資料量跑完整流程，量測吞吐量、API 呼叫次數與記憶體峰值。
+    - 本機 HTTP 伺服器：產生 javbus 列表 / 詳細頁、t66y 列表 / 文章頁（規模與延遲可調）
+    - 假 Sheets v4 / Drive：記憶體內的試算表，實作各腳本用到的 REST 端點
+      （metadata、values get / batchGet / append / update / batchUpdate、:batchUpdate、Drive modifiedTime）；
+      gspread 與 googleapiclient 都經由 google_client 的 CHASING_FAKE_SHEETS 導向這裡，hook / 配額排程 / 計數照常運作
+    - 假 qBittorrent Web API（登入、sync/maindata、torrents/add），給 download_queue 用
+    - 合成的 qbCooking / uT / E:\\uT 資料夾樹（MKV 有合法的 EBML 標頭，會走就地寫 Tags 與標頭探測）
+各腳本複製到工作目錄後以子行程執行，本機狀態檔（*.db、journal、快照、metrics）都留在工作目錄，不會碰到正式環境。
+個別模組的純函式（catalog、magnet_index、crawl_checkpoint、status_journal、dpl_playlist、media_library …）
+另有單元測試 test_*.py，不需要假伺服器：python -m pytest
+
+用法：
+    python loadtest_harness.py --scale 10 --latency 0.05
+    python loadtest_harness.py --scripts find_checkList,find_Mglinks --workdir D:\\loadtest --dump-sheets sheets.json
+"""
+import os
+import re
+import sys
+import json
+import time
+import atexit
+import random
+import shutil
+import struct
+import hashlib
+import argparse
+import tempfile
+import threading
+import subprocess
+from email.parser import BytesParser
+from email.policy import HTTP
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs, unquote
+
+import ebml
+
+# -----------------------------
+# 設定
+# -----------------------------
+HERE           = os.path.dirname(os.path.abspath(__file__))
+SCRIPTS        = ["find_checkList", "find_Mglinks", "scrape_t66y", "download_queue",
+                  "updateStatusAfterDownloading", "updateStatusAfterReading"]
+SPREADSHEET_ID = "1cizSVrySFHKYfngBhkCCNVRXRJiMYH_2ltts9YAdbEo"
+MARKER         = ".loadtest_harness"
+
+# scale = 1 時的資料量（約為目前實際的規模）
+BASE_VOLUME = {
+    "javbus_new":   240,    # javbus 首頁的新種數
+    "status_rows":  2500,   # Status 既有列數
+    "actors":       400,
+    "t66y_threads": 100,
+    "qb_folders":   20,
+    "ut_files":     150,
+}
+JAVBUS_PER_PAGE = 30
+T66Y_PER_PAGE   = 50
+NEW_IN_STATUS   = 0.3       # 新種中已經在 Status 的比例
+DUP_RATIO       = 0.05      # uT 中有重複檔案的比例
+VIDEO_BYTES     = 64 * 1024
+DUP_VIDEO_BYTES = 1280 * 1024   # 重複檔要超過 media_dedup.MIN_SIZE 才會被比對
+QBT_FREE_BYTES  = 2 * 1000 ** 4  # 假 qBittorrent 回報的剩餘磁碟空間
+QBT_TORRENT_BYTES = 15 * 1000 ** 3   # 新加入的種子尚未下載的量
+
+PREFIXES   = ["SSIS", "IPX", "MIDV", "SONE", "JUR", "STARS", "ABF", "PRED", "CAWD", "MIDE", "FSDSS", "START"]
+STUDIOS    = ["S1 NO.1 STYLE", "IDEA POCKET", "MOODYZ", "Madonna", "PRESTIGE", "PREMIUM", "kawaii*", "FALENO"]
+GENRES     = ["高畫質", "單體作品", "巨乳", "中出", "4K", "ハイクオリティVR", "字幕", "數位馬賽克", "劇情"]
+NEW_TAGS   = ["今日新種", "昨日新種", "前日新種", "3天前新種"]
+STATUS_MIX = [("尚無 4K 資源", 30), ("等待下載", 15), ("下載中", 5), ("下載完成", 15), ("已閱", 30), ("跳過", 5)]
+
+STATUS_HEADERS = [
+    "識別碼", "發行日期", "長度", "製作商", "發行商", "類別", "演員",
+    "磁力名稱", "檔案大小", "分享日期", "Magnet 連結",
+    "每小時檔案大小 (GB/hr)", "是否為 4K 資源", "tag", "狀態", "評級",
+]
+RATING_HEADERS = ["演員", "總番數", "尚無 4K 資源", "等待下載", "下載中", "下載完成", "已閱", "評級", "備註"]
+
+# -----------------------------
+# World：依 scale / seed 產生的資料（同樣參數每次都相同）
+# -----------------------------
+def _btih(*parts):
+    return hashlib.sha1("|".join(map(str, parts)).encode()).hexdigest().upper()
+
+class World:
+    def __init__(self, scale=1.0, seed=0, now=None):
+        rng = random.Random(seed)
+        n = {k: max(1, int(v * scale)) for k, v in BASE_VOLUME.items()}
+        self.now = now or datetime.now()
+        self.actors = [f"演員{i:05d}" for i in range(n["actors"])]
+        self.failed_actors = set(rng.sample(self.actors, max(1, len(self.actors) // 10)))
+
+        # 識別碼池：Status 既有列 + 新種（部分新種已在 Status）
+        total = n["status_rows"] + n["javbus_new"]
+        codes, seen = [], set()
+        while len(codes) < total:
+            code = f"{rng.choice(PREFIXES)}-{rng.randint(1, 99999):03d}"
+            if code not in seen:
+                seen.add(code)
+                codes.append(code)
+        self.status_codes = codes[:n["status_rows"]]
+        fresh = codes[n["status_rows"]:]
+        overlap = rng.sample(self.status_codes, int(len(fresh) * NEW_IN_STATUS))
+        self.new_codes = fresh[:len(fresh) - len(overlap)] + overlap
+        rng.shuffle(self.new_codes)
+
+        weights = [w for _, w in STATUS_MIX]
+        self.status = {c: rng.choices([s for s, _ in STATUS_MIX], weights)[0] for c in self.status_codes}
+
+        # qbCooking：等待下載 / 下載中 的識別碼；uT / E:\uT：下載完成 / 已閱
+        by_status = {}
+        for c, s in self.status.items():
+            by_status.setdefault(s, []).append(c)
+        queued = by_status.get("等待下載", []) + by_status.get("下載中", [])
+        done = by_status.get("下載完成", []) + by_status.get("已閱", [])
+        self.qb_folders = rng.sample(queued, min(n["qb_folders"], len(queued)))
+        self.qb_pending = set(rng.sample(self.qb_folders, len(self.qb_folders) // 4))
+        self.ut_files = rng.sample(done, min(n["ut_files"], len(done)))
+        self.ut_dups = set(rng.sample(self.ut_files, int(len(self.ut_files) * DUP_RATIO)))
+
+        # t66y：一半是 javbus 也有的識別碼（其中一部分 info-hash 相同）
+        self.threads = []
+        when = self.now
+        for i in range(n["t66y_threads"]):
+            code = rng.choice(self.status_codes) if rng.random() < 0.5 else f"{rng.choice(PREFIXES)}-{rng.randint(1, 99999):03d}"
+            when -= timedelta(minutes=rng.randint(1, 20))
+            self.threads.append({
+                "tid": 7000000 + i, "code": code, "is4k": rng.random() < 0.8,
+                "size": round(rng.uniform(4, 30), 1), "when": when,
+                "btih": _btih(code, 0) if rng.random() < 0.2 else _btih("t66y", i),
+            })
+
+    # ---------- javbus ----------
+    def detail(self, code):
+        rng = random.Random(f"detail:{code}")
+        minutes = rng.choice([120, 150, 180, 240])
+        released = self.now.date() - timedelta(days=rng.randint(0, 900))
+        magnets = []
+        for k in range(rng.randint(0, 5)):
+            gb = round(rng.uniform(1, 40), 2)
+            size = f"{gb}GB" if gb >= 1.5 else f"{int(gb * 1000)}MB"
+            tags = [t for t in ("高清", "字幕") if rng.random() < 0.4]
+            shared = released + timedelta(days=rng.randint(0, 30))
+            magnets.append((f"{code}{'-4K' if gb / (minutes / 60) > 4 else ''}", size,
+                            shared.isoformat(), f"magnet:?xt=urn:btih:{_btih(code, k)}&dn={code}", tags))
+        return {
+            "date": released.isoformat(), "minutes": minutes,
+            "studio": rng.choice(STUDIOS), "label": rng.choice(STUDIOS),
+            "genres": rng.sample(GENRES, rng.randint(1, 4)),
+            "actors": rng.sample(self.actors, rng.choice([1, 1, 1, 2])),
+            "magnets": magnets,
+        }
+
+    def javbus_listing(self, page):
+        items = self.new_codes[(page - 1) * JAVBUS_PER_PAGE:page * JAVBUS_PER_PAGE]
+        rows = []
+        for i, code in enumerate(items):
+            tag = NEW_TAGS[((page - 1) * JAVBUS_PER_PAGE + i) * len(NEW_TAGS) // max(1, len(self.new_codes))]
+            rows.append(f'<div class="item"><a class="movie-box" href="/{code}"><span>{code}</span>'
+                        f'<div class="item-tag"><button class="btn">高清</button><button class="btn">{tag}</button></div></a></div>')
+        if not rows:
+            # 沒有新種的頁面：仍有 waterfall，只是沒有新種標籤，find_checkList 會在這裡停止
+            rows = [f'<div class="item"><a class="movie-box" href="/OLD-{i:03d}"><span>OLD-{i:03d}</span>'
+                    f'<div class="item-tag"><button class="btn">高清</button></div></a></div>'
+                    for i in range(JAVBUS_PER_PAGE)]
+        return f'<html><body><div id="waterfall">{"".join(rows)}</div></body></html>'
+
+    def javbus_detail(self, code):
+        d = self.detail(code)
+        genres = "".join(f'<span class="genre"><label><input type="checkbox"><a href="/genre/{g}">{g}</a></label></span>'
+                         for g in d["genres"])
+        stars = "".join(f'<div class="star-name"><a href="/star/{a}">{a}</a></div>' for a in d["actors"])
+        magnets = "".join(
+            f'<tr><td><a href="{url}">{name}</a>{"".join(_btn(t) for t in tags)}</td>'
+            f'<td><a href="{url}">{size}</a></td><td><a href="{url}">{shared}</a></td></tr>'
+            for name, size, shared, url, tags in d["magnets"]
+        )
+        return (
+            f'<html><body><h3>{code}</h3><div class="info">'
+            f'<p><span class="header">識別碼:</span> <span>{code}</span></p>'
+            f'<p><span class="header">發行日期:</span> {d["date"]}</p>'
+            f'<p><span class="header">長度:</span> {d["minutes"]}分鐘</p>'
+            f'<p><span class="header">製作商:</span> <a href="/studio/1">{d["studio"]}</a></p>'
+            f'<p><span class="header">發行商:</span> <a href="/label/1">{d["label"]}</a></p>'
+            f'<p class="header">類別:<span id="genre-toggle">-</span></p><p>{genres}</p>'
+            f'</div>{stars}'
+            f'<table id="magnet-table"><tr><td>磁力名稱</td><td>檔案大小</td><td>分享日期</td></tr>{magnets}</table>'
+            f'</body></html>'
+        )
+
+    # ---------- t66y ----------
+    def t66y_listing(self, page):
+        threads = self.threads[(page - 1) * T66Y_PER_PAGE:page * T66Y_PER_PAGE]
+        rows = []
+        for t in threads:
+            title = f"{'[4K] ' if t['is4k'] else ''}{t['code']} 中文字幕 [{t['size']}GB]"
+            rows.append(self._t66y_row(t["tid"], title, t["when"]))
+        if not rows:
+            # 超過資料量：回傳很舊的文章，scrape_t66y 依 target_date 停止
+            rows = [self._t66y_row(1, "[4K] OLD-001 [5GB]", datetime(2020, 1, 1))]
+        return f'<html><body><table id="ajaxtable"><tbody id="tbody">{"".join(rows)}</tbody></table></body></html>'
+
+    @staticmethod
+    def _t66y_row(tid, title, when):
+        return (f'<tr class="tr3"><td>.::</td><td><h3><a href="/htm_data/2509/15/{tid}.html">{title}</a></h3></td>'
+                f'<td><span title="{when:%Y-%m-%d %H:%M:%S}">{when:%Y-%m-%d}</span></td></tr>')
+
+    def t66y_thread(self, tid):
+        t = next((t for t in self.threads if t["tid"] == tid), None)
+        if t is None:
+            return None
+        return (f'<html><body><div class="tpc_content">{t["code"]}<br>'
+                f'<a href="http://www.rmdown.com/link.php?hash=233{t["btih"].lower()}">rmdown</a></div></body></html>')
+
+    # ---------- Sheets 初始內容 ----------
+    def status_values(self):
+        values = [STATUS_HEADERS]
+        for code in self.status_codes:
+            d = self.detail(code)
+            hrs = d["minutes"] / 60
+            best = max(d["magnets"], key=lambda m: _gb(m[1]), default=None)
+            gbph = round(_gb(best[1]) / hrs, 2) if best else 0
+            values.append([
+                code, d["date"], f'{d["minutes"]}分鐘', d["studio"], d["label"], " ; ".join(d["genres"]),
+                " ; ".join(d["actors"]),
+                best[0] if best else "", _gb(best[1]) if best else "", best[2] if best else "", best[3] if best else "",
+                gbph, "TRUE" if gbph > 4 else "FALSE", ", ".join(best[4]) if best else "",
+                self.status[code], "Failed" if d["actors"][0] in self.failed_actors else "Multiple",
+            ])
+        return values
+
+    def rating_values(self):
+        return [RATING_HEADERS] + [
+            [a, "", "", "", "", "", "", "Failed" if a in self.failed_actors else "", ""] for a in self.actors
+        ]
+
+    # ---------- qbCooking / uT 資料夾樹 ----------
+    def build_tree(self, root):
+        paths = {k: os.path.join(root, *p) for k, p in
+                 {"qb": ["qbCooking"], "ut": ["Cooked", "uT"], "external": ["external_uT"]}.items()}
+        for p in paths.values():
+            os.makedirs(p, exist_ok=True)
+        for code in self.qb_folders:
+            folder = os.path.join(paths["qb"], f"{code}[4K]")
+            os.makedirs(folder, exist_ok=True)
+            _write_mkv(os.path.join(folder, f"{code.lower()}.mkv"), code)
+            if code in self.qb_pending:
+                _write_mkv(os.path.join(folder, f"{code.lower()}-part2.mkv.!qb"), code)
+        for i, code in enumerate(self.ut_files):
+            folder = paths["ut"] if i % 2 == 0 else paths["external"]
+            size = DUP_VIDEO_BYTES if code in self.ut_dups else VIDEO_BYTES
+            _write_mkv(os.path.join(folder, f"{code}.mkv"), code, size)
+            if code in self.ut_dups:
+                shutil.copyfile(os.path.join(folder, f"{code}.mkv"), os.path.join(folder, f"{code}_duplicated_1.mkv"))
+        return paths
+
+def _btn(text):
+    return f'<a class="btn">{text}</a>'
+
+def _gb(size_text):
+    m = re.match(r"([\d.]+)(GB|MB)", size_text or "")
+    if not m:
+        return 0.0
+    return float(m.group(1)) / (1000 if m.group(2) == "MB" else 1)
+
+def _write_mkv(path, code, size=VIDEO_BYTES):
+    """有 SeekHead / Info / Tracks 的最小 MKV，其餘以 Cluster 補到指定大小。"""
+    rng = random.Random(f"mkv:{code}")
+    width, height = rng.choice([(3840, 2160), (3840, 2160), (1920, 1080)])
+    fps_ns = rng.choice([16683333, 33366667])
+    info = ebml.element(ebml.INFO, ebml.element(ebml.TIMECODE_SCALE, 1000000)
+                        + ebml.element(ebml.DURATION, struct.pack(">d", 7200000.0)))
+    tracks = ebml.element(ebml.TRACKS, ebml.element(ebml.TRACK_ENTRY,
+        ebml.element(ebml.TRACK_TYPE, 1) + ebml.element(ebml.CODEC_ID, "V_MPEGH/ISO/HEVC")
+        + ebml.element(ebml.DEFAULT_DURATION, fps_ns)
+        + ebml.element(ebml.VIDEO, ebml.element(ebml.PIXEL_WIDTH, width) + ebml.element(ebml.PIXEL_HEIGHT, height))))
+
+    def seekhead(info_pos, tracks_pos):
+        return ebml.element(ebml.SEEK_HEAD, b"".join(
+            ebml.element(ebml.SEEK, ebml.element(ebml.SEEK_ID, ebml.encode_id(eid))
+                         + ebml.element(ebml.SEEK_POSITION, pos.to_bytes(8, "big")))
+            for eid, pos in ((ebml.INFO, info_pos), (ebml.TRACKS, tracks_pos))))
+
+    pad = ebml.void(256)
+    head_len = len(seekhead(0, 0))
+    info_pos = head_len + len(pad)
+    body = seekhead(info_pos, info_pos + len(info)) + pad + info + tracks
+    header = ebml.element(ebml.EBML, ebml.element(0x4282, "matroska"))
+    cluster_len = max(16, size - len(header) - 12 - len(body) - 12)
+    body += ebml.element(ebml.CLUSTER, b"\x00" * cluster_len, size_len=8)
+    with open(path, "wb") as f:
+        f.write(header + ebml.encode_id(ebml.SEGMENT) + ebml.encode_size(len(body), 8) + body)
+
+# -----------------------------
+# FakeSheets：記憶體內的 Sheets v4 / Drive（只實作腳本用到的部分）
+# -----------------------------
+class SheetsError(Exception):
+    def __init__(self, code, message, status="INVALID_ARGUMENT"):
+        super().__init__(message)
+        self.code, self.status = code, status
+
+def _col_index(letters):
+    n = 0
+    for ch in letters:
+        n = n * 26 + ord(ch) - 64
+    return n - 1
+
+def _col_letters(i):
+    s = ""
+    i += 1
+    while i:
+        i, r = divmod(i - 1, 26)
+        s = chr(65 + r) + s
+    return s
+
+_CELL_RE = re.compile(r"^([A-Z]*)(\d*)$")
+_A1_RE   = re.compile(r"^[A-Z]*\d*(:[A-Z]*\d*)?$")
+
+def _is_a1(text):
+    return bool(text) and bool(_A1_RE.match(text))
+
+def _parse_range(rng, default_title):
+    """'Status'!A2:B → (title, r0, c0, r1, c1)；索引從 0 起，r1 / c1 為開區間，None 表示到底。"""
+    title, sep, a1 = rng.rpartition("!")
+    if not sep:
+        title, a1 = (default_title, rng) if _is_a1(rng) else (rng, "")
+    if title.startswith("'") and title.endswith("'"):
+        title = title[1:-1].replace("''", "'")
+    if not a1:
+        return title, 0, 0, None, None
+    parts = a1.upper().split(":")
+    m0 = _CELL_RE.match(parts[0])
+    m1 = _CELL_RE.match(parts[-1])
+    r0 = int(m0.group(2)) - 1 if m0.group(2) else 0
+    c0 = _col_index(m0.group(1)) if m0.group(1) else 0
+    r1 = int(m1.group(2)) if m1.group(2) else None
+    c1 = _col_index(m1.group(1)) + 1 if m1.group(1) else None
+    return title, r0, c0, r1, c1
+
+def _cell_text(v):
+    if v is None:
+        return ""
+    if isinstance(v, bool):
+        return "TRUE" if v else "FALSE"
+    if isinstance(v, float) and v.is_integer():
+        return str(int(v))
+    return str(v)
+
+def _trim(rows):
+    rows = [list(r) for r in rows]
+    for r in rows:
+        while r and r[-1] == "":
+            r.pop()
+    while rows and not rows[-1]:
+        rows.pop()
+    return rows
+
+class FakeSheets:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.books = {}
+        self._next_sheet_id = 1000
+        self._last_modified = None
+
+    def _touch(self, book):
+        now = datetime.utcnow()
+        if self._last_modified and now <= self._last_modified:
+            now = self._last_modified + timedelta(microseconds=1)
+        self._last_modified = now
+        book["modified"] = now.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+    def add_book(self, spreadsheet_id, title="chasingForPeace"):
+        book = {"title": title, "sheets": []}
+        self._touch(book)
+        self.books[spreadsheet_id] = book
+        return book
+
+    def add_tab(self, book, title, values=None, rows=1000, cols=26):
+        if any(s["title"] == title for s in book["sheets"]):
+            raise SheetsError(400, f'A sheet with the name "{title}" already exists.')
+        values = [[_cell_text(v) for v in r] for r in (values or [])]
+        sheet = {"id": self._next_sheet_id, "title": title, "values": values,
+                 "rows": max(int(rows), len(values)), "cols": max([int(cols)] + [len(r) for r in values])}
+        self._next_sheet_id += 1
+        book["sheets"].append(sheet)
+        self._touch(book)
+        return sheet
+
+    # ---------- 工具 ----------
+    def _book(self, spreadsheet_id):
+        book = self.books.get(spreadsheet_id)
+        if book is None:
+            raise SheetsError(404, "Requested entity was not found.", "NOT_FOUND")
+        return book
+
+    def _sheet(self, book, title):
+        for s in book["sheets"]:
+            if s["title"] == title:
+                return s
+        raise SheetsError(400, f"Unable to parse range: {title}")
+
+    def _properties(self, book, s):
+        return {"sheetId": s["id"], "title": s["title"], "index": book["sheets"].index(s), "sheetType": "GRID",
+                "gridProperties": {"rowCount": s["rows"], "columnCount": s["cols"]}}
+
+    def _metadata(self, spreadsheet_id, book):
+        return {"spreadsheetId": spreadsheet_id, "properties": {"title": book["title"], "locale": "zh_TW",
+                                                                 "timeZone": "Asia/Taipei"},
+                "sheets": [{"properties": self._properties(book, s)} for s in book["sheets"]]}
+
+    def _read(self, book, rng, major="ROWS"):
+        title, r0, c0, r1, c1 = _parse_range(rng, book["sheets"][0]["title"])
+        s = self._sheet(book, title)
+        rows = _trim([r[c0:c1] for r in s["values"][r0:r1]])
+        if major == "COLUMNS":
+            width = max((len(r) for r in rows), default=0)
+            rows = _trim([[r[c] if c < len(r) else "" for r in rows] for c in range(width)])
+        last_col = _col_letters(max(c0, (c1 or s["cols"]) - 1))
+        out = {"range": f"'{title}'!{_col_letters(c0)}{r0 + 1}:{last_col}{max(r0 + 1, r1 or s['rows'])}",
+               "majorDimension": major}
+        if rows:
+            out["values"] = rows
+        return out
+
+    def _write(self, book, rng, values, major="ROWS", at_end=False):
+        title, r0, c0, _, _ = _parse_range(rng, book["sheets"][0]["title"])
+        s = self._sheet(book, title)
+        rows = [[_cell_text(v) for v in r] for r in (values or [])]
+        if major == "COLUMNS":
+            width = max((len(r) for r in rows), default=0)
+            rows = [[r[c] if c < len(r) else "" for r in rows] for c in range(width)]
+        if at_end:
+            r0 = len(_trim(s["values"]))
+        grid = s["values"]
+        for i, row in enumerate(rows):
+            while len(grid) <= r0 + i:
+                grid.append([])
+            target = grid[r0 + i]
+            if len(target) < c0 + len(row):
+                target.extend([""] * (c0 + len(row) - len(target)))
+            target[c0:c0 + len(row)] = row
+        s["rows"] = max(s["rows"], len(grid))
+        s["cols"] = max([s["cols"]] + [c0 + len(r) for r in rows])
+        self._touch(book)
+        width = max((len(r) for r in rows), default=1)
+        updated = f"'{title}'!{_col_letters(c0)}{r0 + 1}:{_col_letters(c0 + width - 1)}{r0 + max(1, len(rows))}"
+        return {"updatedRange": updated, "updatedRows": len(rows), "updatedColumns": width,
+                "updatedCells": sum(len(r) for r in rows)}
+
+    def _batch_update(self, spreadsheet_id, book, requests):
+        replies = []
+        for req in requests:
+            (kind, body), = req.items()
+            reply = {}
+            if kind == "addSheet":
+                props = body.get("properties", {})
+                grid = props.get("gridProperties", {})
+                s = self.add_tab(book, props.get("title") or f"工作表{len(book['sheets']) + 1}",
+                                 rows=grid.get("rowCount", 1000), cols=grid.get("columnCount", 26))
+                reply = {"addSheet": {"properties": self._properties(book, s)}}
+            elif kind == "deleteSheet":
+                book["sheets"] = [s for s in book["sheets"] if s["id"] != body["sheetId"]]
+            elif kind in ("deleteDimension", "insertDimension"):
+                r = body["range"]
+                s = next(s for s in book["sheets"] if s["id"] == r["sheetId"])
+                start, end = r["startIndex"], r["endIndex"]
+                if r["dimension"] == "ROWS" and kind == "deleteDimension":
+                    del s["values"][start:end]
+                    s["rows"] -= min(end, s["rows"]) - start
+                elif r["dimension"] == "ROWS":
+                    s["values"][start:start] = [[] for _ in range(end - start)]
+                    s["rows"] += end - start
+                elif kind == "deleteDimension":
+                    for row in s["values"]:
+                        del row[start:end]
+                    s["cols"] -= min(end, s["cols"]) - start
+            elif kind == "appendDimension":
+                s = next(s for s in book["sheets"] if s["id"] == body["sheetId"])
+                s["rows" if body["dimension"] == "ROWS" else "cols"] += body["length"]
+            # 其他（格式、條件式格式…）只回空的 reply
+            replies.append(reply)
+        self._touch(book)
+        return {"spreadsheetId": spreadsheet_id, "replies": replies}
+
+    # ---------- REST 進入點 ----------
+    def handle(self, method, raw_path, query, body):
+        """回傳 (HTTP 狀態碼, JSON 物件, 讀 / 寫)。"""
+        with self.lock:
+            try:
+                return self._route(method, raw_path, query, body)
+            except SheetsError as e:
+                return e.code, {"error": {"code": e.code, "message": str(e), "status": e.status}}, "error"
+
+    def _route(self, method, raw_path, query, body):
+        m = re.match(r"^/drive/v3/files/([^/?]+)$", raw_path)
+        if m:
+            book = self._book(unquote(m.group(1)))
+            return 200, {"id": m.group(1), "modifiedTime": book["modified"]}, "read"
+
+        m = re.match(r"^/v4/spreadsheets/([^/:]+)(.*)$", raw_path)
+        if not m:
+            raise SheetsError(404, f"Unknown path {raw_path}", "NOT_FOUND")
+        spreadsheet_id, rest = unquote(m.group(1)), m.group(2)
+        book = self._book(spreadsheet_id)
+        major = query.get("majorDimension", ["ROWS"])[0]
+
+        if rest == "" and method == "GET":
+            return 200, self._metadata(spreadsheet_id, book), "read"
+        if rest == ":batchUpdate":
+            return 200, self._batch_update(spreadsheet_id, book, body.get("requests", [])), "write"
+        if rest == "/values:batchGet":
+            return 200, {"spreadsheetId": spreadsheet_id,
+                         "valueRanges": [self._read(book, r, major) for r in query.get("ranges", [])]}, "read"
+        if rest == "/values:batchUpdate":
+            responses = [self._write(book, d["range"], d.get("values"), d.get("majorDimension", "ROWS"))
+                         for d in body.get("data", [])]
+            return 200, {"spreadsheetId": spreadsheet_id, "totalUpdatedCells":
+                         sum(r["updatedCells"] for r in responses), "responses": responses}, "write"
+        if rest == "/values:batchClear":
+            for r in body.get("ranges", []):
+                self._clear(book, r)
+            return 200, {"spreadsheetId": spreadsheet_id, "clearedRanges": body.get("ranges", [])}, "write"
+        if rest.startswith("/values/"):
+            target = rest[len("/values/"):]
+            for suffix in (":append", ":clear"):
+                if target.endswith(suffix):
+                    rng = unquote(target[:-len(suffix)])
+                    if suffix == ":clear":
+                        self._clear(book, rng)
+                        return 200, {"spreadsheetId": spreadsheet_id, "clearedRange": rng}, "write"
+                    updates = self._write(book, rng, body.get("values"), body.get("majorDimension", "ROWS"),
+                                          at_end=True)
+                    return 200, {"spreadsheetId": spreadsheet_id, "tableRange": rng,
+                                 "updates": dict(updates, spreadsheetId=spreadsheet_id)}, "write"
+            rng = unquote(target)
+            if method == "GET":
+                return 200, self._read(book, rng, major), "read"
+            if method == "PUT":
+                return 200, dict(self._write(book, rng, body.get("values"), body.get("majorDimension", "ROWS")),
+                                 spreadsheetId=spreadsheet_id), "write"
+        raise SheetsError(404, f"Unknown path {method} {raw_path}", "NOT_FOUND")
+
+    def _clear(self, book, rng):
+        title, r0, c0, r1, c1 = _parse_range(rng, book["sheets"][0]["title"])
+        s = self._sheet(book, title)
+        for row in s["values"][r0:r1]:
+            for c in range(c0, min(len(row), c1 if c1 is not None else len(row))):
+                row[c] = ""
+        self._touch(book)
+
+    def dump(self, path):
+        with self.lock:
+            data = {sid: {"title": b["title"], "modified": b["modified"],
+                          "sheets": {s["title"]: _trim(s["values"]) for s in b["sheets"]}}
+                    for sid, b in self.books.items()}
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(path + ".tmp", path)
+
+# -----------------------------
+# FakeQbittorrent：qBittorrent Web API v2 中 download_queue 用到的端點
+# -----------------------------
+_BTIH_RE = re.compile(r"urn:btih:([0-9A-Fa-f]{40})")
+
+def _form(content_type, raw):
+    """application/x-www-form-urlencoded 或 multipart/form-data → {欄位: 值}"""
+    if content_type.startswith("multipart/form-data"):
+        msg = BytesParser(policy=HTTP).parsebytes(f"Content-Type: {content_type}\r\n\r\n".encode() + raw)
+        return {part.get_param("name", header="content-disposition"): part.get_content()
+                for part in msg.iter_parts()}
+    return {k: v[0] for k, v in parse_qs(raw.decode("utf-8")).items()}
+
+class FakeQbittorrent:
+    def __init__(self, free_bytes=QBT_FREE_BYTES):
+        self.free_bytes = free_bytes
+        self.torrents = {}
+        self.lock = threading.Lock()
+
+    def handle(self, method, path, form):
+        """回傳 (status, body, content_type)。"""
+        if path == "/api/v2/auth/login" and method == "POST":
+            return 200, "Ok.", "text/plain"
+        if path == "/api/v2/sync/maindata":
+            with self.lock:
+                body = {"rid": 1, "full_update": True, "torrents": dict(self.torrents),
+                        "server_state": {"free_space_on_disk": self.free_bytes, "dl_rate_limit": 0}}
+            return 200, json.dumps(body, ensure_ascii=False), "application/json"
+        if path == "/api/v2/torrents/add" and method == "POST":
+            hashes = [m.group(1).lower() for m in map(_BTIH_RE.search, form.get("urls", "").splitlines()) if m]
+            if not hashes:
+                return 200, "Fails.", "text/plain"
+            with self.lock:
+                for h in hashes:
+                    self.torrents.setdefault(h, {"name": h, "state": "downloading", "amount_left": QBT_TORRENT_BYTES,
+                                                 "category": form.get("category", ""),
+                                                 "save_path": form.get("savepath", "")})
+            return 200, "Ok.", "text/plain"
+        return 404, "Not Found", "text/plain"
+
+# -----------------------------
+# HTTP 伺服器：/javbus、/t66y 為假站台，/qbt 為假 qBittorrent，其餘為假 Sheets / Drive
+# -----------------------------
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PUT(self):
+        self._dispatch("PUT")
+
+    def _send(self, status, body, content_type):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _dispatch(self, method):
+        server = self.server
+        parts = urlsplit(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+
+        if parts.path.startswith("/qbt/"):
+            status, body, content_type = server.qbt.handle(
+                method, parts.path[len("/qbt"):], _form(self.headers.get("Content-Type", ""), raw))
+            server.count("qbittorrent")
+            return self._send(status, body, f"{content_type}; charset=utf-8")
+
+        if parts.path.startswith(("/javbus", "/t66y")):
+            server.sleep(server.latency)
+            kind, html = server.page(parts.path, parse_qs(parts.query))
+            server.count(kind)
+            if html is None:
+                return self._send(404, "<html><body>404</body></html>", "text/html; charset=utf-8")
+            return self._send(200, html, "text/html; charset=utf-8")
+
+        server.sleep(server.sheets_latency)
+        try:
+            body = json.loads(raw) if raw else {}
+        except ValueError:
+            body = {}
+        status, obj, kind = server.sheets.handle(method, parts.path, parse_qs(parts.query), body)
+        server.count(f"{'drive' if parts.path.startswith('/drive') else 'sheets'}_{kind}")
+        self._send(status, json.dumps(obj, ensure_ascii=False), "application/json; charset=utf-8")
+
+class FakeServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, world, sheets, latency=0.0, sheets_latency=0.0, port=0):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.world, self.sheets = world, sheets
+        self.qbt = FakeQbittorrent()
+        self.latency, self.sheets_latency = latency, sheets_latency
+        self.counts = {}
+        self._count_lock = threading.Lock()
+        self._rng = random.Random(1)
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            time.sleep(seconds * self._rng.uniform(0.5, 1.5))
+
+    def count(self, kind):
+        with self._count_lock:
+            self.counts[kind] = self.counts.get(kind, 0) + 1
+
+    def snapshot_counts(self):
+        with self._count_lock:
+            return dict(self.counts)
+
+    def page(self, path, query):
+        if path.startswith("/javbus"):
+            rest = path[len("/javbus"):].strip("/")
+            if rest == "":
+                return "javbus_listing", self.world.javbus_listing(1)
+            m = re.match(r"^page/(\d+)$", rest)
+            if m:
+                return "javbus_listing", self.world.javbus_listing(int(m.group(1)))
+            return "javbus_detail", self.world.javbus_detail(unquote(rest))
+        rest = path[len("/t66y"):]
+        if rest.startswith("/thread0806.php"):
+            return "t66y_listing", self.world.t66y_listing(int(query.get("page", ["1"])[0]))
+        m = re.match(r"^/htm_data/.*/(\d+)\.html$", rest)
+        if m:
+            return "t66y_thread", self.world.t66y_thread(int(m.group(1)))
+        return "unknown", None
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+# -----------------------------
+# 子行程：執行腳本並記錄記憶體峰值與 run_metrics 摘要
+# -----------------------------
+def peak_rss_bytes():
+    if sys.platform == "win32":
+        import ctypes
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD)] + [
+                (name, ctypes.c_size_t) for name in (
+                    "PeakWorkingSetSize", "WorkingSetSize", "QuotaPeakPagedPoolUsage", "QuotaPagedPoolUsage",
+                    "QuotaPeakNonPagedPoolUsage", "QuotaNonPagedPoolUsage", "PagefileUsage", "PeakPagefileUsage")]
+
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        kernel32 = ctypes.windll.kernel32
+        kernel32.GetCurrentProcess.restype = wintypes.HANDLE
+        ctypes.windll.psapi.GetProcessMemoryInfo(kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb)
+        return counters.PeakWorkingSetSize
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def _child_main(script):
+    result_path = os.environ["CHASING_HARNESS_RESULT"]
+
+    def write_result():
+        out = {"peak_rss_bytes": peak_rss_bytes()}
+        run_metrics = sys.modules.get("run_metrics")
+        if run_metrics is not None:
+            out["metrics"] = run_metrics.summary()[0]
+        with open(result_path, "w", encoding="utf-8") as f:
+            json.dump(out, f, ensure_ascii=False)
+
+    # 先登記：atexit 後進先出，會在 run_metrics 寫完報表之後才執行
+    atexit.register(write_result)
+    import runpy
+    sys.argv = [script]
+    runpy.run_path(script, run_name="__main__")
+
+# -----------------------------
+# 工作目錄 / 初始試算表
+# -----------------------------
+def prepare_workdir(workdir):
+    if os.path.isdir(workdir) and os.listdir(workdir):
+        if not os.path.exists(os.path.join(workdir, MARKER)):
+            raise SystemExit(f"❌ {workdir} 不是空的，也不是 loadtest_harness 建立的工作目錄")
+        shutil.rmtree(workdir)
+    code_dir = os.path.join(workdir, "code")
+    os.makedirs(code_dir)
+    os.makedirs(os.path.join(workdir, "logs"))
+    open(os.path.join(workdir, MARKER), "w").close()
+    for name in os.listdir(HERE):
+        if name.endswith(".py"):
+            shutil.copy2(os.path.join(HERE, name), code_dir)
+    return code_dir
+
+def seed_sheets(world):
+    sheets = FakeSheets()
+    book = sheets.add_book(SPREADSHEET_ID)
+    sheets.add_tab(book, "Status", world.status_values(), cols=len(STATUS_HEADERS))
+    sheets.add_tab(book, "Rating", world.rating_values(), cols=len(RATING_HEADERS))
+    return sheets
+
+# -----------------------------
+# run：依序執行各腳本，彙整報表
+# -----------------------------
+def _calls(metrics, kind=None):
+    return sum(c["value"] for c in metrics.get("counters", [])
+               if c["name"] == "sheets_api_calls_total" and (kind is None or c["labels"].get("kind") == kind))
+
+def _pages(metrics):
+    return sum(c["value"] for c in metrics.get("counters", []) if c["name"] == "pages_fetched_total")
+
+def run(scale=1.0, scripts=SCRIPTS, workdir=None, latency=0.0, sheets_latency=0.0, seed=0,
+        browser=False, dump_sheets=None):
+    workdir = os.path.abspath(workdir or tempfile.mkdtemp(prefix="chasing_loadtest_"))
+    code_dir = prepare_workdir(workdir)
+
+    t0 = time.perf_counter()
+    world = World(scale, seed)
+    paths = world.build_tree(os.path.join(workdir, "files"))
+    server = FakeServer(world, seed_sheets(world), latency, sheets_latency).start()
+    print(f"🧪 scale={scale}：新種 {len(world.new_codes)}、Status {len(world.status_codes)} 列、"
+          f"t66y {len(world.threads)} 篇、qbCooking {len(world.qb_folders)} 個、uT {len(world.ut_files)} 個"
+          f"（準備 {time.perf_counter() - t0:.1f}s）")
+    print(f"   工作目錄：{workdir}")
+    print(f"   假服務：{server.base_url}")
+
+    env = dict(os.environ)
+    for k in ("CHASING_CASSETTE", "CHASING_CASSETTE_MODE"):
+        env.pop(k, None)
+    env.update({
+        "CHASING_FAKE_SHEETS": server.base_url,
+        "CHASING_JAVBUS_URL": server.base_url + "/javbus",
+        "CHASING_T66Y_URL": server.base_url + "/t66y",
+        "CHASING_QBT_URL": server.base_url + "/qbt",
+        "CHASING_UT_DIR": paths["ut"],
+        "CHASING_QB_DIR": paths["qb"],
+        "CHASING_EXTERNAL_UT_DIR": paths["external"],
+        "PYTHONIOENCODING": "utf-8",
+    })
+    if not browser:
+        env["CHASING_HTTP_DRIVER"] = "1"
+
+    report = {"scale": scale, "seed": seed, "latency": latency, "sheets_latency": sheets_latency,
+              "workdir": workdir, "scripts": []}
+    for script in scripts:
+        result_path = os.path.join(workdir, "logs", f"{script}.result.json")
+        log_path = os.path.join(workdir, "logs", f"{script}.log")
+        before = server.snapshot_counts()
+        print(f"\n▶️ {script} …")
+        t = time.perf_counter()
+        with open(log_path, "w", encoding="utf-8") as log:
+            proc = subprocess.run(
+                [sys.executable, os.path.join(code_dir, "loadtest_harness.py"), "--child", f"{script}.py"],
+                cwd=code_dir, env=dict(env, CHASING_HARNESS_RESULT=result_path),
+                stdout=log, stderr=subprocess.STDOUT,
+            )
+        wall = time.perf_counter() - t
+        after = server.snapshot_counts()
+        served = {k: after.get(k, 0) - before.get(k, 0) for k in after if after.get(k, 0) != before.get(k, 0)}
+        child = {}
+        if os.path.exists(result_path):
+            with open(result_path, encoding="utf-8") as f:
+                child = json.load(f)
+        metrics = child.get("metrics", {})
+        pages = _pages(metrics)
+        entry = {
+            "script": script, "exit_code": proc.returncode, "wall_seconds": round(wall, 2),
+            "pages": pages, "pages_per_second": round(pages / wall, 2) if wall else 0,
+            "sheets_reads": _calls(metrics, "read"), "sheets_writes": _calls(metrics, "write"),
+            "served": served, "peak_rss_mb": round(child.get("peak_rss_bytes", 0) / 2**20, 1),
+            "log": log_path,
+        }
+        report["scripts"].append(entry)
+        mark = "✅" if proc.returncode == 0 else f"❌（exit {proc.returncode}，見 {log_path}）"
+        print(f"   {mark} {wall:.1f}s，頁面 {pages}（{entry['pages_per_second']}/s），"
+              f"Sheets 讀 {entry['sheets_reads']} / 寫 {entry['sheets_writes']}，峰值 {entry['peak_rss_mb']} MB")
+
+    server.shutdown()
+    if dump_sheets:
+        server.sheets.dump(dump_sheets)
+    with open(os.path.join(workdir, "report.json"), "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    _print_table(report)
+    return report
+
+def _print_table(report):
+    print(f"\n{'腳本':<30}{'結果':>6}{'秒':>9}{'頁面':>8}{'頁/秒':>8}{'讀':>7}{'寫':>7}{'峰值MB':>9}")
+    for e in report["scripts"]:
+        ok = "OK" if e["exit_code"] == 0 else f"E{e['exit_code']}"
+        print(f"{e['script']:<30}{ok:>6}{e['wall_seconds']:>9}{e['pages']:>8}{e['pages_per_second']:>8}"
+              f"{e['sheets_reads']:>7}{e['sheets_writes']:>7}{e['peak_rss_mb']:>9}")
+    print(f"報表：{os.path.join(report['workdir'], 'report.json')}")
+
+# -----------------------------
+# main
+# -----------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="以本機假服務對完整流程做負載測試")
+    parser.add_argument("--scale", type=float, default=10.0, help="資料量倍數（1 約為目前實際規模）")
+    parser.add_argument("--scripts", default=",".join(SCRIPTS), help="要執行的腳本（逗號分隔，依序）")
+    parser.add_argument("--workdir", help="工作目錄（預設為新的暫存目錄）")
+    parser.add_argument("--latency", type=float, default=0.0, help="假站台每頁的平均延遲秒數")
+    parser.add_argument("--sheets-latency", type=float, default=0.0, help="假 Sheets 每次請求的平均延遲秒數")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--browser", action="store_true", help="用真正的 Edge 開本機假站台（預設以 HTTP driver 抓頁）")
+    parser.add_argument("--dump-sheets", help="結束時把假試算表內容寫到這個 JSON 檔")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        return _child_main(args.child)
+    scripts = [s.strip().removesuffix(".py") for s in args.scripts.split(",") if s.strip()]
+    unknown = [s for s in scripts if s not in SCRIPTS]
+    if unknown:
+        parser.error(f"未知的腳本：{', '.join(unknown)}")
+    run(args.scale, scripts, args.workdir, args.latency, args.sheets_latency, args.seed,
+        args.browser, args.dump_sheets)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+磁力索引：把 javbus（mglinks_checkList）、t66y（checkList_t66y）與 Status 中的磁力連結
+正規化成同一種 info-hash（40 碼小寫 hex），記錄每個 hash 出現過的來源與 Status 狀態，
+讓腳本在 O(1) 內判斷「這個 hash 是否已排入下載或已下載」。
+"""
+import os
+import re
+import base64
+import sqlite3
+from datetime import datetime
+
+# -----------------------------
+# 設定
+# -----------------------------
+MAGNET_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "magnet_index.db")
+QUEUED_STATES  = {"等待下載", "下載中", "下載完成", "已閱"}
+SOURCE_T66Y    = "checkList_t66y"
+SOURCE_JAVBUS  = "mglinks_checkList"
+
+_BTIH_RE = re.compile(r"urn:btih:([0-9A-Za-z]+)", re.IGNORECASE)
+
+# -----------------------------
+# normalize_btih：magnet 連結 / urn:btih / hex / base32 → 40 碼小寫 hex；無法辨識回傳 ""
+# -----------------------------
+def normalize_btih(value):
+    if not value:
+        return ""
+    value = str(value).strip()
+    m = _BTIH_RE.search(value)
+    h = m.group(1) if m else value
+    if len(h) == 40 and re.fullmatch(r"[0-9A-Fa-f]{40}", h):
+        return h.lower()
+    if len(h) == 32 and re.fullmatch(r"[A-Za-z2-7]{32}", h):
+        return base64.b32decode(h.upper()).hex()
+    return ""
+
+# -----------------------------
+# rmdown_to_btih：rmdown 的 hash 參數前面多了 3 碼前綴
+# -----------------------------
+def rmdown_to_btih(hash_val):
+    actual = hash_val[3:] if len(hash_val) > 36 else hash_val
+    return normalize_btih(actual) or actual
+
+# -----------------------------
+# open_index / register / sync_status
+# -----------------------------
+def open_index(db_path=MAGNET_DB_PATH):
+    conn = sqlite3.connect(db_path)
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS magnets (
+            btih    TEXT,
+            source  TEXT,
+            ident   TEXT,
+            magnet  TEXT,
+            seen_at TEXT,
+            PRIMARY KEY (btih, source, ident)
+        );
+        CREATE TABLE IF NOT EXISTS status (
+            btih   TEXT PRIMARY KEY,
+            ident  TEXT,
+            status TEXT
+        );
+    """)
+    return conn
+
+def register(conn, source, rows, complete=False):
+    """
+    rows：[(ident, magnet), ...]；回傳成功正規化的筆數。
+    complete=True 表示 rows 是該來源目前的全部列（例如整份 checkList_t66y），
+    已從工作表刪除的 hash 一併移除，之後同一部片才能再被列入。
+    """
+    now = datetime.now().isoformat(timespec="seconds")
+    data = []
+    for ident, magnet in rows:
+        btih = normalize_btih(magnet)
+        if btih:
+            data.append((btih, source, str(ident).strip().upper(), magnet, now))
+    if complete:
+        current = {(btih, ident) for btih, _, ident, _, _ in data}
+        stale = [(btih, source, ident)
+                 for btih, ident in conn.execute("SELECT btih, ident FROM magnets WHERE source = ?", (source,))
+                 if (btih, ident) not in current]
+        conn.executemany("DELETE FROM magnets WHERE btih = ? AND source = ? AND ident = ?", stale)
+    conn.executemany("INSERT OR IGNORE INTO magnets VALUES (?, ?, ?, ?, ?)", data)
+    conn.commit()
+    return len(data)
+
+def sync_status(conn, status_df, archived=None):
+    """
+    以 Status 模型（status_model）重建 hash → 狀態 對照。
+    已封存（移出 Status）的片沿用封存時的狀態：archived 為 {ident: (status, magnet)}，預設讀 status_archive；
+    封存索引沒有記到 magnet 的（舊版封存），保留對照表中原本的那一列。
+    """
+    if archived is None:
+        import status_archive
+        archived = status_archive.archived_magnets()
+    data = [row for row in conn.execute("SELECT btih, ident, status FROM status") if row[1] in archived]
+    for ident, (status, magnet) in archived.items():
+        btih = normalize_btih(magnet)
+        if btih:
+            data.append((btih, ident, status))
+    for ident, magnet, status in zip(status_df.index, status_df["Magnet 連結"], status_df["狀態"].astype(str)):
+        btih = normalize_btih(magnet)
+        if btih:
+            data.append((btih, ident, status))
+    conn.execute("DELETE FROM status")
+    # 後面的列覆蓋前面的：Status 中的狀態優先於封存時的狀態
+    conn.executemany("INSERT OR REPLACE INTO status VALUES (?, ?, ?)", data)
+    conn.commit()
+    return len(data)
+
+# -----------------------------
+# load_lookup：一次讀進記憶體，之後以 dict 做 O(1) 查詢
+#    {btih: {"sources": {source: ident}, "ident": Status 辨識碼, "status": Status 狀態}}
+# -----------------------------
+def load_lookup(conn):
+    lookup = {}
+    for btih, source, ident in conn.execute("SELECT btih, source, ident FROM magnets"):
+        lookup.setdefault(btih, {"sources": {}, "ident": None, "status": None})["sources"][source] = ident
+    for btih, ident, status in conn.execute("SELECT btih, ident, status FROM status"):
+        entry = lookup.setdefault(btih, {"sources": {}, "ident": None, "status": None})
+        entry["ident"], entry["status"] = ident, status
+    return lookup
+
+def remember(lookup, ident, magnet, status):
+    """同一輪剛排入 Status 的 hash 加進 lookup，後面相同 info-hash 的識別碼才會看到。"""
+    btih = normalize_btih(magnet)
+    if btih and status in QUEUED_STATES:
+        entry = lookup.setdefault(btih, {"sources": {}, "ident": None, "status": None})
+        entry["ident"], entry["status"] = ident, status
+
+def already_queued(lookup, magnet):
+    """已在 Status 排入/完成下載，或已列入 checkList_t66y → 回傳原因字串，否則 None。"""
+    entry = lookup.get(normalize_btih(magnet))
+    if not entry:
+        return None
+    if entry["status"] in QUEUED_STATES:
+        return f"Status {entry['ident']} 為 {entry['status']}"
+    if SOURCE_T66Y in entry["sources"]:
+        return f"已在 {SOURCE_T66Y}（{entry['sources'][SOURCE_T66Y]}）"
+    return None
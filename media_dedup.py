@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+媒體庫去重：找出 uT / E:\\uT 中內容完全相同的影片（例如 {ident}_duplicated_{n}）。
+    1. 依檔案大小分組（大小不同不可能相同）
+    2. 同大小的檔案只讀取抽樣區塊（開頭、結尾與中間等距的幾塊）計算 blake2b
+    3. 抽樣雜湊相同才讀完整檔案確認
+雜湊以 (size, mtime) 快取在媒體庫索引（hashes 表）。確認重複後可只列出，
+或在同一個磁碟區上以硬連結取代重複檔案，釋放空間。
+"""
+import os
+import hashlib
+from datetime import datetime
+
+# -----------------------------
+# 設定
+# -----------------------------
+MIN_SIZE      = 1 * 1024 * 1024       # 小於 1 MB 的檔案不處理
+SAMPLE_BYTES  = 1 * 1024 * 1024       # 每個抽樣區塊大小
+SAMPLE_STRIDE = 4                     # 中間等距抽樣幾塊
+READ_CHUNK    = 8 * 1024 * 1024
+
+# -----------------------------
+# 雜湊
+# -----------------------------
+def sample_hash(path, size):
+    if size <= SAMPLE_BYTES * (SAMPLE_STRIDE + 2):
+        return full_hash(path)
+    h = hashlib.blake2b(digest_size=16)
+    h.update(str(size).encode())
+    offsets = [0] + [size * k // (SAMPLE_STRIDE + 1) for k in range(1, SAMPLE_STRIDE + 1)] + [size - SAMPLE_BYTES]
+    with open(path, "rb") as f:
+        for off in offsets:
+            f.seek(off)
+            h.update(f.read(SAMPLE_BYTES))
+    return h.hexdigest()
+
+def full_hash(path):
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(READ_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _cached_hash(conn, f, kind, fn):
+    row = conn.execute("SELECT size, mtime, sample, full FROM hashes WHERE path = ?", (f["path"],)).fetchone()
+    fresh = row is not None and row[0] == f["size"] and row[1] == f["mtime"]
+    if fresh and row[2 if kind == "sample" else 3]:
+        return row[2 if kind == "sample" else 3]
+    value = fn()
+    if not fresh:
+        conn.execute("INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, NULL, NULL, ?)",
+                     (f["path"], f["size"], f["mtime"], datetime.now().isoformat(timespec="seconds")))
+    conn.execute(f"UPDATE hashes SET {kind} = ? WHERE path = ?", (value, f["path"]))
+    return value
+
+# -----------------------------
+# find_duplicates：回傳內容相同的檔案群組 [[file, ...], ...]（file 為 media_library.list_files 的 dict）
+#    已是同一個實體檔案（硬連結）的不算重複
+# -----------------------------
+def _group(items, key):
+    groups = {}
+    for it in items:
+        groups.setdefault(key(it), []).append(it)
+    return [g for g in groups.values() if len(g) > 1]
+
+def find_duplicates(conn, files):
+    candidates = []
+    for same_size in _group([f for f in files if f["size"] >= MIN_SIZE], key=lambda f: f["size"]):
+        # 同一個 inode 只留一個代表
+        seen = {}
+        for f in same_size:
+            try:
+                st = os.stat(f["path"])
+            except OSError:
+                continue
+            seen.setdefault((st.st_dev, st.st_ino), f)
+        if len(seen) > 1:
+            candidates.append(list(seen.values()))
+
+    groups = []
+    for same_size in candidates:
+        for same_sample in _group(same_size, key=lambda f: _cached_hash(
+                conn, f, "sample", lambda: sample_hash(f["path"], f["size"]))):
+            groups.extend(_group(same_sample, key=lambda f: _cached_hash(
+                conn, f, "full", lambda: full_hash(f["path"]))))
+    conn.commit()
+    return groups
+
+# -----------------------------
+# hardlink_group：保留一份（名稱不含 _duplicated_、較早的），其餘改成指向它的硬連結
+#    不同磁碟區無法硬連結，只回報；回傳釋放的位元組數
+# -----------------------------
+def _keeper(group):
+    return min(group, key=lambda f: ("_duplicated_" in f["name"], f["mtime"], f["path"]))
+
+def hardlink_group(group):
+    keep = _keeper(group)
+    keep_dev = os.stat(keep["path"]).st_dev
+    freed = 0
+    for f in group:
+        if f is keep:
+            continue
+        if os.stat(f["path"]).st_dev != keep_dev:
+            print(f"  ↔️ 不同磁碟區，保留：{f['path']}")
+            continue
+        tmp = f["path"] + ".dedup_tmp"
+        os.link(keep["path"], tmp)
+        os.replace(tmp, f["path"])
+        freed += f["size"]
+        print(f"  🔗 {f['path']} → {keep['path']}")
+    return freed
+
+def report(groups, hardlink=False):
+    reclaim = 0
+    for group in groups:
+        keep = _keeper(group)
+        print(f"♊ {len(group)} 份相同內容（{keep['size'] / 1e9:.2f} GB）：保留 {keep['path']}")
+        for f in group:
+            if f is not keep:
+                print(f"  - {f['path']}")
+        reclaim += hardlink_group(group) if hardlink else keep["size"] * (len(group) - 1)
+    verb = "已釋放" if hardlink else "可釋放"
+    print(f"去重：{len(groups)} 組重複，{verb} {reclaim / 1e9:.2f} GB")
+    return reclaim
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+媒體庫索引：把 uT / qbCooking 等資料夾的檔案清單（路徑、大小、ctime、mtime）
+存成本機 SQLite，並記錄每個資料夾的 mtime；資料夾沒變動時直接沿用索引，不再 listdir。
+updateStatusAfterReading.py、generate_playlist、updateStatusAfterDownloading.py 共用同一份索引。
+"""
+import os
+import sqlite3
+import hashlib
+
+# -----------------------------
+# 索引檔位置（與腳本放在同一個資料夾）
+# -----------------------------
+LIBRARY_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "media_library.db")
+DIRS_SCHEMA     = "2"
+
+# -----------------------------
+# open_library：開啟（必要時建立）索引
+# -----------------------------
+def open_library(db_path=LIBRARY_DB_PATH):
+    conn = sqlite3.connect(db_path)
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS dirs (
+            path   TEXT PRIMARY KEY,
+            parent TEXT,
+            mtime  REAL
+        );
+        CREATE TABLE IF NOT EXISTS files (
+            path  TEXT PRIMARY KEY,
+            dir   TEXT,
+            name  TEXT,
+            size  INTEGER,
+            ctime REAL,
+            mtime REAL
+        );
+        CREATE INDEX IF NOT EXISTS idx_files_dir ON files(dir);
+        CREATE INDEX IF NOT EXISTS idx_dirs_parent ON dirs(parent);
+        CREATE TABLE IF NOT EXISTS file_idents (
+            path   TEXT,
+            scheme TEXT,
+            fp     TEXT,
+            ident  TEXT,
+            PRIMARY KEY (path, scheme)
+        );
+        CREATE TABLE IF NOT EXISTS meta (
+            key   TEXT PRIMARY KEY,
+            value TEXT
+        );
+        CREATE TABLE IF NOT EXISTS probes (
+            path         TEXT PRIMARY KEY,
+            size         INTEGER,
+            mtime        REAL,
+            ok           INTEGER,
+            width        INTEGER,
+            height       INTEGER,
+            fps          REAL,
+            codec        TEXT,
+            duration     REAL,
+            bitrate_kbps INTEGER,
+            probed_at    TEXT
+        );
+        CREATE TABLE IF NOT EXISTS hashes (
+            path      TEXT PRIMARY KEY,
+            size      INTEGER,
+            mtime     REAL,
+            sample    TEXT,
+            full      TEXT,
+            hashed_at TEXT
+        );
+    """)
+    # 舊版非遞迴掃描時沒有登記子資料夾：清掉資料夾 mtime，讓下一次 refresh 重新掃描一次
+    if get_meta(conn, "dirs_schema") != DIRS_SCHEMA:
+        conn.execute("UPDATE dirs SET mtime = NULL")
+        set_meta(conn, "dirs_schema", DIRS_SCHEMA)
+    return conn
+
+# -----------------------------
+# _scan_dir：重新列出單一資料夾，回傳子資料夾清單
+#    資料夾本身無法讀取時略過（索引不動，下次 refresh 再試），回傳空清單
+# -----------------------------
+def _scan_dir(conn, d, dir_mtime):
+    subdirs = []
+    files = []
+    try:
+        with os.scandir(d) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    elif entry.is_file():
+                        st = entry.stat()
+                        files.append((entry.path, d, entry.name, st.st_size, st.st_ctime, st.st_mtime))
+                except OSError as e:
+                    print(f"⚠️ 無法讀取：{entry.path}，錯誤：{e}")
+    except OSError as e:
+        print(f"⚠️ 無法讀取資料夾：{d}，錯誤：{e}")
+        return []
+
+    conn.execute("DELETE FROM files WHERE dir = ?", (d,))
+    conn.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)", files)
+    # 已不存在的子資料夾連同底下的檔案一起移除
+    known = {r[0] for r in conn.execute("SELECT path FROM dirs WHERE parent = ?", (d,))}
+    for gone in known - set(subdirs):
+        _forget_tree(conn, gone)
+    conn.execute("INSERT OR REPLACE INTO dirs VALUES (?, ?, ?)",
+                 (d, os.path.dirname(d), dir_mtime))
+    # 子資料夾一律登記（mtime 留空）：非遞迴的 refresh 之後，遞迴的 refresh 沿用這層時仍會走進去掃描
+    conn.executemany("INSERT OR IGNORE INTO dirs VALUES (?, ?, NULL)", [(s, d) for s in subdirs])
+    return subdirs
+
+# LIKE 會把路徑中的 _ 當成萬用字元，所以改用前綴比對
+def _prefix(d):
+    p = d.rstrip(os.sep) + os.sep
+    return (len(p), p)
+
+def _forget_tree(conn, d):
+    n, p = _prefix(d)
+    conn.execute("DELETE FROM files WHERE dir = ? OR substr(dir, 1, ?) = ?", (d, n, p))
+    conn.execute("DELETE FROM dirs WHERE path = ? OR substr(path, 1, ?) = ?", (d, n, p))
+    conn.execute("DELETE FROM file_idents WHERE substr(path, 1, ?) = ?", (n, p))
+
+# -----------------------------
+# refresh：更新索引；只有 mtime 變動的資料夾才重新列出
+#    - 檔案內容就地修改（例如寫 metadata、改時間戳）不會改變資料夾 mtime，
+#      這類情況請呼叫 touch_file 或 full=True
+# -----------------------------
+def refresh(conn, roots, recursive=True, full=False):
+    scanned = skipped = 0
+    for root in roots:
+        if not os.path.isdir(root):
+            print(f"⚠️ 資料夾不存在：{root}")
+            continue
+        stack = [os.path.abspath(root)]
+        while stack:
+            d = stack.pop()
+            try:
+                dir_mtime = os.stat(d).st_mtime
+            except OSError:
+                _forget_tree(conn, d)
+                continue
+            row = conn.execute("SELECT mtime FROM dirs WHERE path = ?", (d,)).fetchone()
+            if not full and row and row[0] == dir_mtime:
+                skipped += 1
+                subdirs = [r[0] for r in conn.execute("SELECT path FROM dirs WHERE parent = ?", (d,))]
+            else:
+                scanned += 1
+                subdirs = _scan_dir(conn, d, dir_mtime)
+            if recursive:
+                stack.extend(subdirs)
+    conn.execute("DELETE FROM file_idents WHERE path NOT IN (SELECT path FROM files)")
+    conn.commit()
+    print(f"📚 媒體庫索引：重新掃描 {scanned} 個資料夾，沿用 {skipped} 個")
+
+# -----------------------------
+# touch_file：單一檔案被修改或搬移後，更新（或移除）它的索引列
+# -----------------------------
+def touch_file(conn, path):
+    path = os.path.abspath(path)
+    try:
+        st = os.stat(path)
+    except OSError:
+        conn.execute("DELETE FROM files WHERE path = ?", (path,))
+        conn.commit()
+        return
+    conn.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)",
+                 (path, os.path.dirname(path), os.path.basename(path),
+                  st.st_size, st.st_ctime, st.st_mtime))
+    conn.commit()
+
+# -----------------------------
+# list_files：從索引讀取檔案（不碰磁碟）
+#    回傳 dict 清單：path / dir / name / size / ctime / mtime
+# -----------------------------
+def list_files(conn, root, recursive=True, exts=None):
+    root = os.path.abspath(root)
+    if recursive:
+        n, p = _prefix(root)
+        cur = conn.execute("SELECT path, dir, name, size, ctime, mtime FROM files "
+                           "WHERE dir = ? OR substr(dir, 1, ?) = ? ORDER BY path", (root, n, p))
+    else:
+        cur = conn.execute("SELECT path, dir, name, size, ctime, mtime FROM files "
+                           "WHERE dir = ? ORDER BY path", (root,))
+    out = []
+    for path, d, name, size, ctime, mtime in cur:
+        if exts and os.path.splitext(name)[1].lower() not in exts:
+            continue
+        out.append({"path": path, "dir": d, "name": name,
+                    "size": size, "ctime": ctime, "mtime": mtime})
+    return out
+
+# -----------------------------
+# assign_identifiers：替索引中的檔案比對辨識碼，結果也存進索引
+#    - scheme 用來區分不同腳本的比對規則
+#    - 只有在辨識碼清單變動或檔案是新的時候才重新比對
+# -----------------------------
+def assign_identifiers(conn, files, extract_fn, identifiers, scheme):
+    fp = hashlib.sha1("\n".join(sorted(identifiers)).encode("utf-8")).hexdigest()
+    cached = {
+        path: ident
+        for path, ident in conn.execute(
+            "SELECT path, ident FROM file_idents WHERE scheme = ? AND fp = ?", (scheme, fp))
+    }
+    fresh = []
+    for f in files:
+        if f["path"] in cached:
+            f["ident"] = cached[f["path"]]
+        else:
+            f["ident"] = extract_fn(f["name"], identifiers)
+            fresh.append((f["path"], scheme, fp, f["ident"]))
+    if fresh:
+        conn.executemany("INSERT OR REPLACE INTO file_idents VALUES (?, ?, ?, ?)", fresh)
+        conn.commit()
+    return files
+
+# -----------------------------
+# get_meta / set_meta：簡單的 key-value（例如播放清單指紋）
+# -----------------------------
+def get_meta(conn, key, default=None):
+    row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else default
+
+def set_meta(conn, key, value):
+    conn.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, value))
+    conn.commit()
+
+
+if __name__ == "__main__":
+    import sys
+    conn = open_library()
+    roots = [a for a in sys.argv[1:] if not a.startswith("--")]
+    refresh(conn, roots, full="--full" in sys.argv)
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MKV 標籤就地改寫：不產生 .tags.xml、不啟動 mkvpropedit，直接在檔案裡改寫 Segment 的 Tags element。
+依序嘗試：
+    1. 覆寫既有 Tags（連同緊接在後的 Void 空間），多出的空間補 Void
+    2. Tags 是 Segment 最後一個 element（mkvmerge 的預設配置）→ 改寫檔尾並更新 Segment 長度
+    3. 放進 Cluster 之前的 Void，舊 Tags 改成 Void，並更新 SeekHead 指向
+    4. 檔案沒有 Tags → 附加在 Segment 結尾，並在 SeekHead 新增一筆 Seek
+都不可行時回傳 False，由呼叫端改用 mkvpropedit 重寫。
+就地改動的 SeekHead 若有 CRC-32，會依改動後的內容重新計算；新寫入的 Tags 不帶 CRC-32。
+與 mkvpropedit --tags all: 相同，寫入後檔案只會有這一組 Tags。
+"""
+import os
+import mmap
+
+import ebml
+
+# -----------------------------
+# build_tags：Tags 的內容（一個 TargetTypeValue=50 的 Tag，內含多個 SimpleTag）
+# -----------------------------
+def build_tags(simple, target_type=50):
+    tag = ebml.element(ebml.TARGETS, ebml.element(ebml.TARGET_TYPE_VALUE, target_type))
+    for name, value in simple.items():
+        tag += ebml.element(ebml.SIMPLE_TAG,
+                            ebml.element(ebml.TAG_NAME, name) + ebml.element(ebml.TAG_STRING, value))
+    return ebml.element(ebml.TAG, tag)
+
+# -----------------------------
+# _top_level：Segment 內所有頂層 element（只讀 header，跳過 Cluster 內容）
+#    回傳 (清單, 是否完整)；遇到未知長度的 element 時無法確定後面的結構
+# -----------------------------
+def _top_level(buf, seg_data, seg_end):
+    children = []
+    for eid, elem, data, size in ebml.iter_children(buf, seg_data, seg_end):
+        if size == ebml.UNKNOWN_SIZE:
+            return children, False
+        children.append((eid, elem, data + size))
+    complete = not children or children[-1][2] == seg_end
+    return children, complete
+
+def _region(children, i):
+    """第 i 個 element 加上緊接在後的 Void，回傳 (起點, 終點, 是否為最後一個)。"""
+    start, end = children[i][1], children[i][2]
+    j = i + 1
+    while j < len(children) and children[j][0] == ebml.VOID:
+        end = children[j][2]
+        j += 1
+    return start, end, j == len(children)
+
+# -----------------------------
+# SeekHead / Segment 長度
+# -----------------------------
+def _tags_seek(buf, children):
+    """回傳 (SeekHead 在 children 的索引 or None, Tags 的 SeekPosition 欄位 (位置, 長度) or None)。"""
+    idx = next((i for i, c in enumerate(children) if c[0] == ebml.SEEK_HEAD), None)
+    if idx is None:
+        return None, None
+    _, hsize, hdata = ebml.read_header(buf, children[idx][1])
+    for eid, _, sdata, ssize in ebml.iter_children(buf, hdata, hdata + hsize):
+        if eid != ebml.SEEK:
+            continue
+        sid = pos_field = None
+        for cid, _, cdata, csize in ebml.iter_children(buf, sdata, sdata + ssize):
+            if cid == ebml.SEEK_ID:
+                sid = ebml.read_uint(buf, cdata, csize)
+            elif cid == ebml.SEEK_POSITION:
+                pos_field = (cdata, csize)
+        if sid == ebml.TAGS and pos_field:
+            return idx, pos_field
+    return idx, None
+
+def _new_seekhead(buf, children, idx, rel):
+    """原 SeekHead 加上一筆 Tags 的 Seek（SeekPosition 固定 8 位元組，長度不隨位置改變）。"""
+    _, hsize, hdata = ebml.read_header(buf, children[idx][1])
+    crc_pos, body_start = ebml.split_crc(buf, hdata, hsize)
+    seek = ebml.element(ebml.SEEK, ebml.element(ebml.SEEK_ID, ebml.encode_id(ebml.TAGS))
+                        + ebml.element(ebml.SEEK_POSITION, rel.to_bytes(8, "big")))
+    body = bytes(buf[body_start:hdata + hsize]) + seek
+    if crc_pos is not None:
+        body = ebml.element(ebml.CRC32, ebml.crc32(body)) + body
+    return ebml.element(ebml.SEEK_HEAD, body)
+
+def _crc_patches(buf, elem_start, patches):
+    """element 內容套用 patches 後，重新計算它的 CRC-32；沒有 CRC-32 時回傳 []。"""
+    _, size, data = ebml.read_header(buf, elem_start)
+    crc_pos, body_start = ebml.split_crc(buf, data, size)
+    if crc_pos is None:
+        return []
+    body = bytearray(buf[body_start:data + size])
+    for offset, new in patches:
+        body[offset - body_start:offset - body_start + len(new)] = new
+    return [(crc_pos, ebml.crc32(bytes(body)))]
+
+def _seekhead_patches(buf, children, seg_data, new_pos, required):
+    """讓 SeekHead 的 Tags 項目指向 new_pos；回傳 patch 清單，無法就地完成時回傳 None。"""
+    idx, pos_field = _tags_seek(buf, children)
+    if idx is None:
+        return None if required else []
+    rel = new_pos - seg_data
+    if pos_field:
+        cdata, csize = pos_field
+        if rel >= 1 << (8 * csize):
+            return None
+        patch = [(cdata, rel.to_bytes(csize, "big"))]
+        return patch + _crc_patches(buf, children[idx][1], patch)
+
+    # 沒有 Tags 的 Seek：在 SeekHead 後面的 Void 空間內重寫 SeekHead
+    start, end, _ = _region(children, idx)
+    data = _pad(_new_seekhead(buf, children, idx, rel), end - start)
+    return [(start, data)] if data else None
+
+def _pad(data, avail):
+    """data 後面補 Void 到剛好 avail 位元組；放不下（或只剩 1 位元組）回傳 None。"""
+    rest = avail - len(data)
+    if rest == 0:
+        return data
+    return data + ebml.void(rest) if rest >= 2 else None
+
+def _segment_size_patch(segment, new_end):
+    seg_data, _, size_pos, size_len = segment
+    try:
+        return [(size_pos, ebml.encode_size(new_end - seg_data, size_len))]
+    except ebml.EBMLError:
+        return None
+
+# -----------------------------
+# plan：計算要寫入的位置與內容；回傳 (patches, 新檔案長度 or None)，無法就地完成回傳 None
+# -----------------------------
+def plan(buf, file_size, payload):
+    segment = ebml.open_segment(buf, file_size)
+    if segment is None:
+        return None
+    seg_data, seg_end = segment[:2]
+    children, complete = _top_level(buf, seg_data, seg_end)
+    tags_idx = next((i for i, c in enumerate(children) if c[0] == ebml.TAGS), None)
+    at_file_end = complete and seg_end == file_size
+
+    if tags_idx is not None:
+        start, end, last = _region(children, tags_idx)
+        _, tsize, tdata = ebml.read_header(buf, start)
+        if bytes(buf[tdata:tdata + tsize]) == payload:
+            return [], None
+        # 1. 原位覆寫
+        data = ebml.fit(ebml.TAGS, payload, end - start)
+        if data:
+            return [(start, data)], None
+        # 2. 位於檔尾：改寫檔尾並更新 Segment 長度
+        if last and at_file_end:
+            data = ebml.element(ebml.TAGS, payload)
+            size_patch = _segment_size_patch(segment, start + len(data))
+            if size_patch is not None:
+                return [(start, data)] + size_patch, start + len(data)
+
+    # 3. Cluster 之前的 Void
+    head_idx, pos_field = _tags_seek(buf, children)
+    for i, (eid, _, _) in enumerate(children):
+        if eid == ebml.CLUSTER:
+            break
+        if eid != ebml.VOID or (i and children[i - 1][0] == ebml.VOID):
+            continue
+        start, end, _ = _region(children, i)
+        if head_idx == i - 1 and pos_field is None:
+            # Void 緊接在 SeekHead 後面：SeekHead 加上 Seek 後，Tags 接在它後面，兩者一起寫入
+            head_start = children[head_idx][1]
+            head_len = len(_new_seekhead(buf, children, head_idx, 0))
+            tags = ebml.fit(ebml.TAGS, payload, end - head_start - head_len)
+            if not tags:
+                continue
+            head = _new_seekhead(buf, children, head_idx, head_start + head_len - seg_data)
+            patches = [(head_start, head + tags)]
+        else:
+            data = ebml.fit(ebml.TAGS, payload, end - start)
+            if not data:
+                continue
+            seek = _seekhead_patches(buf, children, seg_data, start, required=False)
+            if seek is None:
+                continue
+            patches = [(start, data)] + seek
+        if tags_idx is not None:
+            old_start, old_end = children[tags_idx][1], children[tags_idx][2]
+            patches.append((old_start, ebml.void(old_end - old_start)))
+        return patches, None
+
+    # 4. 沒有 Tags：附加在 Segment 結尾
+    if tags_idx is None and at_file_end:
+        data = ebml.element(ebml.TAGS, payload)
+        seek = _seekhead_patches(buf, children, seg_data, seg_end, required=True)
+        size_patch = _segment_size_patch(segment, seg_end + len(data))
+        if seek is not None and size_patch is not None:
+            return [(seg_end, data)] + seek + size_patch, seg_end + len(data)
+    return None
+
+# -----------------------------
+# write_tags：就地寫入；成功回傳 True，需要重寫檔案時回傳 False
+#    simple：{"Artist": ..., "Comment": ...}
+# -----------------------------
+def write_tags(path, simple):
+    payload = build_tags(simple)
+    size = os.path.getsize(path)
+    if size == 0:
+        return False
+    with open(path, "r+b") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            try:
+                result = plan(buf, size, payload)
+            except (ebml.EBMLError, IndexError, ValueError):
+                result = None
+        # mmap 關閉後才寫入（Windows 上有對應的 mapping 時不能改變檔案長度）
+        if result is None:
+            return False
+        patches, new_end = result
+        for offset, data in sorted(patches):
+            f.seek(offset)
+            f.write(data)
+        if new_end is not None:
+            f.truncate(new_end)
+    return True
+
+# -----------------------------
+# read_tags：讀出所有 SimpleTag（{名稱: 值}），給檢查用
+# -----------------------------
+def read_tags(path):
+    size = os.path.getsize(path)
+    out = {}
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        segment = ebml.open_segment(buf, size)
+        if segment is None:
+            return out
+        pos = ebml.seek_positions(buf, *segment[:2]).get(ebml.TAGS)
+        if pos is None:
+            children, _ = _top_level(buf, *segment[:2])
+            pos = next((c[1] for c in children if c[0] == ebml.TAGS), None)
+        if pos is None:
+            return out
+        _, tsize, tdata = ebml.read_header(buf, pos)
+        for gid, _, gdata, gsize in ebml.iter_children(buf, tdata, tdata + tsize):
+            if gid != ebml.TAG:
+                continue
+            for sid, _, sdata, ssize in ebml.iter_children(buf, gdata, gdata + gsize):
+                if sid != ebml.SIMPLE_TAG:
+                    continue
+                fields = {cid: ebml.read_string(buf, cdata, csize)
+                          for cid, _, cdata, csize in ebml.iter_children(buf, sdata, sdata + ssize)}
+                out[fields.get(ebml.TAG_NAME, "")] = fields.get(ebml.TAG_STRING, "")
+    return out
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+詳細頁 HTML 封存：find_Mglinks 每抓一頁就以 gzip 存一份（每個識別碼保留最新一份），
+調整 4K 門檻、GB/MB 換算等解析規則後，可以直接用封存的 HTML 在本機多核心重新解析，
+不必再開瀏覽器重抓整個目錄。
+"""
+import os
+import gzip
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+# -----------------------------
+# 設定
+# -----------------------------
+ARCHIVE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "page_archive")
+
+def _path(site, identifier):
+    return os.path.join(ARCHIVE_DIR, site, f"{str(identifier).strip().upper()}.html.gz")
+
+# -----------------------------
+# store / load
+# -----------------------------
+def store(identifier, html, site="javbus"):
+    path = _path(site, identifier)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with gzip.open(path + ".tmp", "wt", encoding="utf-8", compresslevel=6) as f:
+        f.write(html)
+    os.replace(path + ".tmp", path)
+
+def load(identifier, site="javbus"):
+    path = _path(site, identifier)
+    if not os.path.exists(path):
+        return None
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return f.read()
+
+def identifiers(site="javbus"):
+    folder = os.path.join(ARCHIVE_DIR, site)
+    if not os.path.isdir(folder):
+        return []
+    return sorted(n[:-len(".html.gz")] for n in os.listdir(folder) if n.endswith(".html.gz"))
+
+# -----------------------------
+# reparse_all：以 process pool 重新解析所有封存頁
+#    parse_fn(identifier, html) 必須是模組層級函式（子行程要能 import）
+# -----------------------------
+def _reparse_one(parse_fn, site, identifier):
+    html = load(identifier, site)
+    return parse_fn(identifier, html) if html is not None else []
+
+def reparse_all(parse_fn, site="javbus", idents=None, workers=None):
+    idents = identifiers(site) if idents is None else [str(i).strip().upper() for i in idents]
+    rows = []
+    if not idents:
+        return rows
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, len(idents) // (workers * 4))
+    print(f"♻️ 從封存重新解析 {len(idents)} 頁（{workers} 個行程）")
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for out in pool.map(partial(_reparse_one, parse_fn, site), idents, chunksize=chunksize):
+            rows.extend(out)
+    return rows
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+單一行程的每日流程：checkList → mglinks → Rating → Status。
+原本 find_checkList.py 與 find_Mglinks.py 各自啟動瀏覽器、各自授權，而且 find_Mglinks 要先把
+checkList / mglinks_checkList 寫進 Sheets 再讀回來；這裡共用同一個 driver 與 gspread client，
+各階段之間直接以記憶體傳遞資料。mglinks 的抓取與 find_Mglinks 共用 crawl_mglinks
+（checkpoint 續跑、背景寫入 mglinks_checkList），checkList 只在最後當成輸出寫一次。
+"""
+import time
+
+import find_checkList
+import find_Mglinks
+import run_metrics
+
+# -----------------------------
+# 階段定義：名稱 → (依賴的階段, 執行函式)
+#    執行函式接收 ctx（共用資源）與 results（已完成階段的輸出）
+# -----------------------------
+def run_checklist(ctx, results):
+    return find_checkList.crawl_new_codes(ctx["driver"])
+
+def run_mglinks(ctx, results):
+    ss = ctx["client"].open_by_key(find_Mglinks.SPREADSHEET_ID)
+    _, rows = find_Mglinks.crawl_mglinks(ss, ctx["driver"], codes=[code for code, _ in results["checklist"]])
+    # Rating / Status 直接使用記憶體中的列，不再從 mglinks_checkList 讀回
+    return [dict(zip(find_Mglinks.MGLINKS_COLUMNS, row)) for row in rows], rows
+
+def run_rating(ctx, results):
+    records, _ = results["mglinks"]
+    find_Mglinks.update_rating_sheet(find_Mglinks.SPREADSHEET_ID, None, records=records)
+
+def run_status(ctx, results):
+    records, _ = results["mglinks"]
+    find_Mglinks.update_status_sheet(
+        find_Mglinks.SPREADSHEET_ID, find_Mglinks.MGLINKS_TAB,
+        find_Mglinks.MGLINKS_COLUMNS, None, records=records
+    )
+
+STAGES = {
+    "checklist": ((), run_checklist),
+    "mglinks":   (("checklist",), run_mglinks),
+    "rating":    (("mglinks",), run_rating),
+    "status":    (("mglinks", "rating"), run_status),
+}
+
+# -----------------------------
+# topological_order：依依賴關係排出執行順序（有環時丟出 ValueError）
+# -----------------------------
+def topological_order(stages):
+    order = []
+    state = {}
+
+    def visit(name):
+        if state.get(name) == "done":
+            return
+        if state.get(name) == "visiting":
+            raise ValueError(f"階段依賴有環：{name}")
+        state[name] = "visiting"
+        for dep in stages[name][0]:
+            visit(dep)
+        state[name] = "done"
+        order.append(name)
+
+    for name in stages:
+        visit(name)
+    return order
+
+# -----------------------------
+# 輸出：checkList 寫一次（mglinks_checkList 在抓取時已寫入）
+# -----------------------------
+def write_sinks(ctx, results):
+    sheet_id = find_Mglinks.SPREADSHEET_ID
+    with run_metrics.stage("sink", tab=find_Mglinks.CHECKLIST_TAB):
+        find_checkList.upload_to_google_sheet(
+            results["checklist"], sheet_id, find_Mglinks.CHECKLIST_TAB, client=ctx["client"]
+        )
+
+# -----------------------------
+# 主流程
+# -----------------------------
+def run(stages=STAGES):
+    start_time = time.time()
+    ctx = {"client": find_Mglinks.get_client()}
+    ctx["driver"] = find_checkList.create_driver()
+    results = {}
+    try:
+        for name in topological_order(stages):
+            print(f"\n▶️ 階段：{name}")
+            with run_metrics.stage("pipeline", step=name):
+                results[name] = stages[name][1](ctx, results)
+    finally:
+        ctx["driver"].quit()
+
+    write_sinks(ctx, results)
+    print(f"⏱️ 總耗時：{round(time.time() - start_time, 2)} 秒")
+    return results
+
+
+if __name__ == "__main__":
+    run_metrics.start_run("pipeline")
+    run()
+    print("✅ 全部更新完成")
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+選用的效能剖析：設定 CHASING_PROFILE 後，run_metrics.stage 包住的每個階段（fetch / parse / status_update /
+identify / playlist …）都會被剖析，腳本本身不用改。結束時寫到 profiles/<腳本>_<時間>/：
+
+    - <階段>.collapsed：取樣得到的呼叫堆疊（flamegraph.pl、speedscope 可直接開）
+    - <階段>.pstats：cProfile 統計（python -m pstats 或 snakeviz 檢視）
+    - summary.txt：各階段的取樣數，以及 self / 累計時間最高的前 TOP_N 個函式
+
+    CHASING_PROFILE=1        取樣 + cProfile
+    CHASING_PROFILE=sample   只取樣（額外負擔較小，適合正式規模的資料）
+    CHASING_PROFILE_INTERVAL 取樣間隔秒數（預設 0.005）
+
+取樣器每隔一段時間讀取所有執行緒的堆疊，依該執行緒目前最內層的階段歸類，不在任何階段內的歸到 (unstaged)。
+cProfile 同一時間只能有一個在執行：巢狀或其他執行緒同時進行的階段併入外層那個階段的 pstats。
+"""
+import io
+import os
+import re
+import sys
+import atexit
+import pstats
+import cProfile
+import threading
+from datetime import datetime
+
+# -----------------------------
+# 設定
+# -----------------------------
+PROFILE_MODE     = os.environ.get("CHASING_PROFILE", "").strip().lower()
+PROFILE_DIR      = os.environ.get("CHASING_PROFILE_DIR") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "profiles")
+SAMPLE_INTERVAL  = float(os.environ.get("CHASING_PROFILE_INTERVAL", "0.005"))
+TOP_N            = 30
+UNSTAGED         = "(unstaged)"
+
+ENABLED  = PROFILE_MODE not in ("", "0")
+CPROFILE = ENABLED and PROFILE_MODE != "sample"
+
+_lock     = threading.Lock()
+_stages   = {}      # thread id → [階段標籤, ...]
+_samples  = {}      # 階段標籤 → {collapsed 堆疊: 次數}
+_pstats   = {}      # 階段標籤 → pstats.Stats
+_active   = {"profile": None}
+_run      = {"script": None, "sampler": None, "stop": threading.Event(), "written": False}
+
+def label(name, labels):
+    if not labels:
+        return name
+    return f"{name}[{','.join(f'{k}={v}' for k, v in sorted(labels.items()))}]"
+
+# -----------------------------
+# enter / leave：由 run_metrics.stage 呼叫
+# -----------------------------
+def enter(name, labels):
+    tag = label(name, labels)
+    tid = threading.get_ident()
+    with _lock:
+        _stages.setdefault(tid, []).append(tag)
+        prof = None
+        if CPROFILE and _active["profile"] is None:
+            prof = _active["profile"] = cProfile.Profile()
+    if prof is not None:
+        try:
+            prof.enable()
+        except ValueError:
+            # 其他剖析工具（除錯器、coverage）已在執行
+            with _lock:
+                _active["profile"] = None
+            prof = None
+    return tid, tag, prof
+
+def leave(token):
+    tid, tag, prof = token
+    if prof is not None:
+        prof.disable()
+        stats = pstats.Stats(prof)
+        with _lock:
+            _active["profile"] = None
+            if tag in _pstats:
+                _pstats[tag].add(stats)
+            else:
+                _pstats[tag] = stats
+    with _lock:
+        stack = _stages.get(tid)
+        if stack:
+            stack.pop()
+            if not stack:
+                del _stages[tid]
+
+# -----------------------------
+# 取樣器：背景執行緒，每 SAMPLE_INTERVAL 秒記錄一次所有執行緒的堆疊
+# -----------------------------
+def _frame_name(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+def _collapse(frame):
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame.f_code))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+def _sample_loop(stop):
+    me = threading.get_ident()
+    while not stop.wait(SAMPLE_INTERVAL):
+        frames = sys._current_frames()
+        with _lock:
+            current = {tid: stack[-1] for tid, stack in _stages.items() if stack}
+        for tid, frame in frames.items():
+            if tid == me:
+                continue
+            stack = _collapse(frame)
+            tag = current.get(tid, UNSTAGED)
+            with _lock:
+                counts = _samples.setdefault(tag, {})
+                counts[stack] = counts.get(stack, 0) + 1
+        del frames
+
+# -----------------------------
+# start：由 run_metrics.start_run 呼叫
+# -----------------------------
+def start(script):
+    if not ENABLED or _run["sampler"] is not None:
+        return
+    _run["script"] = script
+    _run["started"] = datetime.now()
+    t = threading.Thread(target=_sample_loop, args=(_run["stop"],), name="profiling-sampler", daemon=True)
+    _run["sampler"] = t
+    t.start()
+    atexit.register(write_profiles)
+    print(f"🔬 效能剖析已開啟（{'取樣' if not CPROFILE else '取樣 + cProfile'}，間隔 {SAMPLE_INTERVAL * 1000:g}ms）")
+
+# -----------------------------
+# 報表輸出
+# -----------------------------
+def _safe_name(tag):
+    return re.sub(r"[^\w.=-]+", "_", tag).strip("_") or "stage"
+
+def _top_functions(counts, n=TOP_N):
+    """從取樣堆疊統計 self（堆疊最末端）與累計（出現在堆疊中）的次數。"""
+    self_counts, total_counts = {}, {}
+    for stack, c in counts.items():
+        frames = stack.split(";")
+        self_counts[frames[-1]] = self_counts.get(frames[-1], 0) + c
+        for f in set(frames):
+            total_counts[f] = total_counts.get(f, 0) + c
+    top = lambda d: sorted(d.items(), key=lambda kv: kv[1], reverse=True)[:n]
+    return top(self_counts), top(total_counts)
+
+def _summary_text(samples, stats):
+    out = io.StringIO()
+    total = sum(sum(c.values()) for c in samples.values()) or 1
+    out.write(f"{_run['script']}  取樣間隔 {SAMPLE_INTERVAL * 1000:g}ms\n\n")
+    out.write(f"{'階段':<40}{'取樣':>10}{'比例':>8}\n")
+    ordered = sorted(samples.items(), key=lambda kv: sum(kv[1].values()), reverse=True)
+    for tag, counts in ordered:
+        n = sum(counts.values())
+        out.write(f"{tag:<40}{n:>10}{n / total:>8.1%}\n")
+    for tag, counts in ordered:
+        n = sum(counts.values())
+        top_self, top_total = _top_functions(counts)
+        out.write(f"\n===== {tag}（{n} 次取樣，約 {n * SAMPLE_INTERVAL:.1f}s）=====\n")
+        out.write("  self：\n")
+        for name, c in top_self:
+            out.write(f"    {c / n:>7.1%}  {name}\n")
+        out.write("  累計：\n")
+        for name, c in top_total:
+            out.write(f"    {c / n:>7.1%}  {name}\n")
+    for tag, st in sorted(stats.items()):
+        out.write(f"\n===== cProfile：{tag} =====\n")
+        st.stream = out
+        st.sort_stats("cumulative").print_stats(TOP_N)
+    return out.getvalue()
+
+def write_profiles():
+    if _run["written"] or _run["sampler"] is None:
+        return
+    _run["written"] = True
+    _run["stop"].set()
+    _run["sampler"].join(timeout=1)
+    with _lock:
+        samples = {tag: dict(c) for tag, c in _samples.items()}
+        stats = dict(_pstats)
+
+    run_dir = os.path.join(PROFILE_DIR, f"{_run['script']}_{_run['started']:%Y%m%d_%H%M%S}")
+    os.makedirs(run_dir, exist_ok=True)
+    for tag, counts in samples.items():
+        with open(os.path.join(run_dir, f"{_safe_name(tag)}.collapsed"), "w", encoding="utf-8") as f:
+            for stack, c in sorted(counts.items()):
+                f.write(f"{stack} {c}\n")
+    for tag, st in stats.items():
+        st.dump_stats(os.path.join(run_dir, f"{_safe_name(tag)}.pstats"))
+    with open(os.path.join(run_dir, "summary.txt"), "w", encoding="utf-8") as f:
+        f.write(_summary_text(samples, stats))
+    print(f"🔬 效能剖析：{len(samples)} 個階段 → {run_dir}")
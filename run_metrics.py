@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+執行指標：各腳本共用的計數器與延遲直方圖（fetch / parse / sheet_read / sheet_write / file_move …），
+結束時寫出 Prometheus textfile（給 node_exporter 的 textfile collector）與一份 JSON 執行摘要。
+設定 CHASING_PROFILE 時，每個 stage 也交給 profiling 剖析（見 profiling.py）。
+"""
+import os
+import sys
+import json
+import time
+import atexit
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+import profiling
+
+# -----------------------------
+# 設定
+# -----------------------------
+METRICS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "metrics")
+PREFIX      = "chasing"
+BUCKETS     = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# CHASING_IMPORT_REPORT=1：列出啟動時與整個執行期間載入了哪些套件（以本模組載入時為基準）
+IMPORT_REPORT = os.environ.get("CHASING_IMPORT_REPORT", "").strip() not in ("", "0")
+
+_lock     = threading.Lock()
+_counters = {}
+_hists    = {}
+_run      = {"script": None, "started": None, "written": False}
+_baseline_modules = set(sys.modules)
+_loaded_at        = time.perf_counter()
+
+def _key(name, labels):
+    return (name, tuple(sorted(labels.items())))
+
+# -----------------------------
+# start_run：設定腳本名稱，並在結束時（含例外結束）自動寫出報表
+# -----------------------------
+def start_run(script):
+    _run["script"] = script
+    _run["started"] = time.time()
+    _run["written"] = False
+    atexit.register(write_reports)
+    profiling.start(script)
+    if IMPORT_REPORT:
+        _run["startup_seconds"] = round(time.perf_counter() - _loaded_at, 3)
+        _run["imports_at_start"] = imported_packages()
+        print(f"📦 啟動 {_run['startup_seconds']}s，已載入：{', '.join(_run['imports_at_start']) or '（無）'}")
+
+# -----------------------------
+# inc / observe / stage
+# -----------------------------
+def inc(name, value=1, **labels):
+    with _lock:
+        k = _key(name, labels)
+        _counters[k] = _counters.get(k, 0) + value
+
+def observe(name, seconds, **labels):
+    with _lock:
+        k = _key(name, labels)
+        h = _hists.get(k)
+        if h is None:
+            h = _hists[k] = {"buckets": [0] * len(BUCKETS), "sum": 0.0, "count": 0, "max": 0.0}
+        for i, b in enumerate(BUCKETS):
+            if seconds <= b:
+                h["buckets"][i] += 1
+        h["sum"] += seconds
+        h["count"] += 1
+        h["max"] = max(h["max"], seconds)
+
+@contextmanager
+def stage(name, **labels):
+    token = profiling.enter(name, labels) if profiling.ENABLED else None
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe("stage_seconds", time.perf_counter() - t0, stage=name, **labels)
+        if token is not None:
+            profiling.leave(token)
+
+# -----------------------------
+# imported_packages：本模組載入後新增的頂層套件
+# -----------------------------
+def imported_packages():
+    new = {name.split(".")[0] for name in set(sys.modules) - _baseline_modules}
+    return sorted(n for n in new if not n.startswith("_"))
+
+def counter_value(name, **labels):
+    with _lock:
+        return _counters.get(_key(name, labels), 0)
+
+# -----------------------------
+# 報表輸出
+# -----------------------------
+def _fmt_labels(labels, extra=None):
+    items = list(labels) + (list(extra.items()) if extra else [])
+    if not items:
+        return ""
+    body = ",".join(f'{k}="{str(v).replace(chr(34), chr(39))}"' for k, v in items)
+    return "{" + body + "}"
+
+def _prometheus_text(script, duration, pages):
+    lines = []
+    base = (("script", script),)
+    seen = set()
+    for (name, labels), value in sorted(_counters.items()):
+        metric = f"{PREFIX}_{name}"
+        if metric not in seen:
+            lines.append(f"# TYPE {metric} counter")
+            seen.add(metric)
+        lines.append(f"{metric}{_fmt_labels(base + labels)} {value}")
+    for (name, labels), h in sorted(_hists.items()):
+        metric = f"{PREFIX}_{name}"
+        if metric not in seen:
+            lines.append(f"# TYPE {metric} histogram")
+            seen.add(metric)
+        for b, c in zip(BUCKETS, h["buckets"]):
+            lines.append(f"{metric}_bucket{_fmt_labels(base + labels, {'le': b})} {c}")
+        lines.append(f"{metric}_bucket{_fmt_labels(base + labels, {'le': '+Inf'})} {h['count']}")
+        lines.append(f"{metric}_sum{_fmt_labels(base + labels)} {h['sum']:.6f}")
+        lines.append(f"{metric}_count{_fmt_labels(base + labels)} {h['count']}")
+    lines.append(f"# TYPE {PREFIX}_run_duration_seconds gauge")
+    lines.append(f"{PREFIX}_run_duration_seconds{_fmt_labels(base)} {duration:.3f}")
+    lines.append(f"# TYPE {PREFIX}_pages_per_second gauge")
+    lines.append(f"{PREFIX}_pages_per_second{_fmt_labels(base)} {pages / duration if duration else 0:.4f}")
+    lines.append(f"# TYPE {PREFIX}_last_run_timestamp_seconds gauge")
+    lines.append(f"{PREFIX}_last_run_timestamp_seconds{_fmt_labels(base)} {time.time():.0f}")
+    return "\n".join(lines) + "\n"
+
+def summary():
+    script = _run["script"] or os.path.splitext(os.path.basename(sys.argv[0]))[0] or "python"
+    duration = time.time() - (_run["started"] or time.time())
+    with _lock:
+        pages = sum(v for (n, _), v in _counters.items() if n == "pages_fetched_total")
+        data = {
+            "script": script,
+            "finished_at": datetime.now().isoformat(timespec="seconds"),
+            "duration_seconds": round(duration, 3),
+            "pages_per_second": round(pages / duration, 4) if duration else 0,
+            "counters": [
+                {"name": n, "labels": dict(l), "value": v} for (n, l), v in sorted(_counters.items())
+            ],
+            "stages": [
+                {"name": n, "labels": dict(l), "count": h["count"], "sum": round(h["sum"], 4),
+                 "avg": round(h["sum"] / h["count"], 4) if h["count"] else 0, "max": round(h["max"], 4)}
+                for (n, l), h in sorted(_hists.items())
+            ],
+        }
+        prom = _prometheus_text(script, duration, pages)
+    if IMPORT_REPORT:
+        data["imports"] = {
+            "startup_seconds": _run.get("startup_seconds"),
+            "at_start": _run.get("imports_at_start", []),
+            "at_end": imported_packages(),
+        }
+    return data, prom
+
+def write_reports():
+    if _run["written"] or _run["script"] is None:
+        return
+    _run["written"] = True
+    data, prom = summary()
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    script = data["script"]
+
+    prom_path = os.path.join(METRICS_DIR, f"{script}.prom")
+    with open(prom_path + ".tmp", "w", encoding="utf-8") as f:
+        f.write(prom)
+    os.replace(prom_path + ".tmp", prom_path)
+
+    json_path = os.path.join(METRICS_DIR, f"{script}_{datetime.now():%Y%m%d_%H%M%S}.json")
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+    calls = sum(c["value"] for c in data["counters"] if c["name"] == "sheets_api_calls_total")
+    if IMPORT_REPORT:
+        print(f"📦 執行結束時已載入：{', '.join(data['imports']['at_end']) or '（無）'}")
+    print(f"📊 執行指標：{data['duration_seconds']}s，Sheets API {calls} 次 → {json_path}")
@@ -3,13 +3,10 @@
 
 import os
 import re
-import time
 from contextlib import contextmanager
 from datetime import datetime
 
 import gspread
-from gspread.exceptions import APIError
-from oauth2client.service_account import ServiceAccountCredentials
 from selenium import webdriver
 from selenium.webdriver.edge.service import Service
 from selenium.webdriver.edge.options import Options
@@ -18,6 +15,12 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from bs4 import BeautifulSoup
 
+import cassette
+import google_client
+import host_pacer
+import magnet_index
+import run_metrics
+
 # -----------------------------
 # 配置：請修改為你自己的路徑與參數
 # -----------------------------
@@ -25,6 +28,7 @@ CREDENTIAL_PATH  = r"C:\Users\chen8\OneDrive\文件\pythonHouse\utCooking\creden
 EDGE_DRIVER_PATH = r"C:\Users\chen8\OneDrive\文件\pythonHouse\edgedriver_win64\msedgedriver.exe"
 SPREADSHEET_ID   = "1cizSVrySFHKYfngBhkCCNVRXRJiMYH_2ltts9YAdbEo"
 TAB_NAME         = "checkList_t66y"
+T66Y_BASE_URL    = os.environ.get("CHASING_T66Y_URL", "https://t66y.com").rstrip("/")
 
 # 篩選上傳時間早於此日期會停止；留空不篩選
 target_date_str = "2025-09-01"
@@ -54,8 +58,7 @@ def suppress_logs():
 def upload_to_google_sheet(data, sheet_id, tab_name):
     scope = ["https://spreadsheets.google.com/feeds",
              "https://www.googleapis.com/auth/drive"]
-    creds  = ServiceAccountCredentials.from_json_keyfile_name(CREDENTIAL_PATH, scope)
-    client = gspread.authorize(creds)
+    client = google_client.authorize(CREDENTIAL_PATH, scope)
     ss     = client.open_by_key(sheet_id)
 
     header = [
@@ -70,13 +73,28 @@ def upload_to_google_sheet(data, sheet_id, tab_name):
         ws = ss.add_worksheet(title=tab_name, rows="1", cols=str(len(header)))
         ws.append_row(header, value_input_option="USER_ENTERED")
 
-    existing_codes = ws.col_values(1)[1:]
-    existing_count = len(existing_codes)
+    # 一次讀回既有的識別碼與磁力連結，以此重建磁力索引中 checkList_t66y 的部分（已刪除的列不再擋住重新列入）
+    col_codes, col_magnets = ws.batch_get(["A2:A", "G2:G"])
+    existing_codes = {r[0] for r in col_codes if r}
+    existing_count = len(col_codes)
+    index = magnet_index.open_index()
+    magnet_index.register(index, magnet_index.SOURCE_T66Y, [
+        (c[0], m[0]) for c, m in zip(col_codes, col_magnets) if c and m
+    ], complete=True)
+    lookup = magnet_index.load_lookup(index)
 
     new_rows = []
+    dup_hash = 0
     for code, title, size, upload_time, url, magnet in data:
         if code in existing_codes:
             continue
+        # 同一個 info-hash 已在 Status 排入下載，或已在 checkList_t66y → 不重複列入
+        reason = magnet_index.already_queued(lookup, magnet)
+        if reason:
+            dup_hash += 1
+            print(f"  ⏭️ {code}: 相同 info-hash {reason}")
+            continue
+        existing_codes.add(code)
         # 提取 size 數值
         m = re.search(r"(\d+(?:\.\d+)?)", size)
         size_val = m.group(1) if m else ""
@@ -99,45 +117,39 @@ def upload_to_google_sheet(data, sheet_id, tab_name):
 
     if new_rows:
         ws.append_rows(new_rows, value_input_option="USER_ENTERED")
-    print(f"✅ 已新增 {len(new_rows)} 筆，跳過 {len(data)-len(new_rows)} 筆重複資料。")
+        magnet_index.register(index, magnet_index.SOURCE_T66Y, [(r[0], r[6]) for r in new_rows])
+    print(f"✅ 已新增 {len(new_rows)} 筆，跳過 {len(data)-len(new_rows)} 筆重複資料"
+          f"（其中 {dup_hash} 筆為相同 info-hash）。")
 
 # -----------------------------
-# 主流程：抓列表、解析 hash、組合 magnet、上傳
+# create_driver：Selenium headless Edge
 # -----------------------------
-assert os.path.isfile(EDGE_DRIVER_PATH), f"找不到 driver：{EDGE_DRIVER_PATH}"
-
-options = Options()
-options.add_argument("--headless")
-options.add_argument("--disable-gpu")
-options.add_argument("--no-sandbox")
-options.add_experimental_option("excludeSwitches", ["enable-logging"])
-
-with suppress_logs():
-    service = Service(executable_path=EDGE_DRIVER_PATH, log_path=os.devnull)
-    driver = webdriver.Edge(service=service, options=options)
+def create_driver():
+    assert cassette.browserless() or os.path.isfile(EDGE_DRIVER_PATH), f"找不到 driver：{EDGE_DRIVER_PATH}"
 
-wait    = WebDriverWait(driver, 10)
-results = []
-page    = 1
-stop    = False
+    options = Options()
+    options.add_argument("--headless")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--no-sandbox")
+    options.add_experimental_option("excludeSwitches", ["enable-logging"])
 
-print("🔍 開始抓取含「4K」的文章…")
-while len(results) < search_qty and not stop:
-    list_url = f"https://t66y.com/thread0806.php?fid=15&search=&page={page}"
-    print(f"  第 {page} 頁：{list_url}")
-    driver.get(list_url)
-    try:
-        wait.until(EC.presence_of_element_located((By.ID, "ajaxtable")))
-    except:
-        break
+    with suppress_logs():
+        service = Service(executable_path=EDGE_DRIVER_PATH, log_path=os.devnull)
+        return cassette.driver(lambda: webdriver.Edge(service=service, options=options))
 
-    soup = BeautifulSoup(driver.page_source, "html.parser")
+# -----------------------------
+# parse_listing：列表頁 → 含「4K」的文章 [{code, title, size, upload_time, url}, ...]
+#    回傳 (文章, 是否該停止：沒有任何文章列，或已遇到早於 target_date 的文章)
+# -----------------------------
+def parse_listing(html, limit=None):
+    soup = BeautifulSoup(html, "html.parser")
     rows = soup.select("tbody#tbody tr.tr3")
     if not rows:
-        break
+        return [], True
 
+    items = []
     for row in rows:
-        if len(results) >= search_qty or stop:
+        if limit is not None and len(items) >= limit:
             break
 
         a = row.select_one("h3 a")
@@ -163,35 +175,79 @@ while len(results) < search_qty and not stop:
         fmt = "%Y-%m-%d %H:%M:%S" if time_str.count(":") == 2 else "%Y-%m-%d %H:%M"
         dt = datetime.strptime(time_str, fmt).date()
         if target_date and dt < target_date:
-            stop = True
-            break
-        upload_time = time_str
+            return items, True
 
         # 3. URL
-        href = a["href"]
-        url  = f"https://t66y.com{href}"
+        items.append({"code": code, "title": title, "size": size,
+                      "upload_time": time_str, "url": f"{T66Y_BASE_URL}{a['href']}"})
+    return items, False
+
+# -----------------------------
+# crawl_listing：依序抓列表頁，直到 search_qty 筆或早於 target_date
+# -----------------------------
+def crawl_listing(driver, limit=search_qty):
+    items = []
+    page  = 1
+    stop  = False
+
+    print("🔍 開始抓取含「4K」的文章…")
+    while len(items) < limit and not stop:
+        list_url = f"{T66Y_BASE_URL}/thread0806.php?fid=15&search=&page={page}"
+        print(f"  第 {page} 頁：{list_url}")
+        with run_metrics.stage("fetch", site="t66y"), host_pacer.slot(list_url) as slot:
+            driver.get(list_url)
+            try:
+                WebDriverWait(driver, slot.timeout).until(EC.presence_of_element_located((By.ID, "ajaxtable")))
+            except:
+                slot.observe(driver.page_source, timed_out=True)
+                break
+            slot.observe(driver.page_source)
+        run_metrics.inc("pages_fetched_total", site="t66y", page="listing")
+
+        with run_metrics.stage("parse", site="t66y"):
+            page_items, stop = parse_listing(driver.page_source, limit - len(items))
+        items.extend(page_items)
+        page += 1
+    return items
 
-        # 4. 解析 rmdown hash
+# -----------------------------
+# fetch_thread：抓文章頁、解析 rmdown hash、組合 magnet → 上傳用的一列
+# -----------------------------
+def fetch_thread(driver, item):
+    url = item["url"]
+    with run_metrics.stage("fetch", site="t66y"), host_pacer.slot(url) as slot:
         driver.get(url)
+        slot.observe(driver.page_source)
+    run_metrics.inc("pages_fetched_total", site="t66y", page="thread")
+    with run_metrics.stage("parse", site="t66y"):
         vid_soup = BeautifulSoup(driver.page_source, "html.parser")
-        link     = vid_soup.find("a", href=re.compile(r"rmdown\.com/link\.php\?hash="))
-        m_hash   = re.search(r"hash=([0-9a-fA-F]+)", link["href"]) if link else None
-        hash_val = m_hash.group(1) if m_hash else ""
-
-        # 5. 組 magnet
-        if hash_val and code:
-            actual_hash = hash_val[3:] if len(hash_val) > 36 else hash_val
-            magnet = f"magnet:?xt=urn:btih:{actual_hash}&dn={code}".split("&tr")[0]
-        else:
-            magnet = ""
+    link     = vid_soup.find("a", href=re.compile(r"rmdown\.com/link\.php\?hash="))
+    m_hash   = re.search(r"hash=([0-9a-fA-F]+)", link["href"]) if link else None
+    hash_val = m_hash.group(1) if m_hash else ""
 
-        results.append([code, title, size, upload_time, url, magnet])
-        print(f"  + {code} | 上傳時間: {upload_time} | 磁力: {magnet}")
+    # 組 magnet
+    code = item["code"]
+    btih = magnet_index.rmdown_to_btih(hash_val) if hash_val else ""
+    if btih and code:
+        magnet = f"magnet:?xt=urn:btih:{btih}&dn={code}"
+    else:
+        magnet = ""
+
+    print(f"  + {code} | 上傳時間: {item['upload_time']} | 磁力: {magnet}")
+    return [code, item["title"], item["size"], item["upload_time"], url, magnet]
+
+# -----------------------------
+# 主流程：抓列表、解析 hash、組合 magnet、上傳
+#    多台機器分散抓文章頁時改用 work_queue.py（enqueue t66y / worker t66y / merge t66y）
+# -----------------------------
+if __name__ == "__main__":
+    run_metrics.start_run("scrape_t66y")
+    driver = create_driver()
 
-    page += 1
+    results = [fetch_thread(driver, item) for item in crawl_listing(driver)]
 
-driver.quit()
+    driver.quit()
 
-print(f"🎯 共擷取 {len(results)} 筆資料，開始上傳…")
-upload_to_google_sheet(results, SPREADSHEET_ID, TAB_NAME)
-print("✅ 完成")
+    print(f"🎯 共擷取 {len(results)} 筆資料，開始上傳…")
+    upload_to_google_sheet(results, SPREADSHEET_ID, TAB_NAME)
+    print("✅ 完成")
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+工作表快照：依 (spreadsheet, tab) 把 get_all_values 的結果存在本機。
+每個試算表每次執行只查一次 Drive metadata 的 modifiedTime（之後有寫入才重新查詢），
+並比對開啟試算表時已取得的 gridProperties；都沒變就直接回傳本機快照，不再下載整個分頁。
+"""
+import os
+import json
+import re
+
+# -----------------------------
+# 設定
+# -----------------------------
+SNAPSHOT_DIR   = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sheet_snapshots")
+DRIVE_FILE_URL = "https://www.googleapis.com/drive/v3/files/{}"
+
+_mtimes = {}   # 這次執行已查過的 modifiedTime：{spreadsheet id: modifiedTime}
+
+def _snapshot_path(spreadsheet_id, tab_name):
+    safe_tab = re.sub(r'[\\/:*?"<>|]', "_", tab_name)
+    return os.path.join(SNAPSHOT_DIR, f"{spreadsheet_id}__{safe_tab}.json")
+
+# -----------------------------
+# modified_time：Drive 檔案的最後修改時間；同一次執行沿用第一次查到的值
+#    google_client 在送出任何寫入後呼叫 invalidate，自己剛寫入的變更仍會被看到
+# -----------------------------
+def modified_time(spreadsheet):
+    if spreadsheet.id not in _mtimes:
+        resp = spreadsheet.client.request(
+            "get", DRIVE_FILE_URL.format(spreadsheet.id),
+            params={"fields": "modifiedTime", "supportsAllDrives": True},
+        )
+        _mtimes[spreadsheet.id] = resp.json()["modifiedTime"]
+    return _mtimes[spreadsheet.id]
+
+def invalidate():
+    _mtimes.clear()
+
+def _load(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _save(path, snap):
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(snap, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+# -----------------------------
+# get_all_values：有快照且試算表沒變動時直接回傳快照
+#    mtime：呼叫端已查到的 modifiedTime（None 時用 modified_time）
+# -----------------------------
+def get_all_values(ws, use_cache=True, mtime=None):
+    ss = ws.spreadsheet
+    path = _snapshot_path(ss.id, ws.title)
+    mtime = mtime or modified_time(ss)
+    grid = [ws.row_count, ws.col_count]
+
+    if use_cache:
+        snap = _load(path)
+        if snap and snap.get("modifiedTime") == mtime and snap.get("grid") == grid:
+            print(f"⚡ {ws.title}: 試算表未變動，使用本機快照（{len(snap['values'])} 列）")
+            return snap["values"]
+
+    values = ws.get_all_values()
+    _save(path, {"modifiedTime": mtime, "grid": grid, "values": values})
+    return values
+
+# -----------------------------
+# get_all_records：與 gspread 的 get_all_records 相同格式（第一列為標頭、數字轉成數值）
+# -----------------------------
+def get_all_records(ws, use_cache=True):
+    from gspread.utils import numericise_all
+
+    values = get_all_values(ws, use_cache=use_cache)
+    if not values:
+        return []
+    keys = values[0]
+    return [
+        dict(zip(keys, numericise_all(row, empty2zero=False, default_blank="")))
+        for row in values[1:]
+    ]
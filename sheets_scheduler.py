@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Sheets API 配額排程：讀、寫各一個 token bucket（預設每分鐘 60 次，對應 Sheets API 每位使用者的配額），
+在送出請求前先排隊等 token，而不是打到 429 之後才盲目指數退避。
+收到 429 時依 Retry-After（沒有時以倍增的等待）暫停該類請求後重試。
+
+queue_append：同一個工作表、相同 value_input_option 的 append_rows 先排隊，
+寫入 token 可用時才合併成一次 append_rows 送出；token 不足時後續的列會併進同一次請求。
+
+WriteBehind：背景執行緒負責 append，爬取迴圈只把列放進有上限的佇列就繼續抓下一頁；
+依計時器或累積的 payload 大小送出，單次請求依位元組數與列數切分，寫入錯誤在下一次 put / close 時拋回呼叫端。
+
+google_client.install_hooks 與 sheets_service 會自動經過這裡；cassette 重播時不限速。
+"""
+import os
+import json
+import time
+import queue
+import atexit
+import threading
+
+import cassette
+import run_metrics
+
+# -----------------------------
+# 設定（可用環境變數覆寫每分鐘配額）
+# -----------------------------
+READ_PER_MINUTE   = int(os.environ.get("CHASING_SHEETS_READ_QPM", "60"))
+WRITE_PER_MINUTE  = int(os.environ.get("CHASING_SHEETS_WRITE_QPM", "60"))
+MAX_429_RETRIES   = 6
+DEFAULT_BACKOFF   = 5.0     # 429 沒有 Retry-After 時的第一次等待秒數
+MAX_ROWS_PER_CALL = 5000    # 合併 append 時單次請求最多幾列
+MAX_BYTES_PER_CALL = 2 * 1024 * 1024   # 單次 append 的 payload 上限（Sheets 建議 2 MB 以內）
+WRITE_BEHIND_SECONDS = 10.0  # WriteBehind：最早的一列等待超過這個秒數就送出
+WRITE_BEHIND_BYTES   = 256 * 1024      # WriteBehind：累積超過這個位元組數就送出
+WRITE_BEHIND_QUEUE   = 200   # WriteBehind：佇列最多幾批，滿了 put 才會等（背壓）
+
+# -----------------------------
+# TokenBucket
+# -----------------------------
+class TokenBucket:
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.cond = threading.Condition()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def available(self):
+        with self.cond:
+            now = time.monotonic()
+            self._refill(now)
+            return now >= self.blocked_until and self.tokens >= 1
+
+    def acquire(self):
+        """等到有 token 為止，回傳等待秒數。"""
+        t0 = time.monotonic()
+        with self.cond:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self.blocked_until:
+                    self.cond.wait(self.blocked_until - now)
+                elif self.tokens >= 1:
+                    self.tokens -= 1
+                    return time.monotonic() - t0
+                else:
+                    self.cond.wait((1 - self.tokens) / self.rate)
+
+    def block(self, seconds):
+        """收到 429：清空 token，seconds 秒內不再送出。"""
+        with self.cond:
+            self.tokens = 0.0
+            self.updated = time.monotonic()
+            self.blocked_until = max(self.blocked_until, self.updated + seconds)
+            self.cond.notify_all()
+
+_buckets = {"read": TokenBucket(READ_PER_MINUTE), "write": TokenBucket(WRITE_PER_MINUTE)}
+
+def bucket(kind):
+    return _buckets[kind]
+
+def _enabled():
+    return not cassette.replaying()
+
+# -----------------------------
+# _retry_after：從回應標頭取得等待秒數
+# -----------------------------
+def _retry_after(headers, attempt):
+    value = (headers or {}).get("Retry-After") or (headers or {}).get("retry-after")
+    try:
+        return max(1.0, float(value))
+    except (TypeError, ValueError):
+        return DEFAULT_BACKOFF * (2 ** attempt)
+
+# -----------------------------
+# wrap_request：gspread 的 request(method, endpoint, …)（由 google_client.install_hooks 呼叫）
+#    classify(method, endpoint) → (api, kind)；Drive metadata 查詢不佔 Sheets 配額
+# -----------------------------
+def wrap_request(orig_request, classify):
+    def call(method, endpoint, *args, **kwargs):
+        api, kind = classify(method, endpoint)
+        if api != "sheets" or not _enabled():
+            return orig_request(method, endpoint, *args, **kwargs)
+        from gspread.exceptions import APIError
+
+        for attempt in range(MAX_429_RETRIES + 1):
+            waited = bucket(kind).acquire()
+            if waited > 0.01:
+                run_metrics.observe("sheets_quota_wait_seconds", waited, kind=kind)
+            try:
+                return orig_request(method, endpoint, *args, **kwargs)
+            except APIError as e:
+                resp = getattr(e, "response", None)
+                if getattr(resp, "status_code", None) != 429 or attempt == MAX_429_RETRIES:
+                    raise
+                delay = _retry_after(resp.headers, attempt)
+                run_metrics.inc("sheets_429_total", kind=kind)
+                print(f"⏳ Sheets {kind} 配額已滿（429），{delay:.0f}s 後重試")
+                bucket(kind).block(delay)
+    return call
+
+# -----------------------------
+# ScheduledHttp：googleapiclient（httplib2 介面）用
+# -----------------------------
+class ScheduledHttp:
+    def __init__(self, inner):
+        self.inner = inner
+
+    def request(self, uri, method="GET", body=None, headers=None, **kwargs):
+        kind = "read" if method.upper() == "GET" else "write"
+        if not _enabled():
+            return self.inner.request(uri, method=method, body=body, headers=headers, **kwargs)
+        for attempt in range(MAX_429_RETRIES + 1):
+            bucket(kind).acquire()
+            resp, content = self.inner.request(uri, method=method, body=body, headers=headers, **kwargs)
+            if resp.status != 429 or attempt == MAX_429_RETRIES:
+                return resp, content
+            delay = _retry_after(dict(resp), attempt)
+            run_metrics.inc("sheets_429_total", kind=kind)
+            print(f"⏳ Sheets {kind} 配額已滿（429），{delay:.0f}s 後重試")
+            bucket(kind).block(delay)
+
+    def close(self):
+        if hasattr(self.inner, "close"):
+            self.inner.close()
+
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
+
+# -----------------------------
+# queue_append / flush：依工作表合併 append_rows
+# -----------------------------
+_pending = {}
+_pending_lock = threading.Lock()
+
+def _key(ws, value_input_option):
+    return (ws.spreadsheet.id, ws.title, value_input_option)
+
+def queue_append(ws, rows, value_input_option="RAW"):
+    if not rows:
+        return
+    key = _key(ws, value_input_option)
+    with _pending_lock:
+        entry = _pending.setdefault(key, {"ws": ws, "rows": []})
+        entry["rows"].extend(rows)
+    # 寫入 token 可用就立即送出；否則留在佇列，和之後的列合併
+    if not _enabled() or bucket("write").available():
+        flush(ws, value_input_option)
+
+def flush(ws=None, value_input_option=None):
+    """送出佇列中的列；ws 為 None 時送出所有工作表。回傳送出的列數。"""
+    with _pending_lock:
+        keys = [k for k in _pending
+                if ws is None or (k[:2] == _key(ws, None)[:2]
+                                  and (value_input_option is None or k[2] == value_input_option))]
+        batches = [(k, _pending.pop(k)) for k in keys]
+    sent = 0
+    for n, (key, entry) in enumerate(batches):
+        _, title, option = key
+        rows = entry["rows"]
+        for i in range(0, len(rows), MAX_ROWS_PER_CALL):
+            chunk = rows[i:i + MAX_ROWS_PER_CALL]
+            try:
+                entry["ws"].append_rows(chunk, value_input_option=option)
+            except Exception:
+                # 未送出的列放回佇列最前面，呼叫端重試 flush 時不會遺失
+                _requeue([(key, {"ws": entry["ws"], "rows": rows[i:]})] + batches[n + 1:])
+                raise
+            sent += len(chunk)
+        run_metrics.inc("sheets_appends_merged_total", title=title)
+        print(f"✅ 寫入 {len(rows)} 筆到 {title}")
+    return sent
+
+def _requeue(batches):
+    with _pending_lock:
+        for key, entry in batches:
+            later = _pending.pop(key, None)
+            if later is not None:
+                entry["rows"].extend(later["rows"])
+            _pending[key] = entry
+
+def pending_rows():
+    with _pending_lock:
+        return sum(len(e["rows"]) for e in _pending.values())
+
+# -----------------------------
+# WriteBehind：背景 append
+#    with sheets_scheduler.WriteBehind(ws, call=safe_api_call) as writer:
+#        writer.put(rows)
+#    call：包住每次 append_rows 的函式（例如 5xx 重試）；離開 with 時送出剩下的列並等待完成
+# -----------------------------
+_STOP = object()
+
+def _row_bytes(row):
+    return len(json.dumps(row, ensure_ascii=False, default=str).encode("utf-8"))
+
+def _chunks(rows, sizes, max_rows=MAX_ROWS_PER_CALL, max_bytes=MAX_BYTES_PER_CALL):
+    start, total = 0, 0
+    for i, size in enumerate(sizes):
+        if i > start and (i - start >= max_rows or total + size > max_bytes):
+            yield rows[start:i]
+            start, total = i, 0
+        total += size
+    if start < len(rows):
+        yield rows[start:]
+
+class WriteBehind:
+    def __init__(self, ws, value_input_option="RAW", call=None, interval=WRITE_BEHIND_SECONDS,
+                 flush_bytes=WRITE_BEHIND_BYTES, max_queue=WRITE_BEHIND_QUEUE):
+        self.ws = ws
+        self.value_input_option = value_input_option
+        self.call = call or (lambda func, *args, **kwargs: func(*args, **kwargs))
+        self.interval = interval
+        self.flush_bytes = flush_bytes
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.error = None
+        self.unsent = []      # 發生錯誤時沒寫進去的列（依原本順序）
+        self.sent = 0
+        self._thread = threading.Thread(target=self._run, name=f"write-behind:{ws.title}", daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        self.close(raise_error=exc_type is None)
+
+    def _raise(self):
+        if self.error is not None:
+            raise RuntimeError(f"❌ 背景寫入 {self.ws.title} 失敗，{len(self.unsent)} 列未寫入") from self.error
+
+    def put(self, rows):
+        """排入要 append 的列；只有佇列滿了才會等。先前的寫入失敗時拋出例外。"""
+        if not rows:
+            return
+        rows = list(rows)
+        while True:
+            self._raise()
+            try:
+                self.queue.put(rows, timeout=1)
+                return
+            except queue.Full:
+                run_metrics.inc("sheets_write_behind_full_total", title=self.ws.title)
+
+    def close(self, raise_error=True):
+        """送出剩下的列並等待背景執行緒結束。"""
+        if self._thread.is_alive():
+            self.queue.put(_STOP)
+            self._thread.join()
+        if raise_error:
+            self._raise()
+        return self.sent
+
+    def _run(self):
+        rows, sizes, deadline = [], [], None
+        stopping = False
+        while not stopping:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            if item is _STOP:
+                stopping = True
+            elif item:
+                rows.extend(item)
+                sizes.extend(_row_bytes(r) for r in item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.interval
+            if not rows:
+                continue
+            due = stopping or sum(sizes) >= self.flush_bytes or time.monotonic() >= deadline
+            if not due:
+                continue
+            if not stopping and _enabled() and not bucket("write").available():
+                # 寫入配額用完：繼續累積，稍後合併成一次送出
+                deadline = time.monotonic() + 1.0
+                continue
+            if not self._send(rows, sizes):
+                self._drain()
+                return
+            rows, sizes, deadline = [], [], None
+
+    def _send(self, rows, sizes):
+        done = 0
+        for chunk in _chunks(rows, sizes):
+            t0 = time.monotonic()
+            try:
+                self.call(self.ws.append_rows, chunk, value_input_option=self.value_input_option)
+            except Exception as e:
+                self.error = e
+                self.unsent = rows[done:]
+                print(f"❌ 背景寫入 {self.ws.title} 失敗：{e}")
+                return False
+            done += len(chunk)
+            run_metrics.observe("sheets_write_behind_seconds", time.monotonic() - t0, title=self.ws.title)
+        self.sent += done
+        run_metrics.inc("sheets_appends_merged_total", title=self.ws.title)
+        print(f"✅ 寫入 {done} 筆到 {self.ws.title}")
+        return True
+
+    def _drain(self):
+        """發生錯誤後把佇列中剩下的列收進 unsent，讓等在 put / close 的呼叫端不會卡住。"""
+        while True:
+            item = self.queue.get()
+            if item is _STOP:
+                return
+            self.unsent.extend(item)
+
+@atexit.register
+def _flush_at_exit():
+    if pending_rows():
+        print(f"⚠️ 結束前仍有 {pending_rows()} 列未送出，嘗試寫入")
+        flush()
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Status 封存：把已進入終態（已閱 / 跳過）超過指定天數的列，
+移到依發行年份分開的封存分頁（Status_archive_{year}）或本機 Parquet，再從 Status 一次刪除，
+讓各腳本每次讀取與 Rating 的 COUNTIFS / VLOOKUP 只需要處理仍在進行中的列。
+
+    - 天數從進入終態的時間算起（status_journal 的變更歷史）；歷史中沒有紀錄的終態列（手動改的、
+      變更歷史建立之前就是終態的）以第一次看到的時間為準，不會一執行就封存
+    - 封存列的演員統計寫到 Status_archive_counts 分頁，Rating 的「總番數」「已閱」公式加上這裡的數量，
+      封存前後演員的統計不變
+
+封存過的識別碼記在本機索引（status_archive.db），find_Mglinks 不會把它們當成新片重新加入 Status，
+updateStatusAfterReading 的 Step4 也不會把它們列為「不在 Status」。
+"""
+import os
+import sqlite3
+from datetime import datetime, timedelta
+
+import sheet_snapshot
+import status_journal
+
+# -----------------------------
+# 設定
+# -----------------------------
+BASE_DIR           = os.path.dirname(os.path.abspath(__file__))
+ARCHIVE_DB_PATH    = os.path.join(BASE_DIR, "status_archive.db")
+PARQUET_DIR        = os.path.join(BASE_DIR, "status_archive")
+ARCHIVE_AFTER_DAYS = 365
+ARCHIVE_TAB_FORMAT = "Status_archive_{year}"
+ARCHIVE_STATES     = {"已閱", "跳過"}
+ARCHIVE_COUNTS_TAB = "Status_archive_counts"
+RATING_TAB         = "Rating"
+
+def _norm_ident(ident):
+    return str(ident).strip().upper()
+
+# -----------------------------
+# open_index / archived_idents：封存索引
+# -----------------------------
+def open_index(db_path=ARCHIVE_DB_PATH):
+    conn = sqlite3.connect(db_path)
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS archived (
+            ident        TEXT PRIMARY KEY,
+            status       TEXT,
+            release_date TEXT,
+            location     TEXT,
+            archived_at  TEXT,
+            magnet       TEXT,
+            actor        TEXT
+        );
+    """)
+    # 舊版索引沒有 magnet / actor 欄
+    have = {row[1] for row in conn.execute("PRAGMA table_info(archived)")}
+    for col in ("magnet", "actor"):
+        if col not in have:
+            conn.execute(f"ALTER TABLE archived ADD COLUMN {col} TEXT")
+    return conn
+
+def archived_idents(conn=None):
+    """回傳所有已封存的識別碼（大寫）；索引不存在時回傳空集合。"""
+    if conn is None:
+        if not os.path.exists(ARCHIVE_DB_PATH):
+            return set()
+        conn = open_index()
+    return {row[0] for row in conn.execute("SELECT ident FROM archived")}
+
+def archived_magnets(conn=None):
+    """{識別碼: (封存時的狀態, Magnet 連結)}，給 magnet_index 沿用已封存片的 hash。"""
+    if conn is None:
+        if not os.path.exists(ARCHIVE_DB_PATH):
+            return {}
+        conn = open_index()
+    return {ident: (status, magnet or "")
+            for ident, status, magnet in conn.execute("SELECT ident, status, magnet FROM archived")}
+
+def actor_counts(conn, exclude=()):
+    """
+    [(演員欄, 封存數, 其中已閱數), ...]；演員欄與 Rating 的 COUNTIFS 一樣以整格比對。
+    exclude：仍在 Status 中的識別碼（上次刪除前中斷），不重複計算。
+    """
+    exclude = set(exclude)
+    counts = {}
+    for ident, actor, status in conn.execute("SELECT ident, actor, status FROM archived ORDER BY actor"):
+        if not actor or ident in exclude:
+            continue
+        total, read = counts.get(actor, (0, 0))
+        counts[actor] = (total + 1, read + (status == "已閱"))
+    return [(actor, total, read) for actor, (total, read) in counts.items()]
+
+# -----------------------------
+# terminal_since：每個終態列進入終態的時間
+#    - 變更歷史中最近一次的狀態與目前相同 → 用那次的時間
+#    - 否則（手動改的、歷史建立之前就是終態）→ 記下現在，之後從這裡開始算
+# -----------------------------
+def terminal_since(status_df, history, now=None):
+    now = now or datetime.now()
+    known = status_journal.last_changes(history)
+    since, seed = {}, {}
+    terminal = status_df[status_df["狀態"].astype(str).isin(list(ARCHIVE_STATES))]
+    for ident, status in zip(terminal.index, terminal["狀態"].astype(str)):
+        value, ts = known.get(ident, (None, None))
+        if value == status:
+            since[ident] = datetime.fromisoformat(ts)
+        else:
+            since[ident] = now
+            seed[(ident, "狀態")] = (status, now.isoformat(timespec="microseconds"))
+    if seed:
+        status_journal.remember(history, seed)
+    return since
+
+# -----------------------------
+# select_archivable：終態超過 max_age_days 的列（發行日期無法解析的列不封存，封存分頁依發行年份分）
+#    since：{ident: 進入終態的時間}（terminal_since）
+# -----------------------------
+def select_archivable(status_df, since, max_age_days=ARCHIVE_AFTER_DAYS, today=None):
+    today = today or datetime.now()
+    cutoff = today - timedelta(days=max_age_days)
+    old = {ident for ident, t in since.items() if t < cutoff}
+    mask = (
+        status_df["狀態"].astype(str).isin(list(ARCHIVE_STATES))
+        & status_df["發行日期"].notna()
+        & status_df.index.isin(list(old))
+    )
+    return status_df[mask]
+
+# -----------------------------
+# 封存目的地：年份分頁 / Parquet
+# -----------------------------
+def _append_to_tab(spreadsheet, year, header, rows):
+    import gspread
+
+    title = ARCHIVE_TAB_FORMAT.format(year=year)
+    try:
+        ws = spreadsheet.worksheet(title)
+    except gspread.exceptions.WorksheetNotFound:
+        ws = spreadsheet.add_worksheet(title=title, rows=str(len(rows) + 1), cols=str(len(header)))
+        ws.append_row(header)
+    ws.append_rows(rows, value_input_option="RAW")
+    return title
+
+def _append_to_parquet(year, header, rows):
+    import pandas as pd
+
+    os.makedirs(PARQUET_DIR, exist_ok=True)
+    path = os.path.join(PARQUET_DIR, f"{year}.parquet")
+    new = pd.DataFrame(rows, columns=header, dtype=str)
+    if os.path.exists(path):
+        new = pd.concat([pd.read_parquet(path), new], ignore_index=True)
+    new = new.drop_duplicates(header[0], keep="last")
+    new.to_parquet(path + ".tmp", index=False)
+    os.replace(path + ".tmp", path)
+    return os.path.relpath(path, BASE_DIR)
+
+# -----------------------------
+# Rating 公式：Status 中的數量 + 封存的數量（Status_archive_counts 不存在時視為 0）
+#    find_Mglinks.update_rating_sheet 新增演員時也用這裡的公式
+# -----------------------------
+def rating_total_formula(r):
+    return (f'=COUNTIFS(Status!$G:$G,$A{r},Status!$O:$O,"<>")'
+            f'+IFERROR(VLOOKUP($A{r},{ARCHIVE_COUNTS_TAB}!$A:$C,2,0),0)')
+
+def rating_read_formula(r):
+    return (f'=COUNTIFS(Status!$G:$G,$A{r},Status!$O:$O,G$1)'
+            f'+IFERROR(VLOOKUP($A{r},{ARCHIVE_COUNTS_TAB}!$A:$C,3,0),0)')
+
+def _write_counts(spreadsheet, conn, exclude=()):
+    import gspread
+
+    rows = [["演員", "封存數", "已閱"]] + [list(r) for r in actor_counts(conn, exclude)]
+    try:
+        spreadsheet.worksheet(ARCHIVE_COUNTS_TAB)
+    except gspread.exceptions.WorksheetNotFound:
+        spreadsheet.add_worksheet(title=ARCHIVE_COUNTS_TAB, rows=str(len(rows) + 1), cols="3")
+    spreadsheet.values_clear(f"{ARCHIVE_COUNTS_TAB}!A:C")
+    spreadsheet.values_update(f"{ARCHIVE_COUNTS_TAB}!A1", params={"valueInputOption": "RAW"},
+                              body={"values": rows})
+    print(f"📊 {ARCHIVE_COUNTS_TAB}：{len(rows) - 1} 位演員的封存數")
+
+def _ensure_rating_formulas(spreadsheet):
+    """舊的 Rating 列只計算 Status 中的列：把「總番數」「已閱」換成含封存數的公式（已換過的不動）。"""
+    got = spreadsheet.values_batch_get([f"{RATING_TAB}!A2:A", f"{RATING_TAB}!B2:B", f"{RATING_TAB}!G2:G"],
+                                       params={"valueRenderOption": "FORMULA"})
+    names, totals, reads = [vr.get("values", []) for vr in got["valueRanges"]]
+    data = []
+    for i, name in enumerate(names):
+        r = i + 2
+        if not name or not str(name[0]).strip():
+            continue
+        for letter, col, formula in (("B", totals, rating_total_formula(r)), ("G", reads, rating_read_formula(r))):
+            current = col[i][0] if i < len(col) and col[i] else ""
+            if ARCHIVE_COUNTS_TAB not in str(current):
+                data.append({"range": f"{RATING_TAB}!{letter}{r}", "values": [[formula]]})
+    if data:
+        spreadsheet.values_batch_update({"valueInputOption": "USER_ENTERED", "data": data})
+        print(f"🧮 Rating：{len(data)} 格改為含封存數的公式")
+
+# -----------------------------
+# _row_ranges：把列號合併成連續區段，由下往上排列（刪除時前面的列號不會位移）
+# -----------------------------
+def _row_ranges(rows):
+    ranges = []
+    for r in sorted(rows):
+        if ranges and r == ranges[-1][1] + 1:
+            ranges[-1][1] = r
+        else:
+            ranges.append([r, r])
+    return sorted(ranges, reverse=True)
+
+# -----------------------------
+# archive：封存並從 Status 刪除
+#    backend："sheet"（年份分頁）或 "parquet"
+#    回傳封存（刪除）的列數
+# -----------------------------
+def archive(ws_status, max_age_days=ARCHIVE_AFTER_DAYS, backend="sheet", dry_run=False, conn=None, history=None):
+    import status_model
+
+    conn = conn or open_index()
+    history = history or status_journal.open_history()
+    values = sheet_snapshot.get_all_values(ws_status)
+    status_df = status_model.status_frame_from_values(values)
+    targets = select_archivable(status_df, terminal_since(status_df, history), max_age_days)
+    if targets.empty:
+        print("Status 封存：沒有符合條件的列")
+        return 0
+
+    header = [h.strip() for h in values[0]]
+    done = archived_idents(conn)
+    by_year = {}
+    for ident, r, release in zip(targets.index, targets["row"], targets["發行日期"]):
+        by_year.setdefault(release.year, []).append((ident, int(r)))
+
+    print(f"🗄️ Status 封存：{len(targets)} 列（{max_age_days} 天前就是 {'/'.join(sorted(ARCHIVE_STATES))}）")
+    for year, items in sorted(by_year.items()):
+        # 已在索引中的識別碼（上次刪除前中斷）不重複寫入封存處，只需從 Status 刪除
+        fresh = [(ident, r) for ident, r in items if ident not in done]
+        print(f"  - {year}: {len(items)} 列（新封存 {len(fresh)}）")
+        if dry_run or not fresh:
+            continue
+        rows = [(values[r - 1] + [""] * len(header))[:len(header)] for _, r in fresh]
+        if backend == "parquet":
+            location = _append_to_parquet(year, header, rows)
+        else:
+            location = _append_to_tab(ws_status.spreadsheet, year, header, rows)
+        now = datetime.now().isoformat(timespec="seconds")
+        conn.executemany(
+            "INSERT OR REPLACE INTO archived VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(ident, str(status_df.at[ident, "狀態"]),
+              status_df.at[ident, "發行日期"].strftime(status_model.DATE_FORMAT), location, now,
+              str(status_df.at[ident, "Magnet 連結"]).strip(), str(status_df.at[ident, "演員"]).strip())
+             for ident, _ in fresh],
+        )
+        conn.commit()
+
+    if dry_run:
+        return 0
+
+    # 刪除前再讀一次 A 欄，確認列號仍對應同一個識別碼（期間若有人插入 / 刪除列就放棄）
+    col_a = ws_status.col_values(1)
+    for ident, r in zip(targets.index, targets["row"]):
+        if int(r) > len(col_a) or _norm_ident(col_a[int(r) - 1]) != ident:
+            print("⚠️ Status 在讀取後已變動，本次不刪除；封存索引已更新，下次執行會直接刪除")
+            return 0
+
+    requests = [
+        {"deleteDimension": {"range": {
+            "sheetId": ws_status.id, "dimension": "ROWS",
+            "startIndex": start - 1, "endIndex": end,
+        }}}
+        for start, end in _row_ranges(int(r) for r in targets["row"])
+    ]
+    ws_status.spreadsheet.batch_update({"requests": requests})
+    print(f"✅ 已從 Status 刪除 {len(targets)} 列（{len(requests)} 個區段）")
+
+    # Rating 的「總番數」「已閱」加上封存數，演員統計與封存前相同
+    _write_counts(ws_status.spreadsheet, conn, exclude=set(status_df.index) - set(targets.index))
+    _ensure_rating_formulas(ws_status.spreadsheet)
+    return len(targets)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    import google_client
+    import run_metrics
+
+    parser = argparse.ArgumentParser(description="封存 Status 中已閱 / 跳過的舊列")
+    parser.add_argument("--days", type=int, default=ARCHIVE_AFTER_DAYS, help="進入已閱 / 跳過超過幾天才封存")
+    parser.add_argument("--parquet", action="store_true", help="封存到本機 Parquet，而不是年份分頁")
+    parser.add_argument("--dry-run", action="store_true", help="只列出會封存的列數")
+    args = parser.parse_args()
+
+    CREDENTIAL_PATH = r"C:\Users\chen8\OneDrive\文件\pythonHouse\utCooking\credentials.json"
+    SPREADSHEET_ID  = "1cizSVrySFHKYfngBhkCCNVRXRJiMYH_2ltts9YAdbEo"
+    run_metrics.start_run("status_archive")
+    scope  = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+    client = google_client.authorize(CREDENTIAL_PATH, scope)
+    ws     = client.open_by_key(SPREADSHEET_ID).worksheet("Status")
+    with run_metrics.stage("archive"):
+        archive(ws, args.days, backend="parquet" if args.parquet else "sheet", dry_run=args.dry_run)
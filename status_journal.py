@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Status 狀態變更日誌：各腳本不再各自呼叫 update_cells，而是把「辨識碼 + 預期舊值 → 新值」
+追加到本機 journal；由單一 committer 合併多餘的轉換、以最新一次讀取重新檢查預期舊值，
+最後用一次 values_batch_update 寫回。寫回的每一格也把值與時間記進變更歷史（status_history.db），
+journal 提交後就刪除，之後要知道「什麼時候變成這個狀態」查歷史即可。
+"""
+import os
+import json
+import glob
+import time
+import sqlite3
+from datetime import datetime
+
+# -----------------------------
+# 設定
+# -----------------------------
+JOURNAL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "status_journal.jsonl")
+HISTORY_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "status_history.db")
+LOCK_STALE_SECONDS = 15 * 60
+
+# Status 工作表欄位順序（A ~ P）
+STATUS_HEADERS = [
+    "識別碼", "發行日期", "長度", "製作商", "發行商", "類別", "演員",
+    "磁力名稱", "檔案大小", "分享日期", "Magnet 連結",
+    "每小時檔案大小 (GB/hr)", "是否為 4K 資源", "tag", "狀態", "評級",
+]
+
+def column_letter(column):
+    return chr(ord("A") + STATUS_HEADERS.index(column))
+
+def _norm_ident(ident):
+    return str(ident).strip().upper()
+
+# -----------------------------
+# record：追加狀態轉換
+#    transitions：[(ident, expected_old, new), ...]
+# -----------------------------
+def record(transitions, source, column="狀態", path=JOURNAL_PATH):
+    if not transitions:
+        return 0
+    ts = datetime.now().isoformat(timespec="microseconds")
+    lines = [
+        json.dumps({"ts": ts, "seq": i, "source": source, "ident": _norm_ident(ident),
+                    "column": column, "expected": expected, "new": new}, ensure_ascii=False)
+        for i, (ident, expected, new) in enumerate(transitions)
+    ]
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    print(f"📝 {source}: 已記錄 {len(lines)} 筆 {column} 變更到 journal")
+    return len(lines)
+
+# -----------------------------
+# 鎖：同一時間只有一個 committer
+# -----------------------------
+def _acquire_lock(lock_path):
+    try:
+        fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        if time.time() - os.path.getmtime(lock_path) < LOCK_STALE_SECONDS:
+            return False
+        os.remove(lock_path)
+        return _acquire_lock(lock_path)
+    os.write(fd, str(os.getpid()).encode())
+    os.close(fd)
+    return True
+
+def _read_entries(files):
+    entries = []
+    for fn in files:
+        with open(fn, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    # 寫到一半中斷的最後一行
+                    print(f"⚠️ journal 有無法解析的行，略過：{line[:80]}")
+    entries.sort(key=lambda e: (e["ts"], e.get("seq", 0)))
+    return entries
+
+# -----------------------------
+# coalesce：依時間順序在最新值上模擬每筆轉換
+#    - 目前值 == expected → 套用
+#    - 目前值 == new      → 已是目標值，略過
+#    - 其他               → 前提不成立（被別的流程改過），放棄這筆
+#    回傳 ({(ident, column): 最終值}, 衝突清單)
+# -----------------------------
+def coalesce(entries, current):
+    final = {}
+    conflicts = []
+    for e in entries:
+        key = (e["ident"], e["column"])
+        if key not in current:
+            conflicts.append((e, None))
+            continue
+        cur = final.get(key, current[key])
+        if cur == e["expected"]:
+            final[key] = e["new"]
+        elif cur != e["new"]:
+            conflicts.append((e, cur))
+    changed = {k: v for k, v in final.items() if v != current[k]}
+    return changed, conflicts
+
+# -----------------------------
+# 變更歷史：每個 (識別碼, 欄位) 最近一次寫回的值與時間
+#    changes：{(ident, column): (值, ISO 時間)}
+# -----------------------------
+def open_history(db_path=HISTORY_DB_PATH):
+    conn = sqlite3.connect(db_path)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS changes (
+            ident      TEXT,
+            col        TEXT,
+            value      TEXT,
+            changed_at TEXT,
+            PRIMARY KEY (ident, col)
+        )
+    """)
+    return conn
+
+def remember(conn, changes):
+    with conn:
+        conn.executemany("INSERT OR REPLACE INTO changes VALUES (?, ?, ?, ?)",
+                         [(ident, column, value, ts) for (ident, column), (value, ts) in changes.items()])
+
+def last_changes(conn, column="狀態"):
+    """{ident: (值, ISO 時間)}"""
+    return {ident: (value, ts) for ident, value, ts in
+            conn.execute("SELECT ident, value, changed_at FROM changes WHERE col = ?", (column,))}
+
+def change_times(entries, changed):
+    """寫回的每一格 → (最終值, 最後一筆設成這個值的紀錄時間)"""
+    times = {}
+    for e in entries:
+        key = (e["ident"], e["column"])
+        if key in changed and e["new"] == changed[key]:
+            times[key] = (e["new"], e["ts"])
+    return times
+
+# -----------------------------
+# commit：合併 journal 並一次寫回
+#    ws：Status worksheet（gspread）
+# -----------------------------
+def commit(ws, path=JOURNAL_PATH, history_path=HISTORY_DB_PATH):
+    lock_path = path + ".lock"
+    if not _acquire_lock(lock_path):
+        print("⏳ 另一個 committer 正在執行，journal 留待下次提交")
+        return 0
+    try:
+        # 把目前的 journal 改名，之後追加的紀錄會寫進新檔，不會被這次提交吃掉
+        if os.path.exists(path):
+            os.replace(path, f"{path}.{int(time.time() * 1000)}.committing")
+        files = sorted(glob.glob(f"{glob.escape(path)}.*.committing"))
+        entries = _read_entries(files)
+        if not entries:
+            for fn in files:
+                os.remove(fn)
+            print("Status journal: 沒有待提交的變更")
+            return 0
+
+        # 以一次 batch_get 讀取最新的 A 欄與需要的欄位
+        columns = sorted({e["column"] for e in entries}, key=STATUS_HEADERS.index)
+        letters = [column_letter(c) for c in columns]
+        fresh = ws.batch_get(["A:A"] + [f"{L}:{L}" for L in letters])
+        idents = fresh[0]
+        row_of = {}
+        current = {}
+        for r, cell in enumerate(idents, start=1):
+            if r == 1 or not cell or not str(cell[0]).strip():
+                continue
+            ident = _norm_ident(cell[0])
+            if ident in row_of:
+                continue
+            row_of[ident] = r
+            for column, col_values in zip(columns, fresh[1:]):
+                v = col_values[r - 1] if r - 1 < len(col_values) and col_values[r - 1] else [""]
+                current[(ident, column)] = str(v[0]).strip()
+
+        changed, conflicts = coalesce(entries, current)
+        for e, cur in conflicts:
+            reason = "找不到辨識碼" if cur is None else f"目前為 {cur}"
+            print(f"⚠️ 放棄 {e['source']} 的變更 {e['ident']}: {e['expected']} → {e['new']}（{reason}）")
+
+        if changed:
+            data = [
+                {"range": f"{ws.title}!{column_letter(column)}{row_of[ident]}", "values": [[value]]}
+                for (ident, column), value in sorted(changed.items(), key=lambda kv: row_of[kv[0][0]])
+            ]
+            ws.spreadsheet.values_batch_update({"valueInputOption": "RAW", "data": data})
+            history = open_history(history_path)
+            remember(history, change_times(entries, changed))
+            history.close()
+        print(f"✅ Status journal: {len(entries)} 筆紀錄 → 寫回 {len(changed)} 格，{len(conflicts)} 筆衝突")
+
+        # 寫回成功後才刪除；失敗時 .committing 會在下次提交重試
+        for fn in files:
+            os.remove(fn)
+        return len(changed)
+    finally:
+        os.remove(lock_path)
+
+
+if __name__ == "__main__":
+    import google_client
+
+    CREDENTIAL_PATH = r"C:\Users\chen8\OneDrive\文件\pythonHouse\utCooking\credentials.json"
+    SPREADSHEET_ID  = "1cizSVrySFHKYfngBhkCCNVRXRJiMYH_2ltts9YAdbEo"
+    scope  = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+    client = google_client.authorize(CREDENTIAL_PATH, scope)
+    commit(client.open_by_key(SPREADSHEET_ID).worksheet("Status"))
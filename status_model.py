@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Status 工作表的欄式模型：一次讀入後轉成有型別的欄位
+（狀態 / 演員等為 category、發行日期為 datetime、GB/hr 與檔案大小為數值、4K 為布林），
+並以「識別碼」為索引，讓各腳本用欄運算篩選，而不是逐列用 row[14] 之類的位置判斷。
+"""
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+import sheet_snapshot
+
+# -----------------------------
+# 欄位設定
+# -----------------------------
+STATUS_CATEGORIES = ["尚無 4K 資源", "等待下載", "下載中", "下載完成", "已閱", "跳過"]
+TERMINAL_STATES   = {"已閱", "跳過"}
+AG_COLUMNS = ["識別碼", "發行日期", "長度", "製作商", "發行商", "類別", "演員"]
+HN_COLUMNS = ["磁力名稱", "檔案大小", "分享日期", "Magnet 連結",
+              "每小時檔案大小 (GB/hr)", "是否為 4K 資源", "tag"]
+CATEGORY_COLUMNS = ["製作商", "發行商", "類別", "演員", "評級"]
+DATE_FORMAT = "%Y-%m-%d"
+
+# -----------------------------
+# sheet_text：把 Python 值轉成 Google Sheet 顯示的文字（RAW 寫入後讀回的樣子）
+# -----------------------------
+def sheet_text(x):
+    if x is None:
+        return ""
+    if isinstance(x, (bool, np.bool_)):
+        return "TRUE" if x else "FALSE"
+    if isinstance(x, (float, np.floating)):
+        if np.isnan(x):
+            return ""
+        return str(int(x)) if float(x).is_integer() else repr(float(x))
+    if isinstance(x, (int, np.integer)):
+        return str(int(x))
+    return str(x).strip()
+
+# -----------------------------
+# row_digest：一段欄位文字的 64-bit 摘要，用來判斷 A~G / H~N 是否需要重寫
+# -----------------------------
+def row_digest(texts):
+    h = hashlib.blake2b("\x1f".join(texts).encode("utf-8"), digest_size=8)
+    return int.from_bytes(h.digest(), "little", signed=True)
+
+# -----------------------------
+# status_frame_from_values：get_all_values() → 有型別的 DataFrame
+#    - index：識別碼（去空白、轉大寫；重複時保留第一列）
+#    - row：在工作表中的列號（從 1 起算，含標頭）
+#    - digest_ag / digest_hn：原始文字的摘要（識別碼以轉大寫後的值計算，與 update_status_sheet 寫回的一致）
+#    - attrs["n_rows"]：資料列數（含空白列），新增列時用來計算列號
+# -----------------------------
+def status_frame_from_values(values):
+    header = [h.strip() for h in values[0]] if values else []
+    rows = values[1:]
+    width = max([len(header)] + [len(r) for r in rows]) if rows else len(header)
+    header = header + [f"_col{i}" for i in range(len(header), width)]
+    padded = [r + [""] * (width - len(r)) for r in rows]
+
+    raw = pd.DataFrame(padded, columns=header, dtype=object)
+    for col in AG_COLUMNS + HN_COLUMNS + ["狀態", "評級"]:
+        if col not in raw.columns:
+            raw[col] = ""
+    raw["row"] = np.arange(2, len(raw) + 2, dtype=np.int32)
+
+    ag = raw[AG_COLUMNS].to_numpy()
+    hn = raw[HN_COLUMNS].to_numpy()
+    raw["digest_ag"] = np.fromiter((row_digest([r[0].strip().upper()] + [v.strip() for v in r[1:]]) for r in ag),
+                                   dtype=np.int64, count=len(raw))
+    raw["digest_hn"] = np.fromiter((row_digest([v.strip() for v in r]) for r in hn),
+                                   dtype=np.int64, count=len(raw))
+
+    raw["識別碼"] = raw["識別碼"].astype(str).str.strip().str.upper()
+    df = raw[raw["識別碼"] != ""]
+    df = df.drop_duplicates("識別碼", keep="first").set_index("識別碼")
+
+    status = df["狀態"].astype(str).str.strip()
+    extra = sorted(set(status.unique()) - set(STATUS_CATEGORIES))
+    df["狀態"] = pd.Categorical(status, categories=STATUS_CATEGORIES + extra)
+    df["發行日期"] = pd.to_datetime(df["發行日期"], format=DATE_FORMAT, errors="coerce")
+    for col in ["檔案大小", "每小時檔案大小 (GB/hr)"]:
+        df[col] = pd.to_numeric(df[col], errors="coerce")
+    df["是否為 4K 資源"] = df["是否為 4K 資源"].astype(str).str.strip().str.upper() == "TRUE"
+    for col in CATEGORY_COLUMNS:
+        df[col] = df[col].astype(str).str.strip().astype("category")
+
+    df.attrs["n_rows"] = len(rows)
+    return df
+
+# -----------------------------
+# load_status_frame：讀取 Status 工作表（試算表沒變動時使用本機快照）
+# -----------------------------
+def load_status_frame(ws, use_cache=True):
+    return status_frame_from_values(sheet_snapshot.get_all_values(ws, use_cache=use_cache))
+
+# -----------------------------
+# select：欄運算篩選，例如 select(df, status_in={"等待下載"}, actor_in=failed)
+# -----------------------------
+def select(df, status_in=None, status_not_in=None, actor_in=None, ident_in=None, ident_not_in=None):
+    mask = np.ones(len(df), dtype=bool)
+    if status_in is not None:
+        mask &= df["狀態"].isin(list(status_in)).to_numpy()
+    if status_not_in is not None:
+        mask &= ~df["狀態"].isin(list(status_not_in)).to_numpy()
+    if actor_in is not None:
+        mask &= df["演員"].isin(list(actor_in)).to_numpy()
+    if ident_in is not None:
+        mask &= df.index.isin(list(ident_in))
+    if ident_not_in is not None:
+        mask &= ~df.index.isin(list(ident_not_in))
+    return df[mask]
+
+# -----------------------------
+# status_map / release_date_text：給舊流程用的簡單查詢
+# -----------------------------
+def status_map(df):
+    return dict(zip(df.index, df["狀態"].astype(str)))
+
+def release_date_text(df):
+    return dict(zip(df.index, df["發行日期"].dt.strftime(DATE_FORMAT).fillna("")))
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""catalog 的同步與分組統計（python -m pytest）"""
+import argparse
+
+import catalog
+
+STATUS_HEADER = ["識別碼", "發行日期", "演員", "類別", "檔案大小", "每小時檔案大小 (GB/hr)", "狀態"]
+RATING_HEADER = ["演員", "評級", "備註"]
+
+def _args(**kw):
+    base = dict(actor=None, genre=None, rating=None, status=None, studio=None, label=None,
+                min_gbph=None, max_gbph=None, since=None, ident=None, limit=50, by="status")
+    base.update(kw)
+    return argparse.Namespace(**base)
+
+def _catalog(status_rows, rating_rows):
+    conn = catalog.open_catalog(":memory:")
+    catalog.sync_values(conn, catalog.STATUS_TAB, [STATUS_HEADER] + status_rows)
+    catalog.sync_values(conn, catalog.RATING_TAB, [RATING_HEADER] + rating_rows)
+    return conn
+
+def test_sync_writes_only_changed_rows():
+    conn = _catalog([["abc-001", "2024-01-01", "A", "", "10", "5", "等待下載"],
+                     ["ABC-002", "2024-01-02", "B", "", "8", "4", "已閱"]], [])
+    values = [STATUS_HEADER, ["abc-001", "2024-01-01", "A", "", "10", "5", "等待下載"],
+              ["ABC-003", "2024-01-03", "C", "", "6", "3", "下載中"]]
+    assert catalog.sync_values(conn, catalog.STATUS_TAB, values) == (1, 1)
+    assert [r[0] for r in conn.execute("SELECT ident FROM titles ORDER BY ident")] == ["ABC-001", "ABC-003"]
+    assert conn.execute("SELECT actor FROM actor_links WHERE key = 'ABC-002'").fetchall() == []
+
+def test_count_by_actor_filters_rating_on_grouped_actor():
+    conn = _catalog([["ABC-001", "2024-01-01", "A ; B", "", "10", "5", "等待下載"]],
+                    [["A", "Failed", ""], ["B", "Good", ""]])
+    _, rows = catalog.query_count(conn, _args(by="actor", rating="Failed", status=["等待下載"]))
+    assert rows == [("A", 1, 10.0, 5.0)]
+
+def test_count_by_actor_filters_actor_on_grouped_row():
+    conn = _catalog([["ABC-001", "2024-01-01", "A ; B", "", "10", "5", "等待下載"]], [])
+    _, rows = catalog.query_count(conn, _args(by="actor", actor="A"))
+    assert rows == [("A", 1, 10.0, 5.0)]
+
+def test_count_by_rating_counts_each_title_once():
+    # 兩個演員同為 Failed：同一部片在 Failed 組只算一次
+    conn = _catalog([["ABC-001", "2024-01-01", "A ; B", "", "10", "5", "等待下載"],
+                     ["ABC-002", "2024-01-02", "A", "", "6", "3", "等待下載"]],
+                    [["A", "Failed", ""], ["B", "Failed", ""]])
+    _, rows = catalog.query_count(conn, _args(by="rating"))
+    assert rows == [("Failed", 2, 16.0, 4.0)]
+
+def test_count_by_status_with_rating_filter_keeps_title_level_match():
+    conn = _catalog([["ABC-001", "2024-01-01", "A ; B", "", "10", "5", "等待下載"],
+                     ["ABC-002", "2024-01-02", "B", "", "6", "3", "等待下載"]],
+                    [["A", "Failed", ""], ["B", "Good", ""]])
+    _, rows = catalog.query_count(conn, _args(by="status", rating="failed"))
+    assert rows == [("等待下載", 1, 10.0, 5.0)]
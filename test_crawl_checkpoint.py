@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""crawl_checkpoint 的續跑與補寫（python -m pytest）"""
+import crawl_checkpoint
+
+def _row(ident, magnet):
+    return [ident, "2024-01-01", magnet]
+
+def test_remaining_and_done_rows_follow_the_original_order():
+    conn = crawl_checkpoint.open_checkpoint(":memory:")
+    crawl_checkpoint.start(conn, "mglinks", ["ABC-001", "ABC-002", "ABC-003"])
+    crawl_checkpoint.mark_done(conn, "mglinks", 2, "ABC-003", [_row("ABC-003", "m3")])
+    crawl_checkpoint.mark_done(conn, "mglinks", 0, "ABC-001", [_row("ABC-001", "m1")])
+    assert crawl_checkpoint.remaining(conn, "mglinks") == [(1, "ABC-002")]
+    assert [ident for ident, _ in crawl_checkpoint.done_rows(conn, "mglinks")] == ["ABC-001", "ABC-003"]
+
+def test_start_clears_previous_round_and_finish_clears_all():
+    conn = crawl_checkpoint.open_checkpoint(":memory:")
+    crawl_checkpoint.start(conn, "mglinks", ["ABC-001"])
+    crawl_checkpoint.mark_done(conn, "mglinks", 0, "ABC-001", [])
+    crawl_checkpoint.start(conn, "mglinks", ["ABC-002"])
+    assert crawl_checkpoint.done_rows(conn, "mglinks") == []
+    crawl_checkpoint.finish(conn, "mglinks")
+    assert crawl_checkpoint.pending_codes(conn, "mglinks") is None
+
+def test_missing_rows_fills_partial_appends():
+    done = [("ABC-001", [_row("ABC-001", "m1"), _row("ABC-001", "m2")]),
+            ("ABC-002", [_row("ABC-002", "m3")])]
+    # 工作表只寫到 ABC-001 的第一列
+    sheet = [_row("ABC-001", "m1")]
+    assert crawl_checkpoint.missing_rows(sheet, done) == [_row("ABC-001", "m2"), _row("ABC-002", "m3")]
+
+def test_missing_rows_matches_identifiers_after_strip_and_ignores_blank_rows():
+    done = [("ABC-001", [_row("ABC-001", "m1")])]
+    assert crawl_checkpoint.missing_rows([[" ABC-001 ", "x"], []], done) == []
+    assert crawl_checkpoint.missing_rows([], done) == [_row("ABC-001", "m1")]
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""crawl_scheduler 的重抓排程與退避（python -m pytest）"""
+from datetime import datetime, timedelta
+
+import crawl_scheduler
+
+NOW = datetime(2026, 1, 10, 12, 0, 0)
+
+def _rows(ident, release="2026-01-01", magnet="magnet:?xt=urn:btih:aaa"):
+    row = [ident, release, "", "", "", "", "", "", "10GB", "", magnet, "5", "TRUE", ""]
+    return [row]
+
+def _next_due(conn, ident):
+    return datetime.fromisoformat(conn.execute("SELECT next_due FROM crawl WHERE ident = ?", (ident,)).fetchone()[0])
+
+def test_unchanged_magnets_double_the_interval():
+    conn = crawl_scheduler.open_history(":memory:")
+    crawl_scheduler.record(conn, "abc-001", _rows("ABC-001"), now=NOW)
+    assert _next_due(conn, "ABC-001") - NOW == timedelta(days=1)
+    crawl_scheduler.record(conn, "ABC-001", _rows("ABC-001"), now=NOW)
+    assert _next_due(conn, "ABC-001") - NOW == timedelta(days=2)
+    crawl_scheduler.record(conn, "ABC-001", _rows("ABC-001"), now=NOW)
+    assert _next_due(conn, "ABC-001") - NOW == timedelta(days=4)
+
+def test_changed_magnets_reset_and_old_releases_wait_longer():
+    conn = crawl_scheduler.open_history(":memory:")
+    crawl_scheduler.record(conn, "ABC-001", _rows("ABC-001"), now=NOW)
+    crawl_scheduler.record(conn, "ABC-001", _rows("ABC-001"), now=NOW)
+    crawl_scheduler.record(conn, "ABC-001", _rows("ABC-001", magnet="magnet:?xt=urn:btih:bbb"), now=NOW)
+    assert _next_due(conn, "ABC-001") - NOW == timedelta(days=1)
+    crawl_scheduler.record(conn, "OLD-001", _rows("OLD-001", release="2024-01-01"), now=NOW)
+    assert _next_due(conn, "OLD-001") - NOW == timedelta(days=2)
+
+def test_interval_is_capped():
+    conn = crawl_scheduler.open_history(":memory:")
+    for _ in range(12):
+        crawl_scheduler.record(conn, "ABC-001", _rows("ABC-001"), now=NOW)
+    assert _next_due(conn, "ABC-001") - NOW == crawl_scheduler.MAX_INTERVAL
+
+def test_plan_skips_terminal_archived_and_backoff():
+    conn = crawl_scheduler.open_history(":memory:")
+    crawl_scheduler.record(conn, "ABC-003", _rows("ABC-003"), now=NOW)
+    status = {"ABC-001": "已閱", "ABC-003": "尚無 4K 資源", "ABC-004": "尚無 4K 資源"}
+    codes = ["abc-001", "ABC-002", "ABC-003", "ABC-004", "ABC-005", " abc-005 "]
+    assert crawl_scheduler.plan(conn, codes, status, archived={"ABC-005"}, now=NOW) == ["ABC-002", "ABC-004"]
+    # 退避到期後重新排入
+    assert crawl_scheduler.plan(conn, ["ABC-003"], status, now=NOW + timedelta(days=2)) == ["ABC-003"]
+
+def test_never_recrawl_covers_every_state_without_magnet_updates():
+    conn = crawl_scheduler.open_history(":memory:")
+    status = {f"ABC-00{i}": st for i, st in enumerate(sorted(crawl_scheduler.NEVER_RECRAWL))}
+    assert crawl_scheduler.plan(conn, list(status), status, now=NOW) == []
+
+def test_budget_limits_due_codes_but_not_new_ones():
+    conn = crawl_scheduler.open_history(":memory:")
+    for ident, release in [("OLD-001", "2025-01-01"), ("NEW-001", "2026-01-05"), ("MID-001", "2025-12-01")]:
+        crawl_scheduler.record(conn, ident, _rows(ident, release=release), now=NOW)
+    status = {"OLD-001": "等待下載", "NEW-001": "等待下載", "MID-001": "等待下載"}
+    later = NOW + timedelta(days=10)
+    selected = crawl_scheduler.plan(conn, ["OLD-001", "NEW-001", "MID-001", "ABC-999"], status,
+                                    now=later, budget=2)
+    # 新識別碼優先且不受預算限制；到期的依發行日期較新排前面
+    assert selected == ["ABC-999", "NEW-001", "MID-001"]
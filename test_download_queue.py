@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""download_queue 的挑選與狀態轉換（python -m pytest）"""
+import download_queue
+import status_journal
+import status_model
+
+HASH_A = "a" * 40
+HASH_B = "b" * 40
+HASH_C = "c" * 40
+
+def _row(ident, btih, status="等待下載", size="10", rating="Good"):
+    row = {h: "" for h in status_journal.STATUS_HEADERS}
+    row.update({"識別碼": ident, "發行日期": "2024-01-01", "檔案大小": size, "每小時檔案大小 (GB/hr)": "5",
+                "Magnet 連結": f"magnet:?xt=urn:btih:{btih}", "狀態": status, "評級": rating})
+    return [row[h] for h in status_journal.STATUS_HEADERS]
+
+def _frame(*rows):
+    return status_model.status_frame_from_values([status_journal.STATUS_HEADERS] + list(rows))
+
+class _Qbt:
+    """add 之後要再查幾次 maindata 才會出現（模擬磁力連結非同步加入）。"""
+    def __init__(self, torrents=(), visible_after=0):
+        self.torrents = {h: {"amount_left": 0} for h in torrents}
+        self.pending = []
+        self.visible_after = visible_after
+        self.calls = 0
+
+    def maindata(self):
+        self.calls += 1
+        if self.pending and self.calls > self.visible_after:
+            self.torrents.update({h: {"amount_left": 0} for h in self.pending})
+            self.pending = []
+        return {"torrents": dict(self.torrents),
+                "server_state": {"free_space_on_disk": 10 ** 13, "dl_rate_limit": 0}}
+
+    def add(self, magnets):
+        self.pending += [m.rsplit(":", 1)[1] for m in magnets]
+        self.calls = 0
+
+def _run(monkeypatch, df, qbt, **kw):
+    recorded = []
+    monkeypatch.setattr(status_model, "load_status_frame", lambda ws, use_cache=True: df)
+    monkeypatch.setattr(status_journal, "record", lambda transitions, source, **_: recorded.extend(transitions))
+    monkeypatch.setattr(status_journal, "commit", lambda ws: None)
+    monkeypatch.setattr(download_queue.time, "sleep", lambda s: None)
+    chosen = download_queue.schedule(None, qbt, **kw)
+    return chosen, recorded
+
+def test_pick_skips_existing_and_oversized():
+    cands = [{"btih": HASH_A, "size_gb": 5.0}, {"btih": HASH_B, "size_gb": 50.0}, {"btih": HASH_C, "size_gb": 4.0}]
+    chosen, used = download_queue.pick(cands, budget=10.0, existing_hashes={HASH_A})
+    assert [c["btih"] for c in chosen] == [HASH_C]
+    assert used == 4.0
+
+def test_rank_excludes_failed_and_orders_by_rating():
+    df = _frame(_row("ABC-001", HASH_A, rating="Normal"), _row("ABC-002", HASH_B, rating="Failed"),
+                _row("ABC-003", HASH_C, rating="Excellent"))
+    assert [c["ident"] for c in download_queue.rank(df)] == ["ABC-003", "ABC-001"]
+
+def test_waiting_titles_already_in_qbittorrent_move_to_downloading(monkeypatch):
+    df = _frame(_row("ABC-001", HASH_A), _row("ABC-002", HASH_B, status="下載中"))
+    chosen, recorded = _run(monkeypatch, df, _Qbt(torrents=[HASH_A, HASH_B]))
+    assert chosen == []
+    assert recorded == [("ABC-001", "等待下載", "下載中")]
+
+def test_schedule_polls_until_added_magnets_appear(monkeypatch):
+    df = _frame(_row("ABC-001", HASH_A), _row("ABC-002", HASH_B))
+    qbt = _Qbt(visible_after=2)
+    chosen, recorded = _run(monkeypatch, df, qbt)
+    assert {c["ident"] for c in chosen} == {"ABC-001", "ABC-002"}
+    assert sorted(recorded) == [("ABC-001", "等待下載", "下載中"), ("ABC-002", "等待下載", "下載中")]
+
+def test_schedule_leaves_status_when_magnet_never_appears(monkeypatch):
+    df = _frame(_row("ABC-001", HASH_A))
+    qbt = _Qbt(visible_after=download_queue.ADD_POLL_TRIES + 1)
+    _, recorded = _run(monkeypatch, df, qbt)
+    assert recorded == []
+
+def test_dry_run_records_nothing(monkeypatch):
+    df = _frame(_row("ABC-001", HASH_A), _row("ABC-002", HASH_B))
+    chosen, recorded = _run(monkeypatch, df, _Qbt(torrents=[HASH_A]), dry_run=True)
+    assert [c["ident"] for c in chosen] == ["ABC-002"]
+    assert recorded == []
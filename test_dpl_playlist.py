@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""dpl_playlist 的合併與增量寫檔（python -m pytest）"""
+import os
+
+import dpl_playlist
+
+def test_merge_keeps_entry_state_and_counts_changes():
+    folder = os.path.join("D:", "uT")
+    old = [{"file": os.path.join(folder, "a.mp4"), "title": "a.mp4", "played": "1", "start": "1234"},
+           {"file": os.path.join(folder, "gone.mp4"), "title": "gone.mp4", "played": "0"}]
+    header = [("playname", "old.dpl"), ("topindex", "3")]
+    header, entries, added, removed = dpl_playlist.merge_playlist(
+        header, old, folder, [("b.mp4", 2), ("a.mp4", 1)], "uT.dpl")
+    assert header == [("playname", "uT.dpl"), ("topindex", "3")]
+    assert [e["title"] for e in entries] == ["b.mp4", "a.mp4"]
+    assert entries[0]["played"] == "0"
+    assert entries[1]["start"] == "1234"
+    assert (added, removed) == (1, 1)
+
+def test_merge_without_header_uses_defaults():
+    header, _, _, _ = dpl_playlist.merge_playlist([], [], "uT", [], "uT.dpl")
+    assert header == [("playname", "uT.dpl"), ("topindex", "0"), ("saveplaypos", "0")]
+
+def test_render_round_trip():
+    header = [("playname", "uT.dpl")]
+    entries = [{"file": "a.mp4", "title": "a", "played": "1"}]
+    text = dpl_playlist.render_dpl(header, entries, newline="\r\n", trailing=True)
+    assert text == "DAUMPLAYLIST\r\nplayname=uT.dpl\r\n1*file*a.mp4\r\n1*title*a\r\n1*played*1\r\n"
+    assert dpl_playlist.parse_dpl(text) == (header, entries)
+
+def _potplayer_file(path, folder, names):
+    # PotPlayer 存檔：BOM、CRLF、played 排在 title 前面
+    lines = ["DAUMPLAYLIST", "playname=uT.dpl", "topindex=0", "saveplaypos=0"]
+    for i, name in enumerate(names, start=1):
+        lines += [f"{i}*file*{os.path.join(folder, name)}", f"{i}*played*0", f"{i}*title*{name}"]
+    with open(path, "wb") as f:
+        f.write(b"\xef\xbb\xbf" + "\r\n".join(lines).encode("utf-8") + b"\r\n")
+
+def test_update_does_not_rewrite_potplayer_file(tmp_path):
+    out = str(tmp_path / "uT.dpl")
+    _potplayer_file(out, "uT", ["a.mp4"])
+    with open(out, "rb") as f:
+        before = f.read()
+    assert dpl_playlist.update_playlist("uT", out, [("a.mp4", 1)]) is False
+    with open(out, "rb") as f:
+        assert f.read() == before
+
+def test_update_keeps_crlf_and_bom_when_rewriting(tmp_path):
+    out = str(tmp_path / "uT.dpl")
+    _potplayer_file(out, "uT", ["a.mp4"])
+    assert dpl_playlist.update_playlist("uT", out, [("a.mp4", 1), ("b.mp4", 2)]) is True
+    with open(out, "rb") as f:
+        raw = f.read()
+    assert raw.startswith(b"\xef\xbb\xbf")
+    assert raw.count(b"\r\n") == raw.count(b"\n")
+    _, entries = dpl_playlist.parse_dpl(raw.decode("utf-8-sig"))
+    assert [e["title"] for e in entries] == ["a.mp4", "b.mp4"]
+
+def test_update_skips_when_fingerprint_and_mtime_unchanged(tmp_path):
+    out = str(tmp_path / "uT.dpl")
+    state = {}
+    videos = [("a.mp4", 1)]
+    assert dpl_playlist.update_playlist("uT", out, videos, state.get, state.__setitem__) is True
+    assert dpl_playlist.update_playlist("uT", out, videos, state.get, state.__setitem__) is False
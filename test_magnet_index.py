@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""magnet_index 的正規化與去重對照（python -m pytest）"""
+import base64
+
+import magnet_index
+import status_journal
+import status_model
+
+HEX = "0123456789abcdef0123456789abcdef01234567"
+
+def _frame(*rows):
+    values = [status_journal.STATUS_HEADERS]
+    for ident, magnet, status in rows:
+        row = {h: "" for h in status_journal.STATUS_HEADERS}
+        row.update({"識別碼": ident, "Magnet 連結": magnet, "狀態": status})
+        values.append([row[h] for h in status_journal.STATUS_HEADERS])
+    return status_model.status_frame_from_values(values)
+
+def test_normalize_btih_forms():
+    b32 = base64.b32encode(bytes.fromhex(HEX)).decode()
+    assert magnet_index.normalize_btih(f"magnet:?xt=urn:btih:{HEX.upper()}&dn=x") == HEX
+    assert magnet_index.normalize_btih(f"magnet:?xt=urn:btih:{b32}") == HEX
+    assert magnet_index.normalize_btih(HEX) == HEX
+    assert magnet_index.normalize_btih(b32.lower()) == HEX
+
+def test_normalize_btih_rejects_garbage():
+    for value in (None, "", "無資訊", "magnet:?xt=urn:btih:1234", HEX[:-1] + "z"):
+        assert magnet_index.normalize_btih(value) == ""
+
+def test_rmdown_hash_prefix_is_stripped():
+    assert magnet_index.rmdown_to_btih("abc" + HEX) == HEX
+
+def test_complete_register_prunes_deleted_rows():
+    conn = magnet_index.open_index(":memory:")
+    magnet_index.register(conn, magnet_index.SOURCE_T66Y, [("abc-001", HEX)])
+    lookup = magnet_index.load_lookup(conn)
+    assert magnet_index.already_queued(lookup, HEX)
+
+    # 列從 checkList_t66y 刪除後，同一個 hash 可以再被列入
+    magnet_index.register(conn, magnet_index.SOURCE_T66Y, [], complete=True)
+    assert magnet_index.already_queued(magnet_index.load_lookup(conn), HEX) is None
+
+def test_incremental_register_keeps_existing_rows():
+    conn = magnet_index.open_index(":memory:")
+    magnet_index.register(conn, magnet_index.SOURCE_T66Y, [("abc-001", HEX)])
+    magnet_index.register(conn, magnet_index.SOURCE_T66Y, [("abc-002", "b" * 40)])
+    assert len(magnet_index.load_lookup(conn)) == 2
+
+def test_sync_status_keeps_archived_titles():
+    conn = magnet_index.open_index(":memory:")
+    other = "b" * 40
+    df = _frame(("ABC-002", other, "等待下載"))
+    magnet_index.sync_status(conn, df, archived={"ABC-001": ("已閱", HEX)})
+    lookup = magnet_index.load_lookup(conn)
+    assert magnet_index.already_queued(lookup, HEX) == "Status ABC-001 為 已閱"
+    assert lookup[other]["status"] == "等待下載"
+
+def test_sync_status_keeps_rows_of_archived_titles_without_magnet():
+    conn = magnet_index.open_index(":memory:")
+    magnet_index.sync_status(conn, _frame(("ABC-001", HEX, "已閱")), archived={})
+    # 封存後 ABC-001 不在 Status，封存索引也沒記到 magnet（舊版封存）
+    magnet_index.sync_status(conn, _frame(), archived={"ABC-001": ("已閱", "")})
+    assert magnet_index.load_lookup(conn)[HEX]["status"] == "已閱"
+
+def test_sync_status_drops_titles_removed_from_status():
+    conn = magnet_index.open_index(":memory:")
+    magnet_index.sync_status(conn, _frame(("ABC-001", HEX, "已閱")), archived={})
+    magnet_index.sync_status(conn, _frame(), archived={})
+    assert magnet_index.load_lookup(conn) == {}
+
+def test_remember_makes_hashes_queued_this_run_visible():
+    lookup = {}
+    magnet = f"magnet:?xt=urn:btih:{HEX}"
+    magnet_index.remember(lookup, "ABC-001", magnet, "尚無 4K 資源")
+    assert magnet_index.already_queued(lookup, magnet) is None
+    magnet_index.remember(lookup, "ABC-001", magnet, "等待下載")
+    assert magnet_index.already_queued(lookup, magnet.upper()) == "Status ABC-001 為 等待下載"
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""media_dedup 的分組、雜湊快取與硬連結判斷（python -m pytest）"""
+import os
+
+import pytest
+
+import media_dedup
+import media_library
+
+SIZE = 100
+
+@pytest.fixture(autouse=True)
+def small_samples(monkeypatch):
+    # 100 位元組的檔案抽樣 0、50、96 三個位置各 4 位元組，其餘部分只有完整雜湊會讀到
+    monkeypatch.setattr(media_dedup, "MIN_SIZE", 1)
+    monkeypatch.setattr(media_dedup, "SAMPLE_BYTES", 4)
+    monkeypatch.setattr(media_dedup, "SAMPLE_STRIDE", 1)
+
+def _write(root, name, data):
+    path = os.path.join(root, name)
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+def _files(conn, root):
+    media_library.refresh(conn, [root])
+    return media_library.list_files(conn, root)
+
+def _names(groups):
+    return sorted(sorted(f["name"] for f in g) for g in groups)
+
+def _hashes(conn):
+    return {os.path.basename(p): (s, h) for p, s, h in conn.execute("SELECT path, sample, full FROM hashes")}
+
+def test_groups_by_size_then_sample_then_full_hash(tmp_path):
+    root = str(tmp_path)
+    base = bytes(range(SIZE))
+    _write(root, "a.mp4", base)
+    _write(root, "a_duplicated_1.mp4", base)
+    # 只在抽樣區塊以外不同：抽樣雜湊相同，完整雜湊不同
+    _write(root, "b.mp4", base[:20] + b"\xff" + base[21:])
+    # 抽樣區塊不同：不需要讀完整檔案
+    _write(root, "c.mp4", b"\xff" + base[1:])
+    # 大小不同：不需要計算任何雜湊
+    _write(root, "d.mp4", base + b"\x00")
+    conn = media_library.open_library(":memory:")
+
+    groups = media_dedup.find_duplicates(conn, _files(conn, root))
+    assert _names(groups) == [["a.mp4", "a_duplicated_1.mp4"]]
+    hashes = _hashes(conn)
+    assert "d.mp4" not in hashes
+    assert hashes["c.mp4"][0] and hashes["c.mp4"][1] is None
+    assert hashes["b.mp4"][1] and hashes["b.mp4"][1] != hashes["a.mp4"][1]
+
+def test_cached_hashes_are_reused_until_size_or_mtime_changes(tmp_path, monkeypatch):
+    root = str(tmp_path)
+    base = bytes(range(SIZE))
+    _write(root, "a.mp4", base)
+    b = _write(root, "b.mp4", base)
+    conn = media_library.open_library(":memory:")
+    assert len(media_dedup.find_duplicates(conn, _files(conn, root))) == 1
+
+    calls = []
+    real_sample, real_full = media_dedup.sample_hash, media_dedup.full_hash
+    monkeypatch.setattr(media_dedup, "sample_hash", lambda p, s: calls.append(("sample", p)) or real_sample(p, s))
+    monkeypatch.setattr(media_dedup, "full_hash", lambda p: calls.append(("full", p)) or real_full(p))
+    assert len(media_dedup.find_duplicates(conn, _files(conn, root))) == 1
+    assert calls == []
+
+    # 就地修改內容（大小相同、mtime 不同，以 touch_file 更新索引）：只重算這個檔案
+    _write(root, "b.mp4", b"\xff" + base[1:])
+    st = os.stat(b)
+    os.utime(b, ns=(st.st_atime_ns, st.st_mtime_ns + 10_000_000_000))
+    media_library.touch_file(conn, b)
+    assert media_dedup.find_duplicates(conn, _files(conn, root)) == []
+    assert calls == [("sample", b)]
+
+def test_hard_links_are_not_duplicates(tmp_path):
+    root = str(tmp_path)
+    a = _write(root, "a.mp4", bytes(range(SIZE)))
+    os.link(a, os.path.join(root, "a_link.mp4"))
+    conn = media_library.open_library(":memory:")
+    assert media_dedup.find_duplicates(conn, _files(conn, root)) == []
+
+    _write(root, "b.mp4", bytes(range(SIZE)))
+    groups = media_dedup.find_duplicates(conn, _files(conn, root))
+    # 兩個硬連結只算一份
+    assert len(groups) == 1 and len(groups[0]) == 2
+    assert "b.mp4" in [f["name"] for f in groups[0]]
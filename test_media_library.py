@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""media_library 的索引更新（python -m pytest）"""
+import os
+
+import media_library
+
+def _touch(path, data=b"x"):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+def _names(conn, root, recursive=True):
+    return [os.path.relpath(f["path"], root) for f in media_library.list_files(conn, root, recursive=recursive)]
+
+def test_recursive_refresh_after_non_recursive_scans_subdirs(tmp_path):
+    root = str(tmp_path / "uT")
+    _touch(os.path.join(root, "a.mp4"))
+    _touch(os.path.join(root, "sub", "b.mp4"))
+    conn = media_library.open_library(":memory:")
+
+    media_library.refresh(conn, [root], recursive=False)
+    assert _names(conn, root) == ["a.mp4"]
+
+    media_library.refresh(conn, [root], recursive=True)
+    assert _names(conn, root) == ["a.mp4", os.path.join("sub", "b.mp4")]
+
+def test_unchanged_dirs_are_reused(tmp_path, capsys):
+    root = str(tmp_path / "uT")
+    _touch(os.path.join(root, "sub", "b.mp4"))
+    conn = media_library.open_library(":memory:")
+    media_library.refresh(conn, [root])
+    capsys.readouterr()
+
+    media_library.refresh(conn, [root])
+    assert "重新掃描 0 個資料夾，沿用 2 個" in capsys.readouterr().out
+
+def test_removed_subdir_is_forgotten(tmp_path):
+    root = str(tmp_path / "uT")
+    _touch(os.path.join(root, "sub", "b.mp4"))
+    conn = media_library.open_library(":memory:")
+    media_library.refresh(conn, [root])
+
+    os.remove(os.path.join(root, "sub", "b.mp4"))
+    os.rmdir(os.path.join(root, "sub"))
+    media_library.refresh(conn, [root])
+    assert _names(conn, root) == []
+    assert conn.execute("SELECT COUNT(*) FROM dirs").fetchone()[0] == 1
+
+def test_legacy_index_is_rescanned_once(tmp_path):
+    db = str(tmp_path / "media_library.db")
+    root = str(tmp_path / "uT")
+    _touch(os.path.join(root, "sub", "b.mp4"))
+    conn = media_library.open_library(db)
+    media_library.refresh(conn, [root], recursive=False)
+    # 模擬舊版索引：只有根目錄，沒有子資料夾
+    conn.execute("DELETE FROM dirs WHERE parent IS NOT NULL AND path != ?", (os.path.abspath(root),))
+    conn.execute("DELETE FROM meta WHERE key = 'dirs_schema'")
+    conn.commit()
+    conn.close()
+
+    conn = media_library.open_library(db)
+    media_library.refresh(conn, [root])
+    assert _names(conn, root) == [os.path.join("sub", "b.mp4")]
+
+def test_unreadable_subdir_is_skipped(tmp_path, monkeypatch, capsys):
+    root = str(tmp_path / "uT")
+    _touch(os.path.join(root, "a.mp4"))
+    _touch(os.path.join(root, "locked", "b.mp4"))
+    locked = os.path.abspath(os.path.join(root, "locked"))
+    real_scandir = os.scandir
+
+    def scandir(path):
+        if os.path.abspath(path) == locked:
+            raise PermissionError(13, "Permission denied", path)
+        return real_scandir(path)
+    monkeypatch.setattr(media_library.os, "scandir", scandir)
+    conn = media_library.open_library(":memory:")
+
+    media_library.refresh(conn, [root])
+    assert "無法讀取資料夾" in capsys.readouterr().out
+    assert _names(conn, root) == ["a.mp4"]
+    # 沒有記下 mtime：權限恢復後下一次 refresh 會重新掃描
+    monkeypatch.setattr(media_library.os, "scandir", real_scandir)
+    media_library.refresh(conn, [root])
+    assert _names(conn, root) == ["a.mp4", os.path.join("locked", "b.mp4")]
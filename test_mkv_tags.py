@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""mkv_tags 的就地改寫，以合成的 MKV 測試（python -m pytest）"""
+import zlib
+
+import ebml
+import mkv_tags
+
+TAGS = {"Artist": "演員 A", "Comment": "https://example.invalid/ABC-001"}
+
+# -----------------------------
+# 合成 MKV：EBML 標頭 + Segment（SeekHead、elements、Cluster）；Segment 長度欄位固定 8 位元組
+# -----------------------------
+def _seek(eid, pos):
+    return ebml.element(ebml.SEEK, ebml.element(ebml.SEEK_ID, ebml.encode_id(eid))
+                        + ebml.element(ebml.SEEK_POSITION, pos.to_bytes(4, "big")))
+
+def _seek_head(entries, crc):
+    body = b"".join(_seek(eid, pos) for eid, pos in entries)
+    if crc:
+        body = ebml.element(ebml.CRC32, ebml.crc32(body)) + body
+    return ebml.element(ebml.SEEK_HEAD, body)
+
+def _mkv(elements, seek_ids, crc=True, unknown_cluster=False):
+    head_len = len(_seek_head([(eid, 0) for eid in seek_ids], crc))
+    offsets, pos = {}, head_len
+    for data in elements:
+        offsets.setdefault(ebml.read_header(data, 0)[0], pos)
+        pos += len(data)
+    body = _seek_head([(eid, offsets[eid]) for eid in seek_ids], crc) + b"".join(elements)
+    if unknown_cluster:
+        body += ebml.encode_id(ebml.CLUSTER) + b"\x01\xff\xff\xff\xff\xff\xff\xff" + b"\x00" * 16
+    else:
+        body += ebml.element(ebml.CLUSTER, b"\x00" * 16)
+    segment = ebml.encode_id(ebml.SEGMENT) + ebml.encode_size(len(body), 8) + body
+    return ebml.element(ebml.EBML, ebml.element(0x4282, "matroska")) + segment
+
+def _info():
+    return ebml.element(ebml.INFO, ebml.element(ebml.TIMECODE_SCALE, 1_000_000))
+
+def _tracks():
+    return ebml.element(ebml.TRACKS, ebml.element(ebml.TRACK_ENTRY, ebml.element(ebml.TRACK_TYPE, 1)))
+
+def _tags(simple):
+    return ebml.element(ebml.TAGS, mkv_tags.build_tags(simple))
+
+def _layout(data):
+    """Segment 頂層 element ID 依序排列；同時確認長度剛好接到 Segment 結尾。"""
+    seg_data, seg_end = ebml.open_segment(data, len(data))[:2]
+    children, complete = mkv_tags._top_level(data, seg_data, seg_end)
+    assert complete
+    return [eid for eid, _, _ in children], seg_data
+
+def _seek_head_crc_ok(data):
+    seg_data, seg_end = ebml.open_segment(data, len(data))[:2]
+    _, hdata, hsize = ebml.find_child(data, seg_data, seg_end, ebml.SEEK_HEAD)
+    crc_pos, body_start = ebml.split_crc(data, hdata, hsize)
+    return data[crc_pos:crc_pos + 4] == zlib.crc32(data[body_start:hdata + hsize]).to_bytes(4, "little")
+
+def test_rewrites_existing_tags_in_place(tmp_path):
+    path = tmp_path / "a.mkv"
+    original = _mkv([_info(), _tags({"Artist": "舊的演員名稱" * 8}), ebml.void(64), _tracks()],
+                    [ebml.INFO, ebml.TAGS, ebml.TRACKS])
+    path.write_bytes(original)
+
+    assert mkv_tags.write_tags(str(path), TAGS) is True
+    data = path.read_bytes()
+    assert len(data) == len(original)
+    assert mkv_tags.read_tags(str(path)) == TAGS
+    ids, seg_data = _layout(data)
+    assert ids == [ebml.SEEK_HEAD, ebml.INFO, ebml.TAGS, ebml.VOID, ebml.TRACKS, ebml.CLUSTER]
+    # SeekHead 沒有改動，各 element 的位置也沒變
+    after, before = (ebml.seek_positions(d, seg_data, len(d)) for d in (data, original))
+    assert all(after[eid] == before[eid] for eid in (ebml.INFO, ebml.TAGS, ebml.TRACKS))
+
+def test_reuses_void_after_seek_head_and_recomputes_crc(tmp_path):
+    path = tmp_path / "a.mkv"
+    original = _mkv([ebml.void(256), _info(), _tracks()], [ebml.INFO, ebml.TRACKS])
+    path.write_bytes(original)
+
+    assert mkv_tags.write_tags(str(path), TAGS) is True
+    data = path.read_bytes()
+    assert len(data) == len(original)
+    assert mkv_tags.read_tags(str(path)) == TAGS
+    ids, seg_data = _layout(data)
+    assert ids == [ebml.SEEK_HEAD, ebml.TAGS, ebml.VOID, ebml.INFO, ebml.TRACKS, ebml.CLUSTER]
+    positions = ebml.seek_positions(data, seg_data, len(data))
+    assert ebml.read_header(data, positions[ebml.TAGS])[0] == ebml.TAGS
+    assert ebml.read_header(data, positions[ebml.INFO])[0] == ebml.INFO
+    assert _seek_head_crc_ok(data)
+
+def test_moving_tags_patches_seek_position_and_crc(tmp_path):
+    path = tmp_path / "a.mkv"
+    original = _mkv([_info(), ebml.void(512), _tags({"Artist": "A"}), _tracks()],
+                    [ebml.INFO, ebml.TAGS, ebml.TRACKS])
+    path.write_bytes(original)
+
+    assert mkv_tags.write_tags(str(path), TAGS) is True
+    data = path.read_bytes()
+    assert mkv_tags.read_tags(str(path)) == TAGS
+    ids, seg_data = _layout(data)
+    assert ids == [ebml.SEEK_HEAD, ebml.INFO, ebml.TAGS, ebml.VOID, ebml.VOID, ebml.TRACKS, ebml.CLUSTER]
+    positions = ebml.seek_positions(data, seg_data, len(data))
+    assert ebml.read_header(data, positions[ebml.TAGS])[0] == ebml.TAGS
+    assert _seek_head_crc_ok(data)
+
+def test_returns_false_without_tags_or_void(tmp_path):
+    path = tmp_path / "a.mkv"
+    # Cluster 長度未知：無法確認 Segment 結尾，也沒有 Tags / Void 可用 → 交給 mkvpropedit
+    original = _mkv([_info(), _tracks()], [ebml.INFO, ebml.TRACKS], unknown_cluster=True)
+    path.write_bytes(original)
+
+    assert mkv_tags.write_tags(str(path), TAGS) is False
+    assert path.read_bytes() == original
+
+def test_unchanged_tags_are_not_rewritten(tmp_path):
+    path = tmp_path / "a.mkv"
+    path.write_bytes(_mkv([_info(), _tags(TAGS), _tracks()], [ebml.INFO, ebml.TRACKS]))
+    before = path.stat().st_mtime_ns
+    assert mkv_tags.write_tags(str(path), TAGS) is True
+    assert path.stat().st_mtime_ns == before
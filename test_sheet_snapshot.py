@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""sheet_snapshot 的 modifiedTime 查詢與本機快照（python -m pytest）"""
+import pytest
+
+import sheet_snapshot
+
+class _Resp:
+    def __init__(self, data):
+        self.data = data
+
+    def json(self):
+        return self.data
+
+class _Client:
+    def __init__(self):
+        self.mtime = "2026-01-01T00:00:00.000Z"
+        self.drive_calls = 0
+
+    def request(self, method, url, params=None):
+        self.drive_calls += 1
+        return _Resp({"modifiedTime": self.mtime})
+
+class _Spreadsheet:
+    id = "sheet-id"
+
+    def __init__(self):
+        self.client = _Client()
+
+class _Worksheet:
+    row_count, col_count = 100, 10
+
+    def __init__(self, ss, title, values):
+        self.spreadsheet, self.title, self.values = ss, title, values
+        self.reads = 0
+
+    def get_all_values(self):
+        self.reads += 1
+        return self.values
+
+@pytest.fixture(autouse=True)
+def snapshot_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(sheet_snapshot, "SNAPSHOT_DIR", str(tmp_path))
+    monkeypatch.setattr(sheet_snapshot, "_mtimes", {})
+
+def test_modified_time_is_checked_once_per_run():
+    ss = _Spreadsheet()
+    status, rating = _Worksheet(ss, "Status", [["識別碼"]]), _Worksheet(ss, "Rating", [["演員"]])
+    sheet_snapshot.get_all_values(status)
+    sheet_snapshot.get_all_values(rating)
+    sheet_snapshot.get_all_values(status)
+    assert ss.client.drive_calls == 1
+    assert (status.reads, rating.reads) == (1, 1)
+
+def test_given_mtime_skips_the_drive_call():
+    ss = _Spreadsheet()
+    ws = _Worksheet(ss, "Status", [["識別碼"]])
+    assert sheet_snapshot.get_all_values(ws, mtime="2026-01-01T00:00:00.000Z") == [["識別碼"]]
+    assert ss.client.drive_calls == 0
+
+def test_writes_invalidate_the_cached_modified_time():
+    ss = _Spreadsheet()
+    ws = _Worksheet(ss, "Status", [["識別碼"]])
+    sheet_snapshot.get_all_values(ws)
+    ws.values = [["識別碼"], ["ABC-001"]]
+    ss.client.mtime = "2026-01-02T00:00:00.000Z"
+    # 沒有經過 google_client 的寫入時沿用這次執行的值與快照
+    assert sheet_snapshot.get_all_values(ws) == [["識別碼"]]
+    sheet_snapshot.invalidate()
+    assert sheet_snapshot.get_all_values(ws) == [["識別碼"], ["ABC-001"]]
+    assert ss.client.drive_calls == 2
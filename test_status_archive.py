@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""status_archive 的封存條件與演員統計（python -m pytest）"""
+from datetime import datetime, timedelta
+
+import status_archive
+import status_journal
+import status_model
+
+NOW = datetime(2026, 10, 1, 12, 0, 0)
+
+def _frame(*rows):
+    values = [status_journal.STATUS_HEADERS]
+    for ident, release, status in rows:
+        row = {h: "" for h in status_journal.STATUS_HEADERS}
+        row.update({"識別碼": ident, "發行日期": release, "演員": "A", "狀態": status})
+        values.append([row[h] for h in status_journal.STATUS_HEADERS])
+    return status_model.status_frame_from_values(values)
+
+def test_age_is_measured_from_status_change_not_release():
+    df = _frame(("OLD-001", "2020-01-01", "已閱"), ("OLD-002", "2020-01-01", "已閱"),
+                ("NEW-001", "2026-01-01", "跳過"), ("WIP-001", "2020-01-01", "下載中"))
+    history = status_journal.open_history(":memory:")
+    long_ago = (NOW - timedelta(days=400)).isoformat()
+    status_journal.remember(history, {("OLD-001", "狀態"): ("已閱", (NOW - timedelta(days=1)).isoformat()),
+                                      ("NEW-001", "狀態"): ("跳過", long_ago)})
+    since = status_archive.terminal_since(df, history, now=NOW)
+    targets = status_archive.select_archivable(df, since, max_age_days=365, today=NOW)
+    # 發行很久但昨天才讀完的不封存；沒有歷史的從現在開始算
+    assert list(targets.index) == ["NEW-001"]
+    assert since["OLD-002"] == NOW
+    assert "WIP-001" not in since
+
+def test_unknown_terminal_rows_are_seeded_once():
+    df = _frame(("OLD-001", "2020-01-01", "已閱"))
+    history = status_journal.open_history(":memory:")
+    status_archive.terminal_since(df, history, now=NOW - timedelta(days=400))
+    since = status_archive.terminal_since(df, history, now=NOW)
+    assert since["OLD-001"] == NOW - timedelta(days=400)
+
+def test_status_changed_since_history_restarts_the_clock():
+    df = _frame(("OLD-001", "2020-01-01", "跳過"))
+    history = status_journal.open_history(":memory:")
+    status_journal.remember(history, {("OLD-001", "狀態"): ("已閱", (NOW - timedelta(days=400)).isoformat())})
+    assert status_archive.terminal_since(df, history, now=NOW)["OLD-001"] == NOW
+
+def test_actor_counts_skip_rows_still_in_status():
+    conn = status_archive.open_index(":memory:")
+    conn.executemany("INSERT INTO archived (ident, status, actor) VALUES (?, ?, ?)",
+                     [("ABC-001", "已閱", "A"), ("ABC-002", "跳過", "A"), ("ABC-003", "已閱", "B"),
+                      ("ABC-004", "已閱", "")])
+    assert status_archive.actor_counts(conn) == [("A", 2, 1), ("B", 1, 1)]
+    assert status_archive.actor_counts(conn, exclude={"ABC-003"}) == [("A", 2, 1)]
+
+def test_rating_formulas_add_archived_counts():
+    total = status_archive.rating_total_formula(5)
+    assert total.startswith('=COUNTIFS(Status!$G:$G,$A5,Status!$O:$O,"<>")+')
+    assert f"VLOOKUP($A5,{status_archive.ARCHIVE_COUNTS_TAB}!$A:$C,2,0)" in total
+    assert f"VLOOKUP($A5,{status_archive.ARCHIVE_COUNTS_TAB}!$A:$C,3,0)" in status_archive.rating_read_formula(5)
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""status_journal 的記錄、合併與變更歷史（python -m pytest）"""
+import status_journal
+
+def _entry(ts, ident, expected, new, column="狀態"):
+    return {"ts": ts, "seq": 0, "source": "test", "ident": ident, "column": column,
+            "expected": expected, "new": new}
+
+def test_coalesce_applies_chained_transitions_in_order():
+    entries = [_entry("2026-01-01", "ABC-001", "下載中", "下載完成"),
+               _entry("2026-01-02", "ABC-001", "下載完成", "已閱")]
+    changed, conflicts = status_journal.coalesce(entries, {("ABC-001", "狀態"): "下載中"})
+    assert changed == {("ABC-001", "狀態"): "已閱"}
+    assert conflicts == []
+
+def test_coalesce_skips_transitions_already_applied():
+    entries = [_entry("2026-01-01", "ABC-001", "等待下載", "下載中")]
+    changed, conflicts = status_journal.coalesce(entries, {("ABC-001", "狀態"): "下載中"})
+    assert changed == {} and conflicts == []
+
+def test_coalesce_reports_stale_expectations_and_missing_identifiers():
+    stale = _entry("2026-01-01", "ABC-001", "等待下載", "下載中")
+    missing = _entry("2026-01-01", "ABC-404", "等待下載", "下載中")
+    changed, conflicts = status_journal.coalesce([stale, missing], {("ABC-001", "狀態"): "已閱"})
+    assert changed == {}
+    assert conflicts == [(stale, "已閱"), (missing, None)]
+
+def test_coalesce_drops_round_trips():
+    entries = [_entry("2026-01-01", "ABC-001", "下載完成", "已閱"),
+               _entry("2026-01-02", "ABC-001", "已閱", "下載完成")]
+    changed, _ = status_journal.coalesce(entries, {("ABC-001", "狀態"): "下載完成"})
+    assert changed == {}
+
+def test_record_appends_upper_cased_entries(tmp_path):
+    path = str(tmp_path / "status_journal.jsonl")
+    assert status_journal.record([("abc-001 ", "下載中", "下載完成")], source="test", path=path) == 1
+    entries = status_journal._read_entries([path])
+    assert [(e["ident"], e["expected"], e["new"]) for e in entries] == [("ABC-001", "下載中", "下載完成")]
+
+def test_change_times_use_the_entry_that_set_the_final_value():
+    entries = [_entry("2026-01-01T00:00:00", "ABC-001", "下載中", "下載完成"),
+               _entry("2026-01-02T00:00:00", "ABC-001", "下載完成", "已閱"),
+               _entry("2026-01-03T00:00:00", "ABC-002", "等待下載", "下載中")]
+    changed = {("ABC-001", "狀態"): "已閱"}
+    assert status_journal.change_times(entries, changed) == {("ABC-001", "狀態"): ("已閱", "2026-01-02T00:00:00")}
+
+def test_history_keeps_latest_change_per_cell():
+    conn = status_journal.open_history(":memory:")
+    status_journal.remember(conn, {("ABC-001", "狀態"): ("下載完成", "2026-01-01T00:00:00")})
+    status_journal.remember(conn, {("ABC-001", "狀態"): ("已閱", "2026-01-02T00:00:00"),
+                                   ("ABC-001", "tag"): ("4k60fps", "2026-01-02T00:00:00")})
+    assert status_journal.last_changes(conn) == {"ABC-001": ("已閱", "2026-01-02T00:00:00")}
+    assert status_journal.last_changes(conn, column="tag") == {"ABC-001": ("4k60fps", "2026-01-02T00:00:00")}
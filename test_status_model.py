@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""status_model 的欄式模型（python -m pytest）"""
+import status_journal
+import status_model
+
+def _values(*rows):
+    out = [status_journal.STATUS_HEADERS]
+    for ident, status in rows:
+        row = {h: "" for h in status_journal.STATUS_HEADERS}
+        row.update({"識別碼": ident, "發行日期": "2024-01-01", "演員": "A", "狀態": status})
+        out.append([row[h] for h in status_journal.STATUS_HEADERS])
+    return out
+
+def test_index_is_upper_cased_and_first_duplicate_wins():
+    df = status_model.status_frame_from_values(_values(("abc-001 ", "已閱"), ("ABC-001", "跳過")))
+    assert list(df.index) == ["ABC-001"]
+    assert str(df.at["ABC-001", "狀態"]) == "已閱"
+    assert int(df.at["ABC-001", "row"]) == 2
+
+def test_digest_ag_matches_the_upper_cased_value_written_back():
+    df = status_model.status_frame_from_values(_values(("abc-001", "已閱")))
+    written = ["ABC-001", "2024-01-01", "", "", "", "", "A"]
+    assert status_model.row_digest([status_model.sheet_text(x) for x in written]) == df.at["ABC-001", "digest_ag"]
+
+def test_select_combines_filters():
+    df = status_model.status_frame_from_values(_values(("ABC-001", "已閱"), ("ABC-002", "等待下載")))
+    assert list(status_model.select(df, status_not_in=status_model.TERMINAL_STATES).index) == ["ABC-002"]
+    assert list(status_model.select(df, actor_in={"A"}, ident_not_in={"ABC-002"}).index) == ["ABC-001"]
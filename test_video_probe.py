@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""video_probe 與 ebml 的標頭解析，以合成的 MP4 / MKV 標頭測試（python -m pytest）"""
+import struct
+
+import pytest
+
+import ebml
+import video_probe
+
+# -----------------------------
+# 合成 MP4：moov / mvhd / trak / mdia（mdhd、hdlr、minf/stbl/stsd、stts）
+# -----------------------------
+def _box(btype, payload):
+    return struct.pack(">I4s", 8 + len(payload), btype) + payload
+
+def _time_header(timescale, duration):
+    return struct.pack(">IIIII", 0, 0, 0, timescale, duration) + b"\x00" * 8
+
+def _mp4(width, height, timescale, stts_entries, codec=b"hvc1"):
+    duration = sum(n * delta for n, delta in stts_entries)
+    entry = _box(codec, b"\x00" * 24 + struct.pack(">HH", width, height) + b"\x00" * 50)
+    stsd = _box(b"stsd", struct.pack(">II", 0, 1) + entry)
+    stts = _box(b"stts", struct.pack(">II", 0, len(stts_entries))
+                + b"".join(struct.pack(">II", n, delta) for n, delta in stts_entries))
+    mdia = _box(b"mdia", _box(b"mdhd", _time_header(timescale, duration))
+                + _box(b"hdlr", struct.pack(">II4s", 0, 0, b"vide") + b"\x00" * 12)
+                + _box(b"minf", _box(b"stbl", stsd + stts)))
+    moov = _box(b"moov", _box(b"mvhd", _time_header(1000, duration * 1000 // timescale)) + _box(b"trak", mdia))
+    return _box(b"ftyp", b"isom\x00\x00\x00\x00") + moov + _box(b"mdat", b"\x00" * 64)
+
+def test_mp4_reads_resolution_codec_and_fps(tmp_path):
+    path = tmp_path / "a.mp4"
+    path.write_bytes(_mp4(3840, 2160, 60000, [(600, 1000)]))
+    info = video_probe.probe(str(path))
+    assert (info["width"], info["height"], info["codec"], info["fps"]) == (3840, 2160, "hvc1", 60.0)
+    assert info["duration"] == 10.0
+    assert video_probe.is_4k60(info)
+
+def test_mp4_fps_counts_every_stts_entry(tmp_path):
+    # 每個 sample 一筆 stts（VFR 常見），超過 4096 筆也要全部算進去
+    path = tmp_path / "vfr.mp4"
+    path.write_bytes(_mp4(3840, 2160, 60000, [(1, 1000)] * 6000))
+    info = video_probe.probe(str(path))
+    assert info["fps"] == 60.0
+    assert video_probe.is_4k60(info)
+
+# -----------------------------
+# 合成 MKV：EBML 標頭 + Segment（SeekHead、Info、Tracks）
+# -----------------------------
+def _mkv(width, height, default_duration, with_seek_head=True):
+    info = ebml.element(ebml.INFO, ebml.element(ebml.TIMECODE_SCALE, 1_000_000)
+                        + ebml.element(ebml.DURATION, struct.pack(">d", 12_000.0)))
+    video = ebml.element(ebml.VIDEO, ebml.element(ebml.PIXEL_WIDTH, width) + ebml.element(ebml.PIXEL_HEIGHT, height))
+    tracks = ebml.element(ebml.TRACKS, ebml.element(ebml.TRACK_ENTRY, ebml.element(ebml.TRACK_TYPE, 1)
+                          + ebml.element(ebml.CODEC_ID, "V_MPEGH/ISO/HEVC")
+                          + ebml.element(ebml.DEFAULT_DURATION, default_duration) + video))
+    body = info + tracks
+    if with_seek_head:
+        # SeekHead 固定長度：兩個 Seek，位置以 4 位元組編碼
+        def seek(eid, pos):
+            return ebml.element(ebml.SEEK, ebml.element(ebml.SEEK_ID, ebml.encode_id(eid))
+                                + ebml.element(ebml.SEEK_POSITION, pos.to_bytes(4, "big")))
+        head_len = len(ebml.element(ebml.SEEK_HEAD, seek(ebml.INFO, 0) + seek(ebml.TRACKS, 0)))
+        head = ebml.element(ebml.SEEK_HEAD, seek(ebml.INFO, head_len) + seek(ebml.TRACKS, head_len + len(info)))
+        body = head + body
+    cluster = ebml.element(ebml.CLUSTER, b"\x00" * 32)
+    return (ebml.element(ebml.EBML, ebml.element(0x4282, "matroska"))
+            + ebml.element(ebml.SEGMENT, body + cluster))
+
+@pytest.mark.parametrize("with_seek_head", [True, False])
+def test_mkv_reads_tracks_and_duration(tmp_path, with_seek_head):
+    path = tmp_path / "a.mkv"
+    path.write_bytes(_mkv(3840, 2160, 16_666_667, with_seek_head))
+    info = video_probe.probe(str(path))
+    assert (info["width"], info["height"], info["codec"]) == (3840, 2160, "V_MPEGH/ISO/HEVC")
+    assert info["fps"] == 60.0 and info["duration"] == 12.0
+    assert video_probe.is_4k60(info)
+
+def test_mkv_30fps_is_not_4k60(tmp_path):
+    path = tmp_path / "a.mkv"
+    path.write_bytes(_mkv(3840, 2160, 33_333_333))
+    assert video_probe.is_4k60(video_probe.probe(str(path))) is False
+
+def test_non_matroska_and_truncated_headers_return_none(tmp_path):
+    path = tmp_path / "bad.mkv"
+    path.write_bytes(b"\x00" * 64)
+    assert video_probe.probe(str(path)) is None
+    path = tmp_path / "bad.mp4"
+    path.write_bytes(_box(b"ftyp", b"isom"))
+    assert video_probe.probe(str(path)) is None
+
+# -----------------------------
+# ebml：長度編碼與 Void 補位
+# -----------------------------
+@pytest.mark.parametrize("n", [0, 1, 126, 127, 16382, 16383, 1 << 20])
+def test_size_round_trips(n):
+    encoded = ebml.encode_size(n)
+    assert ebml.read_size(encoded, 0) == (n, len(encoded))
+
+def test_all_ones_size_is_unknown():
+    assert ebml.read_size(b"\x01\xff\xff\xff\xff\xff\xff\xff", 0) == (ebml.UNKNOWN_SIZE, 8)
+
+@pytest.mark.parametrize("n", [2, 3, 128, 129, 130, 20000])
+def test_void_has_exact_length(n):
+    data = ebml.void(n)
+    eid, size, start = ebml.read_header(data, 0)
+    assert len(data) == n and eid == ebml.VOID and start + size == n
+
+def test_fit_absorbs_a_single_spare_byte_in_the_size_field():
+    payload = b"x" * 10
+    data = ebml.fit(ebml.TAGS, payload, len(ebml.element(ebml.TAGS, payload)) + 1)
+    eid, size, start = ebml.read_header(data, 0)
+    assert (eid, size, len(data)) == (ebml.TAGS, 10, start + 10)
+    assert ebml.fit(ebml.TAGS, payload, 5) is None
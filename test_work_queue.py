@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""work_queue 的租約、回報與重試（python -m pytest）"""
+import work_queue
+
+KIND = work_queue.KIND_MGLINKS
+
+def _queue(tmp_path, keys=("ABC-001", "ABC-002", "ABC-003")):
+    conn = work_queue.open_queue(str(tmp_path / "work_queue.db"))
+    work_queue.enqueue(conn, KIND, [(key, None) for key in keys])
+    return conn
+
+def _state(conn, key):
+    return conn.execute("SELECT state, attempts FROM tasks WHERE kind = ? AND key = ?", (KIND, key)).fetchone()
+
+def test_lease_never_hands_out_the_same_task_twice(tmp_path):
+    conn = _queue(tmp_path)
+    # 第二個 worker 用另一條連線，等同另一台機器
+    other = work_queue.open_queue(str(tmp_path / "work_queue.db"))
+    first = work_queue.lease(conn, KIND, "a", n=2)
+    second = work_queue.lease(other, KIND, "b", n=2)
+    assert [k for k, _ in first] == ["ABC-001", "ABC-002"]
+    assert [k for k, _ in second] == ["ABC-003"]
+    assert work_queue.lease(conn, KIND, "c") == []
+
+def test_expired_lease_is_taken_over_and_first_result_wins(tmp_path):
+    conn = _queue(tmp_path, ["ABC-001"])
+    assert work_queue.lease(conn, KIND, "a", ttl=-1) == [("ABC-001", None)]
+    assert work_queue.lease(conn, KIND, "b") == [("ABC-001", None)]
+    assert _state(conn, "ABC-001") == ("leased", 2)
+
+    assert work_queue.complete(conn, KIND, "ABC-001", [["b"]]) is True
+    assert work_queue.complete(conn, KIND, "ABC-001", [["a"]]) is False
+    results, _ = work_queue.take_results(conn, KIND)
+    assert results == [("ABC-001", [["b"]])]
+
+def test_fail_requeues_until_max_attempts(tmp_path):
+    conn = _queue(tmp_path, ["ABC-001"])
+    for attempt in range(1, work_queue.MAX_ATTEMPTS + 1):
+        assert work_queue.lease(conn, KIND, "a") == [("ABC-001", None)]
+        work_queue.fail(conn, KIND, "ABC-001", RuntimeError("timeout"))
+        expected = "failed" if attempt == work_queue.MAX_ATTEMPTS else "pending"
+        assert _state(conn, "ABC-001") == (expected, attempt)
+    assert work_queue.lease(conn, KIND, "a") == []
+    assert work_queue.drained(conn, KIND)
+
+def test_expired_lease_after_max_attempts_is_marked_failed(tmp_path):
+    conn = _queue(tmp_path, ["ABC-001"])
+    for _ in range(work_queue.MAX_ATTEMPTS):
+        assert work_queue.lease(conn, KIND, "a", ttl=-1) == [("ABC-001", None)]
+    assert work_queue.lease(conn, KIND, "b") == []
+    assert _state(conn, "ABC-001") == ("failed", work_queue.MAX_ATTEMPTS)
+
+def test_enqueue_requeues_merged_but_not_in_progress_tasks(tmp_path):
+    conn = _queue(tmp_path, ["ABC-001", "ABC-002"])
+    work_queue.lease(conn, KIND, "a", n=1)
+    work_queue.lease(conn, KIND, "a", n=1)
+    work_queue.complete(conn, KIND, "ABC-002", [])
+    _, mark_merged = work_queue.take_results(conn, KIND)
+    mark_merged()
+    assert work_queue.enqueue(conn, KIND, [("ABC-001", None), ("ABC-002", None)]) == 1
+    assert _state(conn, "ABC-001") == ("leased", 1)
+    assert _state(conn, "ABC-002") == ("pending", 0)
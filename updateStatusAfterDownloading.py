@@ -6,22 +6,36 @@ import subprocess
 import pywintypes  # type: ignore
 import win32file   # type: ignore
 import win32con    # type: ignore
-import gspread
 import datetime
 from datetime import datetime
-from gspread.cell import Cell
-from oauth2client.service_account import ServiceAccountCredentials
 from mutagen.mp4 import MP4, MP4Tags
 
+import google_client
+import media_dedup
+import media_library
+import mkv_tags
+import run_metrics
+import status_journal
+import status_model
+import video_probe
+
 # ----------------------------- 設定 -----------------------------
-ut_dir_path      = r"C:\Users\chen8\OneDrive\文件\ControllerDriver\Cooked\uT"
-qb_dir_path      = r"C:\Users\chen8\OneDrive\文件\ControllerDriver\qbCooking"
+# 資料夾可用環境變數覆寫（loadtest_harness 指向合成的 qbCooking / uT 樹）
+ut_dir_path      = os.environ.get("CHASING_UT_DIR", r"C:\Users\chen8\OneDrive\文件\ControllerDriver\Cooked\uT")
+qb_dir_path      = os.environ.get("CHASING_QB_DIR", r"C:\Users\chen8\OneDrive\文件\ControllerDriver\qbCooking")
+external_ut_path = os.environ.get("CHASING_EXTERNAL_UT_DIR", r"E:\uT")
 sheet_url        = "https://docs.google.com/spreadsheets/d/1cizSVrySFHKYfngBhkCCNVRXRJiMYH_2ltts9YAdbEo/edit?usp=sharing"
 mkvpropedit_path = r"C:\Program Files\MKVToolNix\mkvpropedit.exe"
 
+# 去重：掃描這些資料夾找出內容相同的影片；DEDUP_HARDLINK = True 時以硬連結取代重複檔（同磁碟區）
+dedup_dir_paths  = [ut_dir_path, external_ut_path]
+DEDUP_HARDLINK   = False
+
 # ----------------------------- credentials.json 路徑 -----------------------------
 CREDENTIAL_PATH = os.path.join(os.path.dirname(__file__), 'credentials.json')
 
+run_metrics.start_run("updateStatusAfterDownloading")
+
 # ----------------------------- Google Sheet 連線 -----------------------------
 scope = [
     "https://spreadsheets.google.com/feeds",
@@ -29,28 +43,15 @@ scope = [
     "https://www.googleapis.com/auth/drive.file",
     "https://www.googleapis.com/auth/drive"
 ]
-creds  = ServiceAccountCredentials.from_json_keyfile_name(CREDENTIAL_PATH, scope)
-client = gspread.authorize(creds)
+client = google_client.authorize(CREDENTIAL_PATH, scope)
 sheet  = client.open_by_url(sheet_url).worksheet("Status")
 
-# 讀取 Status 表格的識別碼、演員、發行日期、狀態
-all_data = sheet.get_all_values()
-identifiers = []
-identifier_status_map = {}
-identifier_actor_map  = {}
-identifier_date_map   = {}
-
-for idx, row in enumerate(all_data, start=1):
-    if not row or not row[0].strip():
-        continue
-    ident = row[0].strip()
-    identifiers.append(ident)
-    status  = row[14].strip() if len(row) >= 15 else ""
-    actor   = row[6].strip()  if len(row) >= 7  else ""
-    pubdate = row[1].strip()  if len(row) >= 2  else ""
-    identifier_status_map[ident] = {"row": idx, "status": status}
-    identifier_actor_map[ident]  = actor
-    identifier_date_map[ident]   = pubdate
+# 讀取 Status 表格（有型別的欄式模型），取出識別碼、演員、發行日期、狀態
+status_df = status_model.load_status_frame(sheet)
+identifiers = list(status_df.index)
+identifier_status_map = status_model.status_map(status_df)
+identifier_actor_map  = dict(zip(status_df.index, status_df["演員"].astype(str)))
+identifier_date_map   = status_model.release_date_text(status_df)
 
 # ----------------------------- 提取辨識碼 -----------------------------
 def extract_identifier_from_filename(filename, identifiers):
@@ -81,6 +82,13 @@ def write_actor_metadata(video_path, actor_name):
         except Exception as e:
             print(f"[Step2] MP4 寫入失敗：{video_path}：{e}")
     elif ext == '.mkv':
+        # 先就地改寫 Tags（不啟動子行程）；只有必須重寫整個檔案時才交給 mkvpropedit
+        try:
+            if mkv_tags.write_tags(video_path, {"Comment": f"參與演出者={actor_name}", "Artist": actor_name}):
+                print(f"[Step2] MKV 演員寫入（就地）：{actor_name} → {os.path.basename(video_path)}")
+                return
+        except OSError as e:
+            print(f"[Step2] MKV 就地寫入失敗，改用 mkvpropedit：{video_path}：{e}")
         xml = f'''<?xml version="1.0" encoding="UTF-8"?>
 <Tags>
   <Tag>
@@ -170,7 +178,11 @@ for sub in qb_dirs:
                 new_fn = f"{ident}{suffix}{ext}"
                 dst = os.path.join(ut_dir_path, new_fn)
                 if not os.path.exists(dst):
-                    shutil.move(src, dst)
+                    size = os.path.getsize(src)
+                    with run_metrics.stage("file_move"):
+                        shutil.move(src, dst)
+                    run_metrics.inc("bytes_moved_total", size)
+                    run_metrics.inc("files_moved_total")
                     print(f"[Step1] {ident}: moved → {new_fn}")
                 else:
                     print(f"[Step1] {ident}: 已存在 → {new_fn}")
@@ -191,31 +203,48 @@ for sub in qb_dirs:
     if sub not in dirs_seen:
         print(f" - {sub}")
 
+# 記錄 status 變更到 journal，預期舊值取自目前的狀態，並同步更新本機快照
+def queue_status(updates, label):
+    if not updates:
+        return
+    status_journal.record(
+        [(ident, identifier_status_map[ident], new) for ident, new in updates],
+        source="updateStatusAfterDownloading",
+    )
+    for ident, new in updates:
+        identifier_status_map[ident] = new
+    print(f"{label}: 狀態變更已記錄，待提交")
+
 # 更新 qbCooking 狀態（column O=15）
 updates = []
 for ident in downloaded:
-    rec = identifier_status_map.get(ident)
-    if rec and rec["status"] not in ("已閱", "下載完成"):
-        updates.append(Cell(rec["row"], 15, "下載完成"))
+    current = identifier_status_map.get(ident)
+    if current is not None and current not in ("已閱", "下載完成"):
+        updates.append((ident, "下載完成"))
 for ident in pending:
-    rec = identifier_status_map.get(ident)
-    if rec and rec["status"] not in ("已閱", "下載中"):
-        updates.append(Cell(rec["row"], 15, "下載中"))
-if updates:
-    sheet.update_cells(updates)
-    print("Step1: qbCooking 狀態已更新")
+    current = identifier_status_map.get(ident)
+    if current is not None and current not in ("已閱", "下載中"):
+        updates.append((ident, "下載中"))
+queue_status(updates, "Step1")
 
 # -----------------------------------
 # Step2：處理 uT 資料夾 - metadata 與時間設定
 # -----------------------------------
 print("Step 2: 處理 uT 資料夾...")
-ut_files = [f for f in os.listdir(ut_dir_path) if os.path.isfile(os.path.join(ut_dir_path, f))]
+# uT 檔案清單改由媒體庫索引提供（Step1 搬入的檔案會讓資料夾 mtime 變動，只重掃有變的資料夾）
+library  = media_library.open_library()
+with run_metrics.stage("library_refresh"):
+    media_library.refresh(library, [ut_dir_path], recursive=False)
+ut_files = media_library.list_files(library, ut_dir_path, recursive=False)
+with run_metrics.stage("identify"):
+    media_library.assign_identifiers(library, ut_files, extract_identifier_from_filename,
+                                     identifiers, scheme="downloading")
 groups   = {}
 
-for fn in ut_files:
-    ident = extract_identifier_from_filename(fn, identifiers)
-    if ident:
-        groups.setdefault(ident, []).append(fn)
+for entry in ut_files:
+    fn = entry["name"]
+    if entry["ident"]:
+        groups.setdefault(entry["ident"], []).append(fn)
     else:
         print(f"[Step2] 跳過：{fn}")
 
@@ -225,8 +254,11 @@ for ident, files in groups.items():
     for fn in files:
         path = os.path.join(ut_dir_path, fn)
         print(f"[Step2] 處理 {fn} → 寫演員 & 三時間戳")
-        write_actor_metadata(path, actor)
-        set_all_file_times(path, pubdate)
+        with run_metrics.stage("file_tag"):
+            write_actor_metadata(path, actor)
+            set_all_file_times(path, pubdate)
+        # 就地修改不會改變資料夾 mtime，需手動更新這個檔案的索引列
+        media_library.touch_file(library, path)
 
 # -----------------------------------
 # Step3：更新 uT 狀態為「下載完成」
@@ -234,14 +266,43 @@ for ident, files in groups.items():
 print("Step 3: 更新 uT 狀態...")
 updates = []
 for ident in groups:
-    rec = identifier_status_map.get(ident)
-    if not rec:
+    current = identifier_status_map.get(ident)
+    if current is None:
         print(f"[Step3] {ident}: 無記錄")
         continue
-    current = rec["status"]
-    updates.append(Cell(rec["row"], 15, "下載完成"))
+    updates.append((ident, "下載完成"))
     print(f"[Step3] {ident}: {current} → 下載完成")
 
-if updates:
-    sheet.update_cells(updates)
-    print("Step3: uT 狀態已更新")
+queue_status(updates, "Step3")
+
+# -----------------------------------
+# Step4：探測 uT 影片標頭，依實際解析度 / 幀率校正 tag 欄的 4k60fps
+# -----------------------------------
+print("Step 4: 探測影片標頭...")
+with run_metrics.stage("video_probe"):
+    probes = video_probe.probe_files(library, ut_files)
+probes_by_ident = {}
+for entry in ut_files:
+    if entry["ident"] and entry["path"] in probes:
+        probes_by_ident.setdefault(entry["ident"], []).append(probes[entry["path"]])
+tag_updates = video_probe.tag_transitions(
+    probes_by_ident, dict(zip(status_df.index, status_df["tag"].astype(str)))
+)
+status_journal.record(tag_updates, source="updateStatusAfterDownloading", column="tag")
+
+# -----------------------------------
+# Step5：找出 uT / E:\uT 中內容相同的影片（大小 → 抽樣雜湊 → 完整雜湊確認）
+# -----------------------------------
+print("Step 5: 檢查重複影片...")
+dedup_dirs = [d for d in dedup_dir_paths if os.path.isdir(d)]
+# Step2 只掃了 uT 的第一層，這裡連子資料夾一起（沒變動的資料夾沿用索引）
+media_library.refresh(library, dedup_dirs)
+dedup_files = [f for d in dedup_dirs for f in media_library.list_files(library, d)]
+with run_metrics.stage("dedup"):
+    duplicate_groups = media_dedup.find_duplicates(library, dedup_files)
+    media_dedup.report(duplicate_groups, hardlink=DEDUP_HARDLINK)
+if DEDUP_HARDLINK and duplicate_groups:
+    media_library.refresh(library, dedup_dirs)
+
+# Step1、Step3 的狀態與 Step4 的 tag 變更合併成一次批次寫回
+status_journal.commit(sheet)
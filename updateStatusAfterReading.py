@@ -1,28 +1,39 @@
 #!/usr/bin/env python3
 import os
 import re
-import gspread
-from datetime import datetime
-from gspread.cell import Cell
-from oauth2client.service_account import ServiceAccountCredentials
+
+import dpl_playlist
+import google_client
+import magnet_index
+import media_library
+import run_metrics
+import sheet_snapshot
+import status_archive
+import status_journal
+import status_model
 
 # ----------------------------- 設定 -----------------------------
+# 資料夾可用環境變數覆寫（loadtest_harness 指向合成的 uT 樹）
+ut_dir_path      = os.environ.get("CHASING_UT_DIR", r"C:\Users\chen8\OneDrive\文件\ControllerDriver\Cooked\uT")
+external_ut_path = os.environ.get("CHASING_EXTERNAL_UT_DIR", r"E:\uT")
+cooked_dir_path  = os.path.dirname(ut_dir_path)
+
 # 支援多個 qb 資料夾路徑
 qb_dir_paths = [
-    r"E:\uT",
-    r"C:\Users\chen8\OneDrive\文件\ControllerDriver\Cooked\uT"
+    external_ut_path,
+    ut_dir_path
 ]
 sheet_url        = "https://docs.google.com/spreadsheets/d/1cizSVrySFHKYfngBhkCCNVRXRJiMYH_2ltts9YAdbEo/edit?usp=sharing"
 
 # === 播放清單設置 ===
 playlist_configs = [
     {
-        "video_folder": r"C:\Users\chen8\OneDrive\文件\ControllerDriver\Cooked\uT",
-        "output_path": r"C:\Users\chen8\OneDrive\文件\ControllerDriver\Cooked\playCooking.dpl"
+        "video_folder": ut_dir_path,
+        "output_path": os.path.join(cooked_dir_path, "playCooking.dpl")
     },
     {
-        "video_folder": r"E:\uT",
-        "output_path": r"C:\Users\chen8\OneDrive\文件\ControllerDriver\Cooked\playCooked.dpl"
+        "video_folder": external_ut_path,
+        "output_path": os.path.join(cooked_dir_path, "playCooked.dpl")
     }
 ]
 
@@ -31,6 +42,8 @@ playlist_configs = [
 # -----------------------------
 CREDENTIAL_PATH = r"C:\Users\chen8\OneDrive\文件\pythonHouse\utCooking\credentials.json"
 
+run_metrics.start_run("updateStatusAfterReading")
+
 # ----------------------------- 連線 Google Sheet -----------------------------
 scope = [
     "https://spreadsheets.google.com/feeds",
@@ -38,21 +51,17 @@ scope = [
     "https://www.googleapis.com/auth/drive.file",
     "https://www.googleapis.com/auth/drive"
 ]
-creds        = ServiceAccountCredentials.from_json_keyfile_name(CREDENTIAL_PATH, scope)
-client       = gspread.authorize(creds)
+client       = google_client.authorize(CREDENTIAL_PATH, scope)
 spreadsheet  = client.open_by_url(sheet_url)
 sheet_status = spreadsheet.worksheet("Status")
 sheet_rating = spreadsheet.worksheet("Rating")
 
 # ----------------------------- 讀取 Status 工作表 -----------------------------
-all_rows = sheet_status.get_all_values()
-# 建立識別碼 → 列索引映射
-identifier_row_map = {
-    row[0].strip(): idx
-    for idx, row in enumerate(all_rows, start=1)
-    if row and row[0].strip()
-}
-identifiers = set(identifier_row_map.keys())
+# 一次讀入有型別的欄式模型，以識別碼為索引
+status_df   = status_model.load_status_frame(sheet_status)
+identifiers = set(status_df.index)
+# 順便更新磁力索引的 hash → 狀態 對照（scrape_t66y 用來避免重複排入）
+magnet_index.sync_status(magnet_index.open_index(), status_df)
 
 # ----------------------------- 輔助函式：從檔名提取辨識碼 -----------------------------
 def extract_identifier_from_filename(filename, identifiers):
@@ -67,91 +76,97 @@ def extract_identifier_from_filename(filename, identifiers):
     return None
 
 # ----------------------------- 建立 qb 預計掃描的辨識碼集合 -----------------------------
+# 透過媒體庫索引取得檔案清單：只有 mtime 有變的資料夾才重新列出，播放清單也共用這份索引
+library = media_library.open_library()
+with run_metrics.stage("library_refresh"):
+    media_library.refresh(library, qb_dir_paths)
+
 qb_identifiers = set()
 qb_files       = []
 for qb_dir_path in qb_dir_paths:
-    for root, _, files in os.walk(qb_dir_path):
-        for fn in files:
-            qb_files.append(fn)
-            ident = extract_identifier_from_filename(fn, identifiers)
-            if ident:
-                qb_identifiers.add(ident)
+    entries = media_library.list_files(library, qb_dir_path)
+    with run_metrics.stage("identify"):
+        media_library.assign_identifiers(library, entries, extract_identifier_from_filename,
+                                         identifiers, scheme="reading")
+    for entry in entries:
+        qb_files.append(entry)
+        if entry["ident"]:
+            qb_identifiers.add(entry["ident"])
+
+# 目前狀態（含本次前面步驟記下的變更），作為 journal 的預期舊值
+status_now = status_model.status_map(status_df)
+
+def queue_status(transitions, label):
+    """把 [(ident, new)] 記到 Status journal，預期舊值取自 status_now。"""
+    if not transitions:
+        print(f"Status sheet: no {label} updates needed")
+        return
+    status_journal.record(
+        [(ident, status_now[ident], new) for ident, new in transitions],
+        source="updateStatusAfterReading",
+    )
+    for ident, new in transitions:
+        status_now[ident] = new
+    print(f"Status sheet: {label} 已記錄，待提交")
 
 # -----------------------------------------------
 # Step1：更新「下載完成」卻不在 qbCooking 的 → 已閱
 # -----------------------------------------------
+done = status_model.select(status_df, status_in={"下載完成"})
 updates_read = []
-for ident, idx in identifier_row_map.items():
-    row = all_rows[idx-1]
-    if len(row) >= 15 and row[14].strip() == "下載完成":
-        if ident not in qb_identifiers:
-            updates_read.append(Cell(idx, 15, "已閱"))
-            print(f"{ident}: not in qbCooking → set to 已閱")
-        else:
-            print(f"{ident}: still in qbCooking → skip")
-
-if updates_read:
-    sheet_status.update_cells(updates_read)
-    print("Status sheet: 已閱 更新完成")
-else:
-    print("Status sheet: no 已閱 updates needed")
+for ident in done.index:
+    if ident not in qb_identifiers:
+        updates_read.append((ident, "已閱"))
+        print(f"{ident}: not in qbCooking → set to 已閱")
+    else:
+        print(f"{ident}: still in qbCooking → skip")
+
+queue_status(updates_read, "已閱")
 
 # -----------------------------------------------
 # Step2：直接從 Rating 表抓取所有評級 = Failed 的演員，並更新 Status
 # （僅針對原狀態為「尚無 4K 資源」或「等待下載」的列）
 # -----------------------------------------------
-rating_rows = sheet_rating.get_all_values()
+rating_rows = sheet_snapshot.get_all_values(sheet_rating)
 failed_actors = {
     row[0].strip()
     for row in rating_rows
     if len(row) >= 8 and row[7].strip().lower() == "failed" and row[0].strip()
 }
 
+to_skip = status_model.select(status_df, status_in={"尚無 4K 資源", "等待下載"}, actor_in=failed_actors)
 updates_skip = []
-for ident, idx in identifier_row_map.items():
-    row = all_rows[idx-1]
-    if len(row) >= 15 and row[14].strip() in ("尚無 4K 資源", "等待下載"):
-        actor = row[6].strip() if len(row) >= 7 else ""
-        if actor in failed_actors:
-            updates_skip.append(Cell(idx, 15, "跳過"))
-            print(f"{ident}: actor {actor} failed → set to 跳過")
-
-if updates_skip:
-    sheet_status.update_cells(updates_skip)
-    print("Status sheet: 跳過 更新完成")
-else:
-    print("Status sheet: no 跳過 updates needed")
+for ident, actor in zip(to_skip.index, to_skip["演員"]):
+    updates_skip.append((ident, "跳過"))
+    print(f"{ident}: actor {actor} failed → set to 跳過")
+
+queue_status(updates_skip, "跳過")
 
 # -----------------------------------------------
 # Step3：qb_dir_paths 中所有仍存在的辨識碼 → 下載完成
 # -----------------------------------------------
+to_complete = status_model.select(status_df, status_not_in={"下載完成"}, ident_in=qb_identifiers)
 updates_complete = []
-for ident in qb_identifiers:
-    idx = identifier_row_map.get(ident)
-    if not idx:
-        continue
-    row = all_rows[idx-1]
-    current = row[14].strip() if len(row) >= 15 else ""
-    if current != "下載完成":
-        updates_complete.append(Cell(idx, 15, "下載完成"))
-        print(f"{ident}: set to 下載完成")
-
-if updates_complete:
-    sheet_status.update_cells(updates_complete)
-    print("Status sheet: 下載完成 更新完成")
-else:
-    print("Status sheet: no 下載完成 updates needed")
+for ident in to_complete.index:
+    updates_complete.append((ident, "下載完成"))
+    print(f"{ident}: set to 下載完成")
+
+queue_status(updates_complete, "下載完成")
+
+# 三個步驟的變更合併成一次批次寫回
+status_journal.commit(sheet_status)
 
 # -----------------------------------------------
-# Step4：列出 qb_dir_paths 中檔案但不在 Status 工作表的識別碼
+# Step4：列出 qb_dir_paths 中檔案但不在 Status 工作表的識別碼（已封存的不算）
 # -----------------------------------------------
+archived = status_archive.archived_idents()
 missing = set()
-for fn in qb_files:
-    ident = extract_identifier_from_filename(fn, identifiers)
+for entry in qb_files:
+    ident = entry["ident"]
     if not ident:
-        m = re.search(r'[A-Za-z]+-\d+', fn)
-        ident = m.group(0) if m else None
-    if ident and ident not in identifier_row_map:
+        m = re.search(r'[A-Za-z]+-\d+', entry["name"])
+        ident = m.group(0).upper() if m else None
+    if ident and ident not in status_df.index and ident not in archived:
         missing.add(ident)
 
 if missing:
@@ -169,62 +184,41 @@ video_extensions = {".mp4", ".mkv", ".avi", ".mov", ".wmv", ".flv"}
 
 def generate_playlist(video_folder: str, output_path: str):
     """
-    掃描指定資料夾內的不遞迴影片檔案，依建立日期 (舊→新) 排序，
-    最後輸出成 PotPlayer 可讀的 .dpl 播放清單。
+    從媒體庫索引取出指定資料夾內的不遞迴影片檔案，依建立日期 (舊→新) 排序，
+    再與既有的 PotPlayer .dpl 播放清單合併（保留已播放狀態），只有內容變動時才寫檔。
     """
     print(f"\n==== 處理資料夾：{video_folder} ====")
-    videos = []
-    skipped_files = []
-
-    # 1) 掃描電影檔
-    for filename in os.listdir(video_folder):
-        filepath = os.path.join(video_folder, filename)
-        ext = os.path.splitext(filename)[1].lower()
-        if os.path.isfile(filepath) and ext in video_extensions:
-            try:
-                created_time = os.path.getctime(filepath)
-                videos.append((filename, created_time))
-            except Exception as e:
-                print(f"⚠️ 無法取得建立時間：{filename}，錯誤：{e}")
-                skipped_files.append(filename)
+
+    # 1) 從索引取出電影檔（索引已在前面 refresh 過，不再 listdir / getctime）
+    videos = [
+        (entry["name"], entry["ctime"])
+        for entry in media_library.list_files(library, video_folder, recursive=False,
+                                              exts=video_extensions)
+    ]
 
     print(f"✅ 偵測到 {len(videos)} 個可用影片檔案")
-    if skipped_files:
-        print("⚠️ 下列檔案因錯誤被略過：")
-        for f in skipped_files:
-            print(f"    - {f}")
 
     # 2) 依建立日期排序（從舊到新）
     videos.sort(key=lambda x: x[1])
 
-    # 3) 組成 .dpl 內容
-    dpl_lines = [
-        "DAUMPLAYLIST",
-        f"playname={os.path.basename(output_path)}",
-        "topindex=0",
-        "saveplaypos=0"
-    ]
-    for index, (filename, _) in enumerate(videos, start=1):
-        full_path = os.path.join(video_folder, filename)
-        dpl_lines.append(f"{index}*file*{full_path}")
-        dpl_lines.append(f"{index}*title*{filename}")
-        dpl_lines.append(f"{index}*played*0")
-
-    # 4) 寫入 .dpl 檔案
+    # 3) 與既有 .dpl 合併（保留 played / 播放位置），內容有變才以原子方式寫回
     try:
-        # 確保輸出路徑所在資料夾存在
-        out_dir = os.path.dirname(output_path)
-        if not os.path.isdir(out_dir):
-            os.makedirs(out_dir, exist_ok=True)
-
-        with open(output_path, "w", encoding="utf-8") as f:
-            f.write("\n".join(dpl_lines))
-        print(f"🎉 播放清單已成功更新：{output_path}")
+        dpl_playlist.update_playlist(
+            video_folder, output_path, videos,
+            state_get=lambda k: media_library.get_meta(library, k),
+            state_set=lambda k, v: media_library.set_meta(library, k, v),
+        )
     except Exception as e:
         print(f"❌ 播放清單寫入失敗：{e}")
 
 
 if __name__ == "__main__":
+    # 播放清單資料夾若不在 qb_dir_paths 內，補一次索引更新（已索引的資料夾只會 stat 一次）
+    extra_folders = [c["video_folder"] for c in playlist_configs
+                     if c["video_folder"] not in qb_dir_paths and os.path.isdir(c["video_folder"])]
+    if extra_folders:
+        media_library.refresh(library, extra_folders)
+
     # 依序處理每一組設定
     for config in playlist_configs:
         video_folder = config["video_folder"]
@@ -235,4 +229,5 @@ if __name__ == "__main__":
             print(f"❌ 資料夾不存在：{video_folder}，跳過這組設定。")
             continue
 
-        generate_playlist(video_folder, output_path)
+        with run_metrics.stage("playlist"):
+            generate_playlist(video_folder, output_path)
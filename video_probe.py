@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+影片標頭探測：以 mmap 只讀容器標頭（MP4 的 moov/trak box、MKV 的 Segment Info 與 Tracks），
+取得解析度、幀率、編碼、長度與平均位元率，不讀取影音資料本身，每個檔案通常只碰到幾 MB 以內。
+結果以 (size, mtime) 為鍵快取在媒體庫索引（media_library.db 的 probes 表）。
+
+updateStatusAfterDownloading 以探測結果確認實際下載到的是不是 4K 60fps，
+並透過 Status journal 在 tag 欄加上或移除 4k60fps。
+"""
+import os
+import mmap
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import ebml
+
+# -----------------------------
+# 設定
+# -----------------------------
+PROBE_EXTS   = {".mp4", ".m4v", ".mov", ".mkv", ".webm"}
+TAG_4K60     = "4k60fps"
+MIN_4K_WIDTH = 3840
+MIN_4K_HEIGHT = 2160
+MIN_60_FPS   = 50.0
+WORKERS      = 8
+
+PROBE_FIELDS = ["width", "height", "fps", "codec", "duration", "bitrate_kbps"]
+
+# -----------------------------
+# MP4 / MOV：box 結構
+# -----------------------------
+def _iter_boxes(buf, start, end):
+    pos = start
+    while pos + 8 <= end:
+        size, btype = struct.unpack(">I4s", buf[pos:pos + 8])
+        header = 8
+        if size == 1:
+            size = struct.unpack(">Q", buf[pos + 8:pos + 16])[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header:
+            return
+        yield btype, pos + header, pos + size
+        pos += size
+
+def _find_box(buf, start, end, path):
+    for btype, data, box_end in _iter_boxes(buf, start, end):
+        if btype == path[0]:
+            return (data, box_end) if len(path) == 1 else _find_box(buf, data, box_end, path[1:])
+    return None
+
+def _mdhd_time(buf, data):
+    version = buf[data]
+    if version == 1:
+        timescale, duration = struct.unpack(">IQ", buf[data + 20:data + 32])
+    else:
+        timescale, duration = struct.unpack(">II", buf[data + 12:data + 20])
+    return timescale, duration
+
+def _probe_mp4(buf, size):
+    moov = _find_box(buf, 0, size, [b"moov"])
+    if moov is None:
+        return None
+    result = {}
+    mvhd = _find_box(buf, moov[0], moov[1], [b"mvhd"])
+    if mvhd:
+        timescale, duration = _mdhd_time(buf, mvhd[0])
+        if timescale:
+            result["duration"] = duration / timescale
+
+    for btype, data, end in _iter_boxes(buf, moov[0], moov[1]):
+        if btype != b"trak":
+            continue
+        hdlr = _find_box(buf, data, end, [b"mdia", b"hdlr"])
+        if not hdlr or bytes(buf[hdlr[0] + 8:hdlr[0] + 12]) != b"vide":
+            continue
+        mdhd = _find_box(buf, data, end, [b"mdia", b"mdhd"])
+        stsd = _find_box(buf, data, end, [b"mdia", b"minf", b"stbl", b"stsd"])
+        stts = _find_box(buf, data, end, [b"mdia", b"minf", b"stbl", b"stts"])
+        if stsd:
+            entry = stsd[0] + 8
+            result["codec"] = bytes(buf[entry + 4:entry + 8]).decode("latin-1").strip()
+            result["width"], result["height"] = struct.unpack(">HH", buf[entry + 32:entry + 36])
+        if mdhd and stts:
+            timescale, duration = _mdhd_time(buf, mdhd[0])
+            # 全部 (sample_count, sample_delta) 都要加總：VFR / 剪輯過的檔案常有上萬筆，只加一部分會低估幀率
+            count = struct.unpack(">I", buf[stts[0] + 4:stts[0] + 8])[0]
+            start = stts[0] + 8
+            count = min(count, (stts[1] - start) // 8)
+            samples = sum(n for n, _ in struct.iter_unpack(">II", buf[start:start + count * 8]))
+            if timescale and duration:
+                result["fps"] = round(samples * timescale / duration, 3)
+                result.setdefault("duration", duration / timescale)
+        break
+    return result
+
+# -----------------------------
+# MKV / WebM：EBML Segment Info 與 Tracks（優先依 SeekHead 跳轉，不掃 Cluster）
+# -----------------------------
+def _probe_mkv(buf, size):
+    segment = ebml.open_segment(buf, size)
+    if segment is None:
+        return None
+    seg_data, seg_end = segment[:2]
+    positions = ebml.seek_positions(buf, seg_data, seg_end)
+    result = {}
+
+    if ebml.INFO in positions:
+        _, isize, idata = ebml.read_header(buf, positions[ebml.INFO])
+        scale, duration = 1_000_000, None
+        for cid, _, cdata, csize in ebml.iter_children(buf, idata, idata + isize):
+            if cid == ebml.TIMECODE_SCALE:
+                scale = ebml.read_uint(buf, cdata, csize)
+            elif cid == ebml.DURATION:
+                duration = ebml.read_float(buf, cdata, csize)
+        if duration:
+            result["duration"] = duration * scale / 1e9
+
+    if ebml.TRACKS in positions:
+        _, tsize, tdata = ebml.read_header(buf, positions[ebml.TRACKS])
+        for cid, _, edata, esize in ebml.iter_children(buf, tdata, tdata + tsize):
+            if cid != ebml.TRACK_ENTRY:
+                continue
+            track = {}
+            for fid, _, fdata, fsize in ebml.iter_children(buf, edata, edata + esize):
+                if fid == ebml.TRACK_TYPE:
+                    track["type"] = ebml.read_uint(buf, fdata, fsize)
+                elif fid == ebml.CODEC_ID:
+                    track["codec"] = ebml.read_string(buf, fdata, fsize)
+                elif fid == ebml.DEFAULT_DURATION:
+                    ns = ebml.read_uint(buf, fdata, fsize)
+                    if ns:
+                        track["fps"] = round(1e9 / ns, 3)
+                elif fid == ebml.VIDEO:
+                    for vid, _, vdata, vsize in ebml.iter_children(buf, fdata, fdata + fsize):
+                        if vid == ebml.PIXEL_WIDTH:
+                            track["width"] = ebml.read_uint(buf, vdata, vsize)
+                        elif vid == ebml.PIXEL_HEIGHT:
+                            track["height"] = ebml.read_uint(buf, vdata, vsize)
+            if track.get("type") == 1:
+                track.pop("type")
+                result.update(track)
+                break
+    return result
+
+# -----------------------------
+# probe：探測單一檔案；無法辨識時回傳 None
+# -----------------------------
+def probe(path):
+    ext = os.path.splitext(path)[1].lower()
+    size = os.path.getsize(path)
+    if size == 0 or ext not in PROBE_EXTS:
+        return None
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        try:
+            result = _probe_mkv(buf, size) if ext in (".mkv", ".webm") else _probe_mp4(buf, size)
+        except (ebml.EBMLError, struct.error, IndexError, ValueError) as e:
+            print(f"⚠️ 無法解析標頭：{os.path.basename(path)}：{e}")
+            return None
+    if not result:
+        return None
+    if result.get("duration"):
+        result["bitrate_kbps"] = round(size * 8 / result["duration"] / 1000)
+    return {k: result.get(k) for k in PROBE_FIELDS}
+
+def is_4k60(info):
+    if not info:
+        return None
+    width, height, fps = info.get("width") or 0, info.get("height") or 0, info.get("fps") or 0
+    return (width >= MIN_4K_WIDTH or height >= MIN_4K_HEIGHT) and fps >= MIN_60_FPS
+
+# -----------------------------
+# probe_files：以 (size, mtime) 快取在媒體庫索引，只探測新檔或變動過的檔案
+#    files：media_library.list_files 的結果；回傳 {path: info or None}
+# -----------------------------
+def _cached(conn, files):
+    cached = {}
+    for f in files:
+        row = conn.execute(
+            f"SELECT size, mtime, ok, {', '.join(PROBE_FIELDS)} FROM probes WHERE path = ?", (f["path"],)
+        ).fetchone()
+        if row and row[0] == f["size"] and row[1] == f["mtime"]:
+            cached[f["path"]] = dict(zip(PROBE_FIELDS, row[3:])) if row[2] else None
+    return cached
+
+def probe_files(conn, files, workers=WORKERS):
+    files = [f for f in files if os.path.splitext(f["name"])[1].lower() in PROBE_EXTS]
+    results = _cached(conn, files)
+    todo = [f for f in files if f["path"] not in results]
+    if todo:
+        print(f"🎞️ 探測 {len(todo)} 個影片標頭（快取命中 {len(results)}）")
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for f, info in zip(todo, pool.map(lambda f: probe(f["path"]), todo)):
+                results[f["path"]] = info
+                conn.execute(
+                    f"INSERT OR REPLACE INTO probes (path, size, mtime, ok, {', '.join(PROBE_FIELDS)}, probed_at) "
+                    f"VALUES (?, ?, ?, ?, {', '.join('?' * len(PROBE_FIELDS))}, ?)",
+                    [f["path"], f["size"], f["mtime"], info is not None]
+                    + [(info or {}).get(k) for k in PROBE_FIELDS]
+                    + [datetime.now().isoformat(timespec="seconds")],
+                )
+        conn.commit()
+    return results
+
+# -----------------------------
+# tag_transitions：依探測結果產生 tag 欄的 journal 轉換 [(ident, 舊 tag, 新 tag), ...]
+#    probes_by_ident：{識別碼: [info, ...]}（同一識別碼有多個檔案時取最高解析度）
+#    current_tags：{識別碼: 目前 tag 文字}
+# -----------------------------
+def _without_tag(tag):
+    parts = [p.strip() for p in tag.split(",") if p.strip() and p.strip() != TAG_4K60]
+    return ", ".join(parts)
+
+def tag_transitions(probes_by_ident, current_tags):
+    transitions = []
+    for ident, infos in probes_by_ident.items():
+        infos = [i for i in infos if i]
+        if not infos or ident not in current_tags:
+            continue
+        best = max(infos, key=lambda i: ((i.get("height") or 0), (i.get("fps") or 0)))
+        cur = str(current_tags[ident] or "").strip()
+        has = TAG_4K60 in [p.strip() for p in cur.split(",")]
+        if is_4k60(best) and not has:
+            new = f"{cur}, {TAG_4K60}" if cur else TAG_4K60
+        elif not is_4k60(best) and has and best.get("height") and best.get("fps"):
+            new = _without_tag(cur)
+        else:
+            continue
+        print(f"🎞️ {ident}: {best['width']}x{best['height']} @ {best['fps']}fps {best['codec']} → tag「{new}」")
+        transitions.append((ident, cur, new))
+    return transitions
@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分散式爬取佇列：把 find_Mglinks 的詳細頁與 scrape_t66y 的文章頁拆成工作項目，
+多台機器（或容器）上的 worker 以租約（lease）取得工作、定期 heartbeat 延長租約，
+結果寫回佇列；coordinator 等佇列清空後一次合併寫進試算表。
+
+    - 佇列是共用的 SQLite 檔（CHASING_WORK_QUEUE 或 --db 指定，例如放在網路磁碟上）
+    - 每個工作以 (kind, key) 為主鍵：重複 enqueue / 重複回報結果都不會產生重複資料（第一個結果為準）
+    - worker 當掉時租約到期，工作會被其他 worker 重新租用；失敗超過 MAX_ATTEMPTS 次標為 failed
+    - 每個 worker 各自的 host_pacer 與出口 IP，加一台機器大致就多一份抓取速度
+
+用法：
+    coordinator：python work_queue.py enqueue mglinks        （依 checkList 與爬取歷史排入識別碼）
+                 python work_queue.py enqueue t66y           （抓列表頁，排入文章頁）
+    各台機器：   python work_queue.py worker mglinks
+    coordinator：python work_queue.py merge mglinks          （等佇列清空後寫回 mglinks / Rating / Status）
+                 python work_queue.py status
+"""
+import os
+import json
+import time
+import socket
+import sqlite3
+import threading
+
+import run_metrics
+
+# -----------------------------
+# 設定
+# -----------------------------
+WORK_QUEUE_PATH = os.environ.get(
+    "CHASING_WORK_QUEUE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "work_queue.db"))
+LEASE_SECONDS   = 120     # 租約長度；heartbeat 每 1/3 租約延長一次
+LEASE_BATCH     = 5       # worker 一次租幾個工作
+MAX_ATTEMPTS    = 3
+POLL_SECONDS    = 5       # 佇列暫時沒有可租的工作時，多久再查一次
+
+KIND_MGLINKS = "mglinks"  # key = 識別碼，結果 = fetch_and_parse 的列
+KIND_T66Y    = "t66y"     # key = 文章網址，payload = 列表頁資訊，結果 = 上傳用的一列
+KINDS        = (KIND_MGLINKS, KIND_T66Y)
+
+# -----------------------------
+# open_queue：網路磁碟上的 SQLite 不能用 WAL，使用預設的 rollback journal 與 busy timeout
+# -----------------------------
+def open_queue(db_path=WORK_QUEUE_PATH):
+    conn = sqlite3.connect(db_path, timeout=60, isolation_level=None)
+    conn.execute("PRAGMA busy_timeout = 60000")
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS tasks (
+            kind          TEXT,
+            key           TEXT,
+            payload       TEXT,
+            state         TEXT,      -- pending / leased / done / failed / merged
+            owner         TEXT,
+            lease_expires REAL,
+            attempts      INTEGER DEFAULT 0,
+            result        TEXT,
+            error         TEXT,
+            enqueued_at   REAL,
+            updated_at    REAL,
+            PRIMARY KEY (kind, key)
+        );
+        CREATE INDEX IF NOT EXISTS idx_tasks_state ON tasks (kind, state, lease_expires);
+    """)
+    return conn
+
+def worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def _tx(conn):
+    """BEGIN IMMEDIATE：租用 / 回報都在一個寫入交易內完成，多台機器同時操作也不會重複租到。"""
+    class _Tx:
+        def __enter__(self):
+            conn.execute("BEGIN IMMEDIATE")
+            return conn
+
+        def __exit__(self, exc_type, *exc):
+            conn.execute("ROLLBACK" if exc_type else "COMMIT")
+    return _Tx()
+
+# -----------------------------
+# enqueue：排入工作；已完成並合併過（merged）或失敗的會重新排入，進行中的不動
+#    items：[(key, payload), ...]
+# -----------------------------
+def enqueue(conn, kind, items):
+    now = time.time()
+    added = 0
+    with _tx(conn):
+        for key, payload in items:
+            cur = conn.execute("""
+                INSERT INTO tasks (kind, key, payload, state, attempts, enqueued_at, updated_at)
+                VALUES (?, ?, ?, 'pending', 0, ?, ?)
+                ON CONFLICT (kind, key) DO UPDATE SET
+                    payload = excluded.payload, state = 'pending', owner = NULL, lease_expires = NULL,
+                    attempts = 0, result = NULL, error = NULL,
+                    enqueued_at = excluded.enqueued_at, updated_at = excluded.updated_at
+                WHERE tasks.state IN ('merged', 'failed')
+            """, (kind, key, json.dumps(payload, ensure_ascii=False), now, now))
+            added += cur.rowcount
+    return added
+
+# -----------------------------
+# lease / heartbeat / complete / fail
+# -----------------------------
+def lease(conn, kind, owner, n=LEASE_BATCH, ttl=LEASE_SECONDS):
+    """租用最多 n 個工作（待處理的，或租約已過期的），回傳 [(key, payload), ...]。"""
+    now = time.time()
+    with _tx(conn):
+        # 租約過期且已用完重試次數的（worker 反覆在同一個工作上當掉）直接標為 failed
+        conn.execute("""
+            UPDATE tasks SET state = 'failed', owner = NULL, lease_expires = NULL,
+                             error = COALESCE(error, '租約過期'), updated_at = ?
+            WHERE kind = ? AND state = 'leased' AND lease_expires < ? AND attempts >= ?
+        """, (now, kind, now, MAX_ATTEMPTS))
+        rows = conn.execute("""
+            SELECT key, payload FROM tasks
+            WHERE kind = ? AND (state = 'pending' OR (state = 'leased' AND lease_expires < ?))
+            ORDER BY enqueued_at, key LIMIT ?
+        """, (kind, now, n)).fetchall()
+        for key, _ in rows:
+            conn.execute("""
+                UPDATE tasks SET state = 'leased', owner = ?, lease_expires = ?, attempts = attempts + 1,
+                                 updated_at = ?
+                WHERE kind = ? AND key = ?
+            """, (owner, now + ttl, now, kind, key))
+    return [(key, json.loads(payload)) for key, payload in rows]
+
+def heartbeat(conn, kind, owner, keys, ttl=LEASE_SECONDS):
+    now = time.time()
+    with _tx(conn):
+        for key in keys:
+            conn.execute("""
+                UPDATE tasks SET lease_expires = ?, updated_at = ?
+                WHERE kind = ? AND key = ? AND state = 'leased' AND owner = ?
+            """, (now + ttl, now, kind, key, owner))
+
+def complete(conn, kind, key, result):
+    """寫回結果；已經有結果的工作不覆寫（租約過期後被重抓時，兩份結果只留第一份）。"""
+    now = time.time()
+    with _tx(conn):
+        cur = conn.execute("""
+            UPDATE tasks SET state = 'done', result = ?, error = NULL, lease_expires = NULL, updated_at = ?
+            WHERE kind = ? AND key = ? AND state IN ('pending', 'leased')
+        """, (json.dumps(result, ensure_ascii=False, default=str), now, kind, key))
+    return cur.rowcount == 1
+
+def fail(conn, kind, key, error, max_attempts=MAX_ATTEMPTS):
+    now = time.time()
+    with _tx(conn):
+        conn.execute("""
+            UPDATE tasks SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                             owner = NULL, lease_expires = NULL, error = ?, updated_at = ?
+            WHERE kind = ? AND key = ? AND state = 'leased'
+        """, (max_attempts, str(error)[:500], now, kind, key))
+
+def counts(conn, kind):
+    return dict(conn.execute("SELECT state, COUNT(*) FROM tasks WHERE kind = ? GROUP BY state", (kind,)).fetchall())
+
+def drained(conn, kind):
+    c = counts(conn, kind)
+    return not c.get("pending") and not c.get("leased")
+
+def take_results(conn, kind):
+    """取出所有 done 的結果：回傳 ([(key, result), ...], 標記為 merged 的函式)。寫回試算表成功後才標記。"""
+    rows = conn.execute(
+        "SELECT key, result FROM tasks WHERE kind = ? AND state = 'done' ORDER BY enqueued_at, key", (kind,)
+    ).fetchall()
+
+    def mark_merged():
+        with _tx(conn):
+            conn.executemany("UPDATE tasks SET state = 'merged', updated_at = ? WHERE kind = ? AND key = ?",
+                             [(time.time(), kind, key) for key, _ in rows])
+    return [(key, json.loads(result)) for key, result in rows], mark_merged
+
+# -----------------------------
+# Heartbeat：背景執行緒定期延長手上工作的租約（SQLite 連線不能跨執行緒，自己開一條）
+# -----------------------------
+class Heartbeat:
+    def __init__(self, db_path, kind, owner, ttl=LEASE_SECONDS):
+        self.db_path, self.kind, self.owner, self.ttl = db_path, kind, owner, ttl
+        self.keys = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def hold(self, keys):
+        with self._lock:
+            self.keys.update(keys)
+
+    def release(self, key):
+        with self._lock:
+            self.keys.discard(key)
+
+    def _run(self):
+        conn = open_queue(self.db_path)
+        try:
+            while not self._stop.wait(self.ttl / 3):
+                with self._lock:
+                    keys = list(self.keys)
+                if keys:
+                    try:
+                        heartbeat(conn, self.kind, self.owner, keys, self.ttl)
+                    except sqlite3.Error as e:
+                        print(f"⚠️ heartbeat 失敗：{e}")
+        finally:
+            conn.close()
+
+# -----------------------------
+# 各 kind 的處理：enqueue（coordinator）/ handler（worker）/ merge（coordinator）
+# -----------------------------
+def _enqueue_mglinks(conn):
+    import crawl_scheduler
+    import find_Mglinks
+
+    ss = find_Mglinks.get_client().open_by_key(find_Mglinks.SPREADSHEET_ID)
+    codes = ss.worksheet(find_Mglinks.CHECKLIST_TAB).col_values(1)[1:]
+    codes = find_Mglinks.plan_crawl(ss, codes, crawl_scheduler.open_history())
+    return enqueue(conn, KIND_MGLINKS, [(code.strip(), None) for code in codes])
+
+def _enqueue_t66y(conn):
+    import scrape_t66y
+
+    driver = scrape_t66y.create_driver()
+    try:
+        items = scrape_t66y.crawl_listing(driver)
+    finally:
+        driver.quit()
+    return enqueue(conn, KIND_T66Y, [(item["url"], item) for item in items])
+
+def _handlers(kind):
+    """回傳 (建立 driver 的函式, handler(driver, key, payload) → 結果)。"""
+    if kind == KIND_MGLINKS:
+        import find_Mglinks
+        return find_Mglinks.create_driver, lambda driver, key, payload: find_Mglinks.fetch_and_parse(key, driver)
+    import scrape_t66y
+    return scrape_t66y.create_driver, lambda driver, key, payload: scrape_t66y.fetch_thread(driver, payload)
+
+def _merge_mglinks(results):
+    import crawl_scheduler
+    import find_Mglinks
+    import sheets_scheduler
+
+    history = crawl_scheduler.open_history()
+    rows = []
+    for ident, fetched in results:
+        crawl_scheduler.record(history, ident, fetched)
+        rows.extend(fetched)
+    # 以識別碼 upsert：保留其他識別碼（包括先前 merge 寫入的）原有的列，只替換這次合併的
+    ss = find_Mglinks.get_client().open_by_key(find_Mglinks.SPREADSHEET_ID)
+    kept = find_Mglinks.kept_rows(ss, [ident for ident, _ in results])
+    ws_out = find_Mglinks.init_google_sheet(find_Mglinks.SPREADSHEET_ID, find_Mglinks.MGLINKS_TAB,
+                                            find_Mglinks.MGLINKS_COLUMNS)
+    sheets_scheduler.queue_append(ws_out, kept + rows)
+    find_Mglinks.safe_api_call(sheets_scheduler.flush, ws_out)
+    find_Mglinks.apply_conditional_formatting(find_Mglinks.SPREADSHEET_ID, find_Mglinks.MGLINKS_TAB)
+    records = [dict(zip(find_Mglinks.MGLINKS_COLUMNS, row)) for row in rows]
+    find_Mglinks.update_rating_sheet(find_Mglinks.SPREADSHEET_ID, ws_out, records=records)
+    find_Mglinks.update_status_sheet(find_Mglinks.SPREADSHEET_ID, find_Mglinks.MGLINKS_TAB,
+                                     find_Mglinks.MGLINKS_COLUMNS, ws_out, records=records)
+
+def _merge_t66y(results):
+    import scrape_t66y
+
+    # upload_to_google_sheet 本身會略過已存在的識別碼，重複合併也不會重複寫入
+    scrape_t66y.upload_to_google_sheet([row for _, row in results], scrape_t66y.SPREADSHEET_ID,
+                                       scrape_t66y.TAB_NAME)
+
+# -----------------------------
+# work：worker 主迴圈；佇列清空（沒有待處理、也沒有別人租用中的）後結束
+# -----------------------------
+def work(kind, db_path=WORK_QUEUE_PATH, owner=None, batch=LEASE_BATCH, ttl=LEASE_SECONDS, wait=True):
+    owner = owner or worker_id()
+    conn = open_queue(db_path)
+    create_driver, handler = _handlers(kind)
+    driver = None
+    done = failed = 0
+    print(f"👷 worker {owner}：{kind}")
+    try:
+        with Heartbeat(db_path, kind, owner, ttl) as hb:
+            while True:
+                leased = lease(conn, kind, owner, batch, ttl)
+                if not leased:
+                    if not wait or drained(conn, kind):
+                        break
+                    # 其他 worker 手上還有工作：等租約完成或過期
+                    time.sleep(POLL_SECONDS)
+                    continue
+                hb.hold(key for key, _ in leased)
+                driver = driver or create_driver()
+                for key, payload in leased:
+                    try:
+                        result = handler(driver, key, payload)
+                    except Exception as e:
+                        fail(conn, kind, key, e)
+                        failed += 1
+                        print(f"❌ {key}：{e}")
+                    else:
+                        complete(conn, kind, key, result)
+                        done += 1
+                    finally:
+                        hb.release(key)
+                run_metrics.inc("work_queue_tasks_total", len(leased), kind=kind)
+    finally:
+        if driver is not None:
+            driver.quit()
+        conn.close()
+    print(f"✅ worker {owner}：完成 {done}，失敗 {failed}")
+    return done
+
+# -----------------------------
+# merge：coordinator 等佇列清空後，把結果合併寫回試算表；寫回成功才標記為 merged
+# -----------------------------
+def merge(kind, db_path=WORK_QUEUE_PATH, wait=True, timeout=None):
+    conn = open_queue(db_path)
+    deadline = time.time() + timeout if timeout else None
+    while wait and not drained(conn, kind):
+        if deadline and time.time() > deadline:
+            print(f"⏳ {kind} 佇列尚未清空（{counts(conn, kind)}），放棄合併")
+            return 0
+        time.sleep(POLL_SECONDS)
+
+    results, mark_merged = take_results(conn, kind)
+    failed = counts(conn, kind).get("failed", 0)
+    if not results:
+        print(f"{kind}：沒有待合併的結果（失敗 {failed}）")
+        return 0
+    print(f"🔀 合併 {kind}：{len(results)} 個工作（失敗 {failed}）")
+    (_merge_mglinks if kind == KIND_MGLINKS else _merge_t66y)(results)
+    mark_merged()
+    return len(results)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="分散式爬取佇列（租約 + heartbeat）")
+    parser.add_argument("command", choices=["enqueue", "worker", "merge", "status"])
+    parser.add_argument("kind", nargs="?", choices=KINDS, default=KIND_MGLINKS)
+    parser.add_argument("--db", default=WORK_QUEUE_PATH, help="共用佇列的 SQLite 路徑")
+    parser.add_argument("--batch", type=int, default=LEASE_BATCH, help="worker 一次租幾個工作")
+    parser.add_argument("--lease", type=int, default=LEASE_SECONDS, help="租約秒數")
+    parser.add_argument("--no-wait", action="store_true",
+                        help="worker：沒有可租的工作就結束；merge：不等佇列清空，直接合併已完成的")
+    parser.add_argument("--timeout", type=float, help="merge 最多等幾秒")
+    args = parser.parse_args()
+
+    if args.command == "status":
+        conn = open_queue(args.db)
+        for kind in KINDS:
+            print(f"{kind}: {counts(conn, kind) or '（空）'}")
+    elif args.command == "enqueue":
+        run_metrics.start_run(f"work_queue_enqueue_{args.kind}")
+        conn = open_queue(args.db)
+        added = (_enqueue_mglinks if args.kind == KIND_MGLINKS else _enqueue_t66y)(conn)
+        print(f"📥 {args.kind}：排入 {added} 個工作，目前 {counts(conn, args.kind)}")
+    elif args.command == "worker":
+        run_metrics.start_run(f"work_queue_worker_{args.kind}")
+        work(args.kind, args.db, batch=args.batch, ttl=args.lease, wait=not args.no_wait)
+    else:
+        run_metrics.start_run(f"work_queue_merge_{args.kind}")
+        merge(args.kind, args.db, wait=not args.no_wait, timeout=args.timeout)